@@ -1,14 +1,33 @@
+import argparse
+import contextvars
 import json
+import math
 import sys
 import time
 import threading
-from typing import List, Dict, Any, Optional
-from openai import OpenAI
-from tools import get_tools
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Any, Callable, Optional, Set, Tuple
+from tools import get_registry
 from config import Config
-
-# Global variable for animation control
+from context import ContextWindow
+from tool_cache import ToolCache
+from providers import ProviderPool
+from response_cache import get_response_cache
+from results import ErrorResult, serialize
+from deadline import Deadline, DeadlineExceeded, budget, current, deadline_scope, expired
+from progress import reporting
+from metrics import llm_request, record_usage, start_metrics_server, TURN_ITERATIONS, TOOL_TIMEOUTS
+from tracing import trace_span, setup_from_config as setup_tracing
+
+# Global variables for animation control; a running tool's progress replaces the canned text
 stop_animation = False
+animation_status: Optional[str] = None
+
+# Width of the animation line, spinner included
+ANIMATION_WIDTH = 64
+
+# Seconds a tool call may overrun its budget, to return partial results, before it is abandoned
+TOOL_GRACE = 1.0
 
 def show_loading_animation():
     """Show a loading animation while the agent is thinking."""
@@ -30,10 +49,13 @@ def show_loading_animation():
 
     while not stop_animation:
         # Combine spinner and action text
-        current_action = animations[idx % len(animations)]
+        current_action = animations[idx % len(animations)] + "..."
         current_spinner = spinners[spinner_idx % len(spinners)]
+        status = animation_status
+        if status:
+            current_action = f"⚙️  {status}"[:ANIMATION_WIDTH - 2].ljust(ANIMATION_WIDTH - 2)
 
-        sys.stdout.write(f"\r{current_spinner} {current_action}... ")
+        sys.stdout.write(f"\r{current_spinner} {current_action} ")
         sys.stdout.flush()
 
         time.sleep(0.15)
@@ -45,65 +67,302 @@ def show_loading_animation():
         if spinner_idx % 10 == 0:
             idx += 1
 
+def stop_loading_animation():
+    """Stop the loading animation and clear its line."""
+    global stop_animation
+    if stop_animation:
+        return
+    stop_animation = True
+    time.sleep(0.1)  # Give animation time to stop
+    sys.stdout.write("\r" + " " * (ANIMATION_WIDTH + 4) + "\r")  # Clear the animation line
+    sys.stdout.flush()
+
+def get_persona(persona_type: str) -> str:
+    """Get the persona description based on type."""
+    personas = {
+        "helpful_assistant": "You are a helpful assistant with access to network tools. You help users check network connectivity and diagnose connection issues.",
+        "network_specialist": "You are a network diagnostics specialist. You use ping and other network tools to help troubleshoot connectivity problems.",
+        "minimal": "You are an AI assistant that can use tools when needed."
+    }
+    return personas.get(persona_type, personas["helpful_assistant"])
+
+def tool_calls_message(message) -> Dict[str, Any]:
+    """Convert an assistant message with tool calls into a context entry."""
+    return {
+        "role": "assistant",
+        "content": message.content or "",
+        "tool_calls": [
+            {
+                "id": tool_call.id,
+                "type": tool_call.type,
+                "function": {
+                    "name": tool_call.function.name,
+                    "arguments": tool_call.function.arguments
+                }
+            }
+            for tool_call in message.tool_calls
+        ]
+    }
+
+def parse_tool_arguments(arguments: str) -> Optional[Dict[str, Any]]:
+    """Parse tool call arguments, or return None while they are incomplete."""
+    try:
+        parsed = json.loads(arguments)
+    except json.JSONDecodeError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+def merge_tool_call_delta(tool_calls: Dict[int, Dict[str, Any]], tool_delta) -> Dict[str, Any]:
+    """Add one streamed tool call delta to the calls assembled so far and return its entry."""
+    entry = tool_calls.setdefault(tool_delta.index, {
+        "id": "",
+        "type": "function",
+        "function": {"name": "", "arguments": ""}
+    })
+    if tool_delta.id:
+        entry["id"] = tool_delta.id
+    if tool_delta.function:
+        if tool_delta.function.name:
+            entry["function"]["name"] = tool_delta.function.name
+        if tool_delta.function.arguments:
+            entry["function"]["arguments"] += tool_delta.function.arguments
+    return entry
+
+def out_of_time_answer(tool_results: List[Tuple[str, str]]) -> str:
+    """The answer of a turn that hit TURN_TIMEOUT: the tool results gathered before it ran out."""
+    answer = f"⏱️ Stopped after {Config.TURN_TIMEOUT:g}s (TURN_TIMEOUT) before the model could answer."
+    if not tool_results:
+        return answer
+    lines = [answer, "Results gathered so far:"]
+    lines.extend(f"- {name}: {content}" for name, content in tool_results)
+    return "\n".join(lines)
+
+def open_tool_calls(context: ContextWindow) -> List[Dict[str, Any]]:
+    """Tool calls of the last assistant message that have no result in the context yet."""
+    answered = set()
+    for message in reversed(context.copy()):
+        if message.get("role") == "tool":
+            answered.add(message.get("tool_call_id"))
+            continue
+        if message.get("role") == "assistant":
+            return [call for call in message.get("tool_calls") or [] if call["id"] not in answered]
+        return []
+    return []
+
+def tool_span_attributes(result: Any, text: str) -> Dict[str, Any]:
+    """Trace attributes describing a tool result and its serialized form."""
+    ok = result.ok if hasattr(result, "ok") else not text.startswith("Error")
+    return {"ok": ok, "cached": getattr(result, "cached_age", None) is not None, "result_bytes": len(text)}
+
+class PendingToolCall:
+    """A tool call that has been submitted to the agent's worker pool."""
+
+    def __init__(self, tool_name: str):
+        self.tool_name = tool_name
+        self.future: Optional[Future] = None
+        self.started_at: Optional[float] = None
+        # Seconds the call may run, set when it starts
+        self.timeout: Optional[float] = None
+        # The call's own deadline; cancelling it kills the commands the tool runs
+        self.deadline: Optional[Deadline] = None
+        # What the worker runs, kept so a call still queued can move to another pool
+        self.context: Optional[contextvars.Context] = None
+        self.run: Optional[Callable[[], str]] = None
+
 class Agent:
-    def __init__(self, model: str = None, persona: str = None):
+    def __init__(self, model: str = None, persona: str = None, stream: bool = None):
         """
         Initialize the agent - Fly.io pattern
 
         Args:
             model: OpenAI model to use
             persona: Type of persona for the agent
+            stream: Stream completions token by token (default: Config.STREAM_RESPONSES)
         """
-        self.client = OpenAI(
-            api_key=Config.OPENAI_API_KEY,
-            base_url=Config.OPENAI_BASE_URL
-        )
+        # OPENAI_BASE_URL plus any LLM_FALLBACKS, with retries and failover
+        self.providers = ProviderPool.from_config()
         self.model = model or Config.DEFAULT_MODEL
         self.persona_name = persona or Config.DEFAULT_PERSONA
-        self.tools = get_tools()
-        self.context: List[Dict[str, Any]] = []
+        # Shared by every agent; tools are built on first use
+        self.tools = get_registry()
+        self.context = ContextWindow(
+            self._get_persona(self.persona_name),
+            max_tokens=Config.MAX_CONTEXT_TOKENS,
+            max_messages=Config.MAX_CONTEXT_LENGTH
+        )
 
-        # Add system message to context
-        self.context.append({
-            "role": "system",
-            "content": self._get_persona(self.persona_name)
-        })
+        # Streaming output and per-turn latency stats
+        self.stream = Config.STREAM_RESPONSES if stream is None else stream
+        self.on_token: Optional[Callable[[str], None]] = None
+        # Called with (tool name, text) as running tools report progress
+        self.on_progress: Optional[Callable[[str, str], None]] = None
+        self.last_turn_stats: Dict[str, Any] = {}
+
+        # Repeated and concurrent identical tool calls are answered once
+        self.tool_cache = ToolCache(Config.TOOL_CACHE_ENTRIES, Config.TOOL_CACHE_MAX_BYTES)
+        # Completions replayed for conversation states seen before (None unless LLM_CACHE_FILE is set)
+        self.response_cache = get_response_cache()
+
+        # Shared worker pool for running the tool calls of one turn in parallel
+        self._tool_executor = self._new_tool_executor()
+        # Calls running on a worker thread right now, stopped by close()
+        self._running_calls: Set[PendingToolCall] = set()
+
+        # Trace exporters named in the configuration
+        setup_tracing()
+
+    @staticmethod
+    def _new_tool_executor() -> ThreadPoolExecutor:
+        return ThreadPoolExecutor(
+            max_workers=max(1, Config.MAX_TOOL_CONCURRENCY),
+            thread_name_prefix="tool"
+        )
+
+    def close(self) -> None:
+        """Stop the tool calls still running and shut the worker pool down."""
+        for call in list(self._running_calls):
+            if call.deadline is not None:
+                call.deadline.cancel()
+        self._tool_executor.shutdown(wait=False, cancel_futures=True)
 
     def _get_persona(self, persona_type: str) -> str:
         """Get the persona description based on type."""
-        personas = {
-            "helpful_assistant": "You are a helpful assistant with access to network tools. You help users check network connectivity and diagnose connection issues.",
-            "network_specialist": "You are a network diagnostics specialist. You use ping and other network tools to help troubleshoot connectivity problems.",
-            "minimal": "You are an AI assistant that can use tools when needed."
-        }
-        return personas.get(persona_type, personas["helpful_assistant"])
+        return get_persona(persona_type)
 
     def _get_tools_schema(self) -> List[Dict[str, Any]]:
-        """Get OpenAI tool schema for all tools."""
-        schemas = []
-        for tool in self.tools:
-            schemas.append({
-                "type": "function",
-                "function": {
-                    "name": tool.name,
-                    "description": tool.description,
-                    "parameters": tool.parameters
-                }
-            })
-        return schemas
+        """Get OpenAI tool schema for all tools, built once by the registry."""
+        return self.tools.schema()
+
+    def _prepare_messages(self) -> List[Dict[str, Any]]:
+        """Fit the context to its token budget; its size is kept in context.last_prompt_tokens."""
+        return self.context.prepare()
+
+    def _count_prompt_tokens(self, usage) -> None:
+        """Add one request's prompt tokens to the turn, estimated when the provider reports no usage."""
+        self.last_turn_stats["prompt_tokens"] += (usage.prompt_tokens if usage else None) or self.context.last_prompt_tokens
 
     def _execute_tool(self, tool_name: str, args: Dict[str, Any]) -> str:
-        """Execute a tool and return the result."""
-        for tool in self.tools:
-            if tool.name == tool_name:
+        """Execute a tool under the current deadline and return the result."""
+        with trace_span(tool_name, "tool", tool=tool_name, args=args) as span:
+            tool = self.tools.get(tool_name)
+            if tool is None:
+                span.set(ok=False)
+                return f"Unknown tool: {tool_name}"
+            try:
+                # Logged execution, unless a fresh or in-flight result can be reused
+                progress = (lambda text: self.on_progress(tool_name, text)) if self.on_progress else None
+                with reporting(progress):
+                    result = self.tool_cache.run(tool, args)
+                text = serialize(result)
+                span.set(**tool_span_attributes(result, text))
+                return text
+            except Exception as e:
+                span.set(ok=False)
+                return f"Error executing {tool_name}: {str(e)}"
+
+    def _start_tool_call(self, tool_name: str, tool_args: Dict[str, Any]) -> "PendingToolCall":
+        """Submit a tool call to the worker pool without waiting for it."""
+        call = PendingToolCall(tool_name)
+        turn_deadline = current()
+
+        def run() -> str:
+            with deadline_scope(Config.MAX_TOOL_TIMEOUT) as scope:
+                # Never the turn's own deadline: cancelling the call must not end the turn
+                call.deadline = scope if scope is not turn_deadline else None
+                call.timeout = budget(Config.MAX_TOOL_TIMEOUT) + TOOL_GRACE
+                call.started_at = time.monotonic()
+                self._running_calls.add(call)
                 try:
-                    # Use the new logging method
-                    result = tool.execute_with_logging(args)
-                    return str(result)
-                except Exception as e:
-                    return f"Error executing {tool_name}: {str(e)}"
+                    return self._execute_tool(tool_name, tool_args)
+                finally:
+                    self._running_calls.discard(call)
 
-        return f"Unknown tool: {tool_name}"
+        # Carry the current trace span and deadline over to the worker thread
+        call.context = contextvars.copy_context()
+        call.run = run
+        self._submit_tool_call(call)
+        return call
+
+    def _submit_tool_call(self, call: "PendingToolCall") -> None:
+        call.future = self._tool_executor.submit(call.context.run, call.run)
+
+    def _replace_tool_executor(self, calls: List["PendingToolCall"]) -> None:
+        """
+        Give later tool calls a fresh worker pool.
+
+        An abandoned call keeps its worker thread until the tool returns, so
+        the old pool is left to it and shut down once it is idle. Those of
+        ``calls`` still queued on the old pool move to the new one.
+        """
+        old = self._tool_executor
+        self._tool_executor = self._new_tool_executor()
+        for call in calls:
+            if call.future.cancel():
+                self._submit_tool_call(call)
+        old.shutdown(wait=False)
+
+    def _collect_tool_results(self, calls: List["PendingToolCall"]) -> List[str]:
+        """
+        Wait for submitted tool calls and return their results.
+
+        Each call gets its own Config.MAX_TOOL_TIMEOUT, counted from the
+        moment it starts running and cut down to what is left of the turn.
+        Tools stop themselves at that point and return partial results; a
+        call still running TOOL_GRACE seconds later is cancelled, which kills
+        the commands it runs, and abandoned, and its worker is replaced so
+        it does not hold up the calls that come after it.
+
+        Returns:
+            The tool results, in the same order as ``calls``
+        """
+        results: List[Optional[str]] = [None] * len(calls)
+        waiting = set(range(len(calls)))
+
+        while waiting:
+            # Wake up when a call finishes or the earliest running call expires
+            now = time.monotonic()
+            deadlines = [
+                calls[index].started_at + calls[index].timeout
+                for index in waiting
+                if calls[index].started_at is not None
+            ]
+            wait_for = max(0.0, min(deadlines) - now) if deadlines else budget(Config.MAX_TOOL_TIMEOUT) + TOOL_GRACE
+            wait([calls[index].future for index in waiting], timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            now = time.monotonic()
+            abandoned = False
+            for index in list(waiting):
+                call = calls[index]
+                if call.future.done():
+                    waiting.discard(index)
+                    results[index] = call.future.result()
+                elif call.started_at is not None and now - call.started_at >= call.timeout:
+                    # The worker thread cannot be interrupted; its result is discarded
+                    if call.deadline is not None:
+                        call.deadline.cancel()
+                    waiting.discard(index)
+                    abandoned = True
+                    TOOL_TIMEOUTS.labels(call.tool_name).inc()
+                    results[index] = f"Error executing {call.tool_name}: timed out after {call.timeout:.0f}s"
+
+            if abandoned:
+                self._replace_tool_executor([calls[index] for index in waiting])
+
+        return results
+
+    def _execute_tools_concurrently(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[str]:
+        """
+        Execute several tool calls at the same time.
+
+        At most Config.MAX_TOOL_CONCURRENCY calls run at once and each call
+        gets its own Config.MAX_TOOL_TIMEOUT, counted from the moment it starts
+        and cut down to what is left of the turn.
+
+        Returns:
+            The tool results, in the same order as ``calls``
+        """
+        pending = [self._start_tool_call(tool_name, tool_args) for tool_name, tool_args in calls]
+        return self._collect_tool_results(pending)
 
     def _handle_tool_calls(self, response) -> bool:
         """
@@ -113,118 +372,405 @@ class Agent:
         if not response.choices[0].message.tool_calls:
             return False
 
-        message = response.choices[0].message
+        self._run_tool_calls(tool_calls_message(response.choices[0].message))
+        return True  # More tool calls might be needed
 
-        # Add assistant message with tool calls to context
-        self.context.append({
-            "role": "assistant",
-            "content": message.content or "",
-            "tool_calls": [
-                {
-                    "id": tool_call.id,
-                    "type": tool_call.type,
-                    "function": {
-                        "name": tool_call.function.name,
-                        "arguments": tool_call.function.arguments
-                    }
-                }
-                for tool_call in message.tool_calls
-            ]
-        })
+    def _run_tool_calls(self, message: Dict[str, Any]) -> None:
+        """Add an assistant message with tool calls to the context, run them and add their results."""
+        self.context.append(message)
 
-        # Execute each tool call
-        for tool_call in message.tool_calls:
-            tool_name = tool_call.function.name
+        # Parse arguments for every tool call up front
+        calls = []
+        for tool_call in message["tool_calls"]:
             try:
-                tool_args = json.loads(tool_call.function.arguments)
+                tool_args = json.loads(tool_call["function"]["arguments"])
             except json.JSONDecodeError:
                 tool_args = {}
+            calls.append((tool_call["function"]["name"], tool_args))
 
-            tool_result = self._execute_tool(tool_name, tool_args)
+        # Execute all tool calls concurrently
+        with trace_span("tool_calls", "tool_round", calls=len(calls)):
+            tool_results = self._execute_tools_concurrently(calls)
 
-            # Add tool result to context
-            self.context.append({
-                "role": "tool",
-                "tool_call_id": tool_call.id,
-                "name": tool_name,
-                "content": tool_result
-            })
+        # Add tool results to context in the original tool_call order
+        for tool_call, tool_result in zip(message["tool_calls"], tool_results):
+            self._append_tool_result(tool_call, tool_result)
 
-        return True  # More tool calls might be needed
+    def _append_tool_result(self, tool_call: Dict[str, Any], content: str) -> None:
+        """Add the result of one tool call to the context and to this turn's results."""
+        self.context.append({
+            "role": "tool",
+            "tool_call_id": tool_call["id"],
+            "name": tool_call["function"]["name"],
+            "content": content
+        })
+        self.last_turn_stats["tool_results"].append((tool_call["function"]["name"], content))
 
-    def process(self, user_input: str) -> str:
+    def _answer_open_tool_calls(self, reason: str) -> None:
+        """Give tool calls left without a result by a cut-short turn an error result, so the context stays valid."""
+        for tool_call in open_tool_calls(self.context):
+            self._append_tool_result(tool_call, serialize(ErrorResult(reason)))
+
+    def _replay_completion(self, cached) -> Tuple[str, bool]:
         """
-        Process user input - Fly.io pattern
+        Use a cached completion in place of a request.
 
-        Args:
-            user_input: The user's message/input
+        Returns:
+            The content and whether tool calls were made
+        """
+        self.last_turn_stats["cache_hits"] += 1
+        if self.last_turn_stats["time_to_first_token"] is None:
+            self.last_turn_stats["time_to_first_token"] = time.perf_counter() - self.last_turn_stats["started_at"]
+        if not cached.tool_calls:
+            if self.stream and self.on_token and cached.content:
+                self.on_token(cached.content)
+            return cached.content, False
+
+        self._run_tool_calls({"role": "assistant", "content": cached.content, "tool_calls": cached.tool_calls})
+        return cached.content, True
+
+    def _stream_completion(self, messages: List[Dict[str, Any]], cache_key: Optional[str] = None) -> Tuple[str, bool]:
+        """
+        Request one completion with streaming enabled.
+
+        Content tokens are passed to self.on_token as they arrive. Tool call
+        deltas are assembled incrementally and each tool is started as soon
+        as its arguments are complete, while the rest of the message is
+        still streaming. With a ``cache_key`` the completion is stored in
+        the response cache.
 
         Returns:
-            The agent's response
+            The streamed content and whether tool calls were made
         """
-        # Add user message to context
+        stats = self.last_turn_stats
+        first_token_at = None
+        token_count = 0
+        usage = None
+
+        content_parts: List[str] = []
+        tool_calls: Dict[int, Dict[str, Any]] = {}
+        started: Dict[int, PendingToolCall] = {}
+
+        def start_call(index: int) -> None:
+            entry = tool_calls[index]
+            tool_args = parse_tool_arguments(entry["function"]["arguments"])
+            started[index] = self._start_tool_call(entry["function"]["name"], tool_args or {})
+
+        with trace_span("chat.completions.create", "llm", model=self.model, stream=True) as span, \
+                llm_request(self.model):
+            request_start = time.perf_counter()
+            stream = self.providers.create(
+                model=self.model,
+                messages=messages,
+                tools=self._get_tools_schema(),
+                tool_choice="auto",
+                stream=True
+            )
+            span.set(prompt_tokens_estimate=self.context.last_prompt_tokens)
+
+            for chunk in self._until_deadline(stream):
+                # Some providers report usage in a final chunk
+                if getattr(chunk, "usage", None) and chunk.usage.completion_tokens:
+                    usage = chunk.usage
+
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+
+                if first_token_at is None and (delta.content or delta.tool_calls):
+                    first_token_at = time.perf_counter()
+                    if stats["time_to_first_token"] is None:
+                        stats["time_to_first_token"] = first_token_at - stats["started_at"]
+
+                if delta.content:
+                    token_count += 1
+                    content_parts.append(delta.content)
+                    if self.on_token:
+                        self.on_token(delta.content)
+
+                for tool_delta in delta.tool_calls or []:
+                    token_count += 1
+                    index = tool_delta.index
+
+                    # A new tool call means every earlier one is complete
+                    for earlier in tool_calls:
+                        if earlier < index and earlier not in started:
+                            start_call(earlier)
+
+                    entry = merge_tool_call_delta(tool_calls, tool_delta)
+
+                    # Start as soon as the arguments form a complete JSON object
+                    if (index not in started and entry["function"]["name"]
+                            and parse_tool_arguments(entry["function"]["arguments"]) is not None):
+                        start_call(index)
+
+            span.set(completion_tokens=(usage.completion_tokens if usage else None) or token_count,
+                     tool_calls=len(tool_calls))
+
+        request_end = time.perf_counter()
+        if first_token_at is not None:
+            stats["generation_time"] += request_end - first_token_at
+        record_usage(self.model, usage)
+        self._count_prompt_tokens(usage)
+        stats["completion_tokens"] += (usage.completion_tokens if usage else None) or token_count
+        if stats["generation_time"] > 0:
+            stats["tokens_per_second"] = stats["completion_tokens"] / stats["generation_time"]
+
+        content = "".join(content_parts)
+        if cache_key is not None:
+            self.response_cache.put(cache_key, self.model, content, [tool_calls[index] for index in sorted(tool_calls)],
+                                    request_end - request_start, (usage.completion_tokens if usage else None) or token_count)
+        if not tool_calls:
+            return content, False
+
+        for index in tool_calls:
+            if index not in started:
+                start_call(index)
+
+        ordered = sorted(tool_calls)
         self.context.append({
-            "role": "user",
-            "content": user_input
+            "role": "assistant",
+            "content": content,
+            "tool_calls": [tool_calls[index] for index in ordered]
         })
 
-        try:
-            # Keep making calls until no more tool calls needed
-            while True:
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=self.context,
-                    tools=self._get_tools_schema(),
-                    tool_choice="auto"
-                )
-
-                # Handle tool calls if present
-                if self._handle_tool_calls(response):
-                    continue  # More tool calls needed
-
-                # No more tool calls, we have our final response
-                break
+        with trace_span("tool_calls", "tool_round", calls=len(ordered)):
+            tool_results = self._collect_tool_results([started[index] for index in ordered])
 
-            # Get final response
-            final_message = response.choices[0].message
-            response_text = final_message.content or ""
+        for index, tool_result in zip(ordered, tool_results):
+            self._append_tool_result(tool_calls[index], tool_result)
 
-            # Add assistant response to context
-            self.context.append({
-                "role": "assistant",
-                "content": response_text
-            })
+        return content, True
 
-            return response_text
+    @staticmethod
+    def _until_deadline(stream):
+        """
+        Iterate a completion stream, closing it if the turn runs out of time.
 
-        except Exception as e:
-            error_msg = f"Error: {str(e)}"
+        The request timeout only bounds the wait for each chunk, so a slow
+        but steady stream is checked against the deadline between chunks.
+        """
+        try:
+            for chunk in stream:
+                yield chunk
+                if expired():
+                    raise DeadlineExceeded("turn deadline reached while the answer was streaming")
+        finally:
+            stream.close()
+
+    def process(self, user_input: str, use_cache: bool = True) -> str:
+        """
+        Process user input - Fly.io pattern
+
+        The whole turn runs within Config.TURN_TIMEOUT. When it runs out,
+        the answer lists the tool results gathered so far. A
+        KeyboardInterrupt cancels the turn, kills its subprocesses and is
+        re-raised once the context is consistent again.
+
+        Args:
+            user_input: The user's message/input
+            use_cache: Replay and store completions in the response cache, if one is configured
+
+        Returns:
+            The agent's response
+        """
+        with trace_span("agent.process", "turn", model=self.model, stream=self.stream) as turn, \
+                deadline_scope(Config.TURN_TIMEOUT or math.inf) as deadline:
+            # Add user message to context
             self.context.append({
-                "role": "assistant",
-                "content": error_msg
+                "role": "user",
+                "content": user_input
             })
-            return error_msg
+
+            self.last_turn_stats = {
+                "started_at": time.perf_counter(),
+                "time_to_first_token": None,
+                "generation_time": 0.0,
+                "completion_tokens": 0,
+                "tokens_per_second": None,
+                "prompt_tokens": 0,
+                "cache_hits": 0,
+                "tool_results": [],
+                "timed_out": False
+            }
+
+            iterations = 0
+            try:
+                # Keep making calls until no more tool calls needed
+                while True:
+                    if expired():
+                        raise DeadlineExceeded("turn deadline reached")
+                    iterations += 1
+                    messages = self._prepare_messages()
+                    cache_key = None
+                    cached = None
+                    if use_cache and self.response_cache is not None:
+                        cache_key = self.response_cache.key(self.model, self.tools.fingerprint, messages)
+                        cached = self.response_cache.get(cache_key)
+
+                    if cached is not None:
+                        response_text, called_tools = self._replay_completion(cached)
+                    elif self.stream:
+                        response_text, called_tools = self._stream_completion(messages, cache_key)
+                    else:
+                        with trace_span("chat.completions.create", "llm", model=self.model, stream=False) as span, \
+                                llm_request(self.model):
+                            request_start = time.perf_counter()
+                            response = self.providers.create(
+                                model=self.model,
+                                messages=messages,
+                                tools=self._get_tools_schema(),
+                                tool_choice="auto"
+                            )
+                            span.set(prompt_tokens_estimate=self.context.last_prompt_tokens,
+                                     completion_tokens=response.usage.completion_tokens if response.usage else None,
+                                     tool_calls=len(response.choices[0].message.tool_calls or []))
+                        record_usage(self.model, response.usage)
+                        self._count_prompt_tokens(response.usage)
+
+                        if self.last_turn_stats["time_to_first_token"] is None:
+                            self.last_turn_stats["time_to_first_token"] = time.perf_counter() - self.last_turn_stats["started_at"]
+                        if response.usage:
+                            self.last_turn_stats["completion_tokens"] += response.usage.completion_tokens or 0
+                        if cache_key is not None:
+                            message = response.choices[0].message
+                            self.response_cache.put(
+                                cache_key, self.model, message.content or "",
+                                tool_calls_message(message)["tool_calls"] if message.tool_calls else [],
+                                time.perf_counter() - request_start,
+                                response.usage.completion_tokens if response.usage else 0
+                            )
+
+                        # Handle tool calls if present
+                        called_tools = self._handle_tool_calls(response)
+                        response_text = response.choices[0].message.content or ""
+
+                    if called_tools:
+                        continue  # More tool calls needed
+
+                    # No more tool calls, we have our final response
+                    break
+
+                self.last_turn_stats["total_time"] = time.perf_counter() - self.last_turn_stats["started_at"]
+
+                # Add assistant response to context
+                self.context.append({
+                    "role": "assistant",
+                    "content": response_text
+                })
+
+                return response_text
+
+            except KeyboardInterrupt:
+                deadline.cancel()
+                turn.set(error="cancelled")
+                self._answer_open_tool_calls("cancelled by the user")
+                self.context.append({
+                    "role": "assistant",
+                    "content": "⏹️ Cancelled by the user."
+                })
+                raise
+
+            except Exception as e:
+                if isinstance(e, DeadlineExceeded) or expired():
+                    # Out of time, not broken: answer with what the tools found
+                    turn.set(error="deadline")
+                    self.last_turn_stats["timed_out"] = True
+                    self._answer_open_tool_calls("not run: the turn ran out of time")
+                    answer = out_of_time_answer(self.last_turn_stats["tool_results"])
+                    self.context.append({
+                        "role": "assistant",
+                        "content": answer
+                    })
+                    return answer
+
+                turn.set(error=str(e))
+                self.last_turn_stats["error"] = str(e)
+                error_msg = f"Error: {str(e)}"
+                self.context.append({
+                    "role": "assistant",
+                    "content": error_msg
+                })
+                return error_msg
+
+            finally:
+                turn.set(iterations=iterations, cache_hits=self.last_turn_stats["cache_hits"])
+                TURN_ITERATIONS.observe(iterations)
 
     def reset_context(self) -> None:
         """Reset the conversation context."""
-        self.context = [{
-            "role": "system",
-            "content": self._get_persona(self.persona_name)
-        }]
+        self.context.reset()
 
     def show_context(self) -> List[Dict[str, Any]]:
         """Show the current context."""
         return self.context.copy()
 
+def ask(question: str, model: Optional[str] = None, persona: Optional[str] = None) -> int:
+    """
+    One-shot mode: answer a single question on stdout, without the REPL.
+
+    Only the answer is printed, so the output can be piped or captured by
+    scripts and cron jobs.
+
+    Returns:
+        The exit status: 0 when answered, 1 on an error, 124 when the turn
+        ran out of time (TURN_TIMEOUT), 130 when interrupted
+    """
+    if not Config.validate():
+        return 1
+    agent = Agent(model=model, persona=persona)
+
+    streamed: List[str] = []
+
+    def print_token(token: str) -> None:
+        streamed.append(token)
+        sys.stdout.write(token)
+        sys.stdout.flush()
+
+    agent.on_token = print_token
+    try:
+        answer = agent.process(question)
+    except KeyboardInterrupt:
+        print()
+        return 130
+    finally:
+        agent.close()
+
+    if streamed:
+        print()
+        if not "".join(streamed).endswith(answer):
+            print(answer)
+    else:
+        print(answer)
+
+    stats = agent.last_turn_stats
+    if stats.get("error"):
+        return 1
+    return 124 if stats.get("timed_out") else 0
+
 def main():
     """Main function - Fly.io pattern: input > process > output"""
+    parser = argparse.ArgumentParser(description="Ping Agent - Network Diagnostics Assistant")
+    parser.add_argument("--ask", metavar="QUESTION", help="Answer one question and exit instead of starting the REPL")
+    parser.add_argument("--model", help="Model to use (default: OPENAI_MODEL)")
+    parser.add_argument("--persona", choices=sorted(Config.get_available_personas()),
+                        help="Agent persona (default: AGENT_PERSONA)")
+    args = parser.parse_args()
+    if args.ask is not None:
+        sys.exit(ask(args.ask, args.model, args.persona))
+
     print("🏓 Ping Agent - Network Diagnostics Assistant")
     print("Based on Fly.io 'Everyone Write an Agent'")
-    print("Commands: 'quit' to exit, 'reset' to clear context, 'context' to view history, 'providers' to see supported APIs")
+    print("Commands: 'quit' to exit, 'reset' to clear context, 'context' to view history, 'cache' for cache stats, 'providers' to see supported APIs")
+    print("Start a message with '!' to skip the LLM response cache")
     print("-" * 50)
 
     # Initialize agent
-    agent = Agent()
+    agent = Agent(model=args.model, persona=args.persona)
+
+    if Config.METRICS_PORT:
+        start_metrics_server(Config.METRICS_PORT, Config.METRICS_HOST)
+        print(f"📈 Metrics at http://{Config.METRICS_HOST}:{Config.METRICS_PORT}/metrics")
 
     while True:
         try:
@@ -245,6 +791,20 @@ def main():
                     if len(content) == 100:
                         content += "..."
                     print(f"{i}. [{role}] {content}")
+                print(f"\n📏 ~{agent.context.total_tokens} of {agent.context.max_tokens} tokens, "
+                      f"last prompt ~{agent.context.last_prompt_tokens} tokens, "
+                      f"~{agent.context.tokens_saved} tokens trimmed so far")
+                continue
+            elif user_input.lower() == 'cache':
+                stats = agent.tool_cache.stats()
+                print(f"\n🗄️  Tool cache: {stats['entries']} entries ({stats['bytes']} bytes), "
+                      f"{stats['hits']} hits, {stats['misses']} misses, {stats['coalesced']} coalesced, "
+                      f"{stats['evictions']} evictions, hit rate {stats['hit_rate']:.0%}")
+                if agent.response_cache is not None:
+                    stats = agent.response_cache.stats()
+                    print(f"💾 LLM response cache: {stats['entries']} entries ({stats['bytes']} bytes), "
+                          f"{stats['hits']} hits, {stats['misses']} misses, hit rate {stats['hit_rate']:.0%}, "
+                          f"saved {stats['saved_seconds']:.1f}s and {stats['saved_tokens']} completion tokens")
                 continue
             elif user_input.lower() == 'providers':
                 print("\n🌐 Supported OpenAI-Compatible Providers:")
@@ -257,29 +817,62 @@ def main():
                 Config.print_config()
                 continue
 
+            use_cache = not user_input.startswith("!")
+            user_input = user_input.lstrip("!").strip()
             if not user_input:
                 continue
 
             # Process input using Fly.io pattern with animation
-            global stop_animation
+            global stop_animation, animation_status
             stop_animation = False
+            animation_status = None
 
             # Start animation in a separate thread
             animation_thread = threading.Thread(target=show_loading_animation)
             animation_thread.daemon = True
             animation_thread.start()
 
-            # Get agent response
-            response = agent.process(user_input)
+            # When streaming, replace the animation with tokens as they arrive
+            streamed: List[str] = []
+
+            def print_token(token: str) -> None:
+                if not streamed:
+                    stop_loading_animation()
+                    sys.stdout.write("Agent: ")
+                streamed.append(token)
+                sys.stdout.write(token)
+                sys.stdout.flush()
 
-            # Stop animation and clear line
-            stop_animation = True
-            time.sleep(0.1)  # Give animation time to stop
-            sys.stdout.write("\r" + " " * 50 + "\r")  # Clear the animation line
-            sys.stdout.flush()
+            agent.on_token = print_token
 
-            # Print response
-            print(f"Agent: {response}")
+            def show_progress(tool_name: str, text: str) -> None:
+                global animation_status
+                animation_status = text
+
+            agent.on_progress = show_progress
+
+            # Get agent response; Ctrl-C cancels the turn, not the session
+            try:
+                response = agent.process(user_input, use_cache=use_cache)
+            except KeyboardInterrupt:
+                stop_loading_animation()
+                print("\n⏹️  Cancelled, running commands stopped. Ask again or type 'quit'.")
+                continue
+
+            if streamed:
+                print()
+                if not "".join(streamed).endswith(response):
+                    print(f"Agent: {response}")
+
+                stats = agent.last_turn_stats
+                if stats.get("time_to_first_token") is not None and stats.get("tokens_per_second"):
+                    print(f"⏱️  First token {stats['time_to_first_token']:.2f}s · {stats['tokens_per_second']:.1f} tokens/s")
+            else:
+                # Stop animation and clear line
+                stop_loading_animation()
+
+                # Print response
+                print(f"Agent: {response}")
 
         except KeyboardInterrupt:
             print("\n\nGoodbye! 👋")
@@ -287,5 +880,7 @@ def main():
         except Exception as e:
             print(f"\nError: {str(e)}")
 
+    agent.close()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
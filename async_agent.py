@@ -0,0 +1,418 @@
+import asyncio
+import json
+import math
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Callable, Optional, Tuple
+from tools import get_registry
+from config import Config
+from context import ContextWindow
+from tool_cache import ToolCache
+from providers import ProviderPool
+from response_cache import get_response_cache
+from results import ErrorResult, serialize
+from deadline import DeadlineExceeded, budget, deadline_scope, expired
+from progress import reporting
+from metrics import llm_request, record_usage, TURN_ITERATIONS, TOOL_TIMEOUTS
+from tracing import trace_span, setup_from_config as setup_tracing
+from agent import (
+    TOOL_GRACE, get_persona, merge_tool_call_delta, open_tool_calls, out_of_time_answer,
+    tool_span_attributes
+)
+
+# Receives turn events: ("token", {"text"}), ("tool_start", {"name", "args"}),
+# ("tool_progress", {"name", "text"}) and ("tool_end", {"name", "ok", "ms"})
+EventCallback = Callable[[str, Dict[str, Any]], None]
+
+class Session:
+    """Conversation state for one diagnostic session."""
+
+    def __init__(self, session_id: str, system_prompt: str):
+        self.session_id = session_id
+        self.context = ContextWindow(
+            system_prompt,
+            max_tokens=Config.MAX_CONTEXT_TOKENS,
+            max_messages=Config.MAX_CONTEXT_LENGTH
+        )
+        # Turns of the same session run one after another, in arrival order
+        self.lock = asyncio.Lock()
+        # Turns running or waiting for the lock
+        self.pending = 0
+        self.last_used = time.monotonic()
+        # Requests, token usage, tool calls and error of the latest turn
+        self.last_turn_stats: Dict[str, Any] = {}
+
+    @property
+    def idle(self) -> float:
+        """Seconds since the session was last used; 0 while a turn is pending."""
+        return 0.0 if self.pending else time.monotonic() - self.last_used
+
+    def reset(self) -> None:
+        """Reset the conversation context."""
+        self.context.reset()
+
+class AsyncAgent:
+    """
+    Asyncio version of Agent that serves many sessions on one event loop.
+
+    LLM calls go through the provider pool's AsyncOpenAI clients and
+    tools run through Tool.execute_async, so no thread is held per session.
+    """
+
+    def __init__(self, model: str = None, persona: str = None, max_sessions: int = 0):
+        """
+        Initialize the async agent
+
+        Args:
+            model: OpenAI model to use
+            persona: Type of persona for new sessions
+            max_sessions: Keep at most this many sessions, dropping the least
+                recently used idle ones (0 = unlimited)
+        """
+        self.providers = ProviderPool.from_config()
+        self.model = model or Config.DEFAULT_MODEL
+        self.persona_name = persona or Config.DEFAULT_PERSONA
+        self.tools = get_registry()
+        # Least recently used first
+        self.sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self.max_sessions = max_sessions
+        # Optional async context manager entered around each turn, e.g. server.AdmissionLimiter
+        self.admission = None
+        # Shared by all sessions, so a probe one session just ran is reused by the others
+        self.tool_cache = ToolCache(Config.TOOL_CACHE_ENTRIES, Config.TOOL_CACHE_MAX_BYTES)
+        self.response_cache = get_response_cache()
+        setup_tracing()
+
+    def get_session(self, session_id: str) -> Session:
+        """Get a session, creating it on first use."""
+        session = self.sessions.get(session_id)
+        if session is None:
+            if self.max_sessions and len(self.sessions) >= self.max_sessions:
+                self._evict(len(self.sessions) - self.max_sessions + 1)
+            session = Session(session_id, get_persona(self.persona_name))
+            self.sessions[session_id] = session
+        else:
+            self.sessions.move_to_end(session_id)
+        session.last_used = time.monotonic()
+        return session
+
+    def _evict(self, count: int) -> int:
+        """Drop up to ``count`` least recently used sessions that have no pending turn."""
+        victims = [sid for sid, session in self.sessions.items() if not session.pending][:count]
+        for session_id in victims:
+            del self.sessions[session_id]
+        return len(victims)
+
+    def evict_idle(self, max_idle: float) -> int:
+        """Drop sessions unused for ``max_idle`` seconds; returns how many were dropped."""
+        victims = [sid for sid, session in self.sessions.items() if session.pending == 0 and session.idle >= max_idle]
+        for session_id in victims:
+            del self.sessions[session_id]
+        return len(victims)
+
+    def close_session(self, session_id: str) -> None:
+        """Forget a session and its context."""
+        self.sessions.pop(session_id, None)
+
+    async def _execute_tool(self, tool_name: str, args: Dict[str, Any]) -> str:
+        """Execute a tool within Config.MAX_TOOL_TIMEOUT and the turn's deadline, and return the result."""
+        with trace_span(tool_name, "tool", tool=tool_name, args=args) as span:
+            tool = self.tools.get(tool_name)
+            if tool is None:
+                span.set(ok=False)
+                return f"Unknown tool: {tool_name}"
+            try:
+                with deadline_scope(Config.MAX_TOOL_TIMEOUT):
+                    result = await self.tool_cache.run_async(tool, args)
+                text = serialize(result)
+                span.set(**tool_span_attributes(result, text))
+                return text
+            except Exception as e:
+                span.set(ok=False)
+                return f"Error executing {tool_name}: {str(e)}"
+
+    async def _execute_tools_concurrently(self, calls: List[Tuple[str, Dict[str, Any]]],
+                                          on_event: Optional[EventCallback] = None,
+                                          record: Optional[List[Dict[str, Any]]] = None) -> List[str]:
+        """
+        Execute several tool calls at the same time.
+
+        Uses the same Config.MAX_TOOL_CONCURRENCY and Config.MAX_TOOL_TIMEOUT
+        limits as Agent, cut down to what is left of the turn. Tools return
+        partial results when they reach the limit; calls still running
+        TOOL_GRACE seconds later are cancelled, which kills their
+        subprocess. Finished calls are appended to ``record`` if given.
+
+        Returns:
+            The tool results, in the same order as ``calls``
+        """
+        semaphore = asyncio.Semaphore(max(1, Config.MAX_TOOL_CONCURRENCY))
+
+        async def run(tool_name: str, tool_args: Dict[str, Any]) -> str:
+            async with semaphore:
+                if on_event:
+                    on_event("tool_start", {"name": tool_name, "args": tool_args})
+                start = time.perf_counter()
+                timeout = budget(Config.MAX_TOOL_TIMEOUT) + TOOL_GRACE
+                progress = (lambda text: on_event("tool_progress", {"name": tool_name, "text": text})) if on_event else None
+                try:
+                    with reporting(progress):
+                        result = await asyncio.wait_for(self._execute_tool(tool_name, tool_args), timeout)
+                except asyncio.TimeoutError:
+                    TOOL_TIMEOUTS.labels(tool_name).inc()
+                    result = f"Error executing {tool_name}: timed out after {timeout:.0f}s"
+                outcome = {"name": tool_name, "ok": not result.startswith(("Error", "Unknown tool")),
+                           "ms": round((time.perf_counter() - start) * 1000)}
+                if record is not None:
+                    record.append(dict(outcome, args=tool_args))
+                if on_event:
+                    on_event("tool_end", outcome)
+                return result
+
+        return await asyncio.gather(*(run(tool_name, tool_args) for tool_name, tool_args in calls))
+
+    async def _complete(self, session: Session, on_event: Optional[EventCallback],
+                        use_cache: bool = True) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Request one completion, streamed when ``on_event`` is given.
+
+        A completion cached for the same conversation state is replayed
+        instead, and new completions are stored, when ``use_cache`` is set
+        and a response cache is configured.
+
+        Returns:
+            The content and the tool calls, as context entries (empty if none)
+        """
+        messages = session.context.prepare()
+        if not use_cache or self.response_cache is None:
+            return await self._request(session, messages, on_event)
+
+        cache_key = self.response_cache.key(self.model, self.tools.fingerprint, messages)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            session.last_turn_stats["cache_hits"] += 1
+            if on_event and cached.content:
+                on_event("token", {"text": cached.content})
+            return cached.content, cached.tool_calls
+
+        start = time.perf_counter()
+        completion_tokens = session.last_turn_stats["completion_tokens"]
+        content, tool_calls = await self._request(session, messages, on_event)
+        self.response_cache.put(cache_key, self.model, content, tool_calls, time.perf_counter() - start,
+                                session.last_turn_stats["completion_tokens"] - completion_tokens)
+        return content, tool_calls
+
+    async def _request(self, session: Session, messages: List[Dict[str, Any]],
+                       on_event: Optional[EventCallback]) -> Tuple[str, List[Dict[str, Any]]]:
+        stream = on_event is not None
+        with trace_span("chat.completions.create", "llm", model=self.model, stream=stream) as span, \
+                llm_request(self.model):
+            response = await self.providers.acreate(
+                model=self.model,
+                messages=messages,
+                tools=self.tools.schema(),
+                tool_choice="auto",
+                stream=stream
+            )
+            span.set(prompt_tokens_estimate=session.context.last_prompt_tokens)
+
+            if not stream:
+                message = response.choices[0].message
+                span.set(completion_tokens=response.usage.completion_tokens if response.usage else None,
+                         tool_calls=len(message.tool_calls or []))
+                record_usage(self.model, response.usage)
+                self._count_usage(session, response.usage)
+                return message.content or "", [
+                    {
+                        "id": tool_call.id,
+                        "type": tool_call.type,
+                        "function": {"name": tool_call.function.name, "arguments": tool_call.function.arguments}
+                    }
+                    for tool_call in message.tool_calls or []
+                ]
+
+            content_parts: List[str] = []
+            tool_calls: Dict[int, Dict[str, Any]] = {}
+            usage = None
+            async for chunk in response:
+                if getattr(chunk, "usage", None) and chunk.usage.completion_tokens:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    content_parts.append(delta.content)
+                    on_event("token", {"text": delta.content})
+                for tool_delta in delta.tool_calls or []:
+                    merge_tool_call_delta(tool_calls, tool_delta)
+                # The request timeout only bounds the wait for each chunk
+                if expired():
+                    await response.close()
+                    raise DeadlineExceeded("turn deadline reached while the answer was streaming")
+            span.set(completion_tokens=usage.completion_tokens if usage else None, tool_calls=len(tool_calls))
+        record_usage(self.model, usage)
+        self._count_usage(session, usage)
+        return "".join(content_parts), [tool_calls[index] for index in sorted(tool_calls)]
+
+    @staticmethod
+    def _count_usage(session: Session, usage) -> None:
+        stats = session.last_turn_stats
+        stats["requests"] += 1
+        # Estimated when the provider reports no usage, as in Agent
+        stats["prompt_tokens"] += (usage.prompt_tokens if usage else None) or session.context.last_prompt_tokens
+        if usage is not None:
+            stats["completion_tokens"] += usage.completion_tokens or 0
+
+    async def _handle_tool_calls(self, session: Session, content: str, tool_calls: List[Dict[str, Any]],
+                                 on_event: Optional[EventCallback] = None) -> None:
+        """Run the tool calls of one completion and add them and their results to the context."""
+        session.context.append({
+            "role": "assistant",
+            "content": content,
+            "tool_calls": tool_calls
+        })
+
+        calls = []
+        for tool_call in tool_calls:
+            try:
+                tool_args = json.loads(tool_call["function"]["arguments"])
+            except json.JSONDecodeError:
+                tool_args = {}
+            calls.append((tool_call["function"]["name"], tool_args))
+
+        with trace_span("tool_calls", "tool_round", calls=len(calls)):
+            tool_results = await self._execute_tools_concurrently(calls, on_event, session.last_turn_stats["tool_calls"])
+
+        for tool_call, tool_result in zip(tool_calls, tool_results):
+            self._append_tool_result(session, tool_call, tool_result)
+
+    @staticmethod
+    def _append_tool_result(session: Session, tool_call: Dict[str, Any], content: str) -> None:
+        session.context.append({
+            "role": "tool",
+            "tool_call_id": tool_call["id"],
+            "name": tool_call["function"]["name"],
+            "content": content
+        })
+        session.last_turn_stats["tool_results"].append((tool_call["function"]["name"], content))
+
+    @classmethod
+    def _answer_open_tool_calls(cls, session: Session, reason: str) -> None:
+        """Give tool calls left without a result by a cut-short turn an error result, so the context stays valid."""
+        for tool_call in open_tool_calls(session.context):
+            cls._append_tool_result(session, tool_call, serialize(ErrorResult(reason)))
+
+    async def process(self, user_input: str, session_id: str = "default",
+                      on_event: Optional[EventCallback] = None, use_cache: bool = True) -> str:
+        """
+        Process user input for one session
+
+        Turns of one session run in the order they arrive. With an
+        admission limiter installed, a turn also waits for a slot after it
+        gets its session's lock, and may be rejected by it.
+
+        Args:
+            user_input: The user's message/input
+            session_id: The conversation the message belongs to
+            on_event: Stream the completion and report tokens, tool calls and tool progress to this callback
+            use_cache: Replay and store completions in the response cache, if one is configured
+
+        Returns:
+            The agent's response
+        """
+        session = self.get_session(session_id)
+        session.pending += 1
+
+        try:
+            with trace_span("agent.process", "turn", model=self.model, session=session_id) as turn:
+                async with session.lock:
+                    if self.admission is not None:
+                        async with self.admission:
+                            return await self._run_turn(session, user_input, on_event, turn, use_cache)
+                    return await self._run_turn(session, user_input, on_event, turn, use_cache)
+        finally:
+            session.pending -= 1
+            session.last_used = time.monotonic()
+
+    async def _run_turn(self, session: Session, user_input: str, on_event: Optional[EventCallback], turn,
+                        use_cache: bool = True) -> str:
+        session.context.append({
+            "role": "user",
+            "content": user_input
+        })
+
+        session.last_turn_stats = {
+            "requests": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "tool_calls": [],
+            "cache_hits": 0,
+            "tool_results": [],
+            "timed_out": False,
+            "error": None
+        }
+
+        iterations = 0
+        deadline = None
+        try:
+            with deadline_scope(Config.TURN_TIMEOUT or math.inf) as deadline:
+                # Keep making calls until no more tool calls needed
+                while True:
+                    if expired():
+                        raise DeadlineExceeded("turn deadline reached")
+                    iterations += 1
+                    response_text, tool_calls = await self._complete(session, on_event, use_cache)
+                    if not tool_calls:
+                        break
+                    await self._handle_tool_calls(session, response_text, tool_calls, on_event)
+
+            session.context.append({
+                "role": "assistant",
+                "content": response_text
+            })
+
+            return response_text
+
+        except asyncio.CancelledError:
+            # E.g. the HTTP client went away; cancelling the tool tasks killed their subprocesses
+            self._answer_open_tool_calls(session, "cancelled")
+            turn.set(error="cancelled")
+            raise
+
+        except Exception as e:
+            if isinstance(e, DeadlineExceeded) or (deadline is not None and deadline.expired):
+                # Out of time, not broken: answer with what the tools found
+                turn.set(error="deadline")
+                session.last_turn_stats["timed_out"] = True
+                self._answer_open_tool_calls(session, "not run: the turn ran out of time")
+                answer = out_of_time_answer(session.last_turn_stats["tool_results"])
+                session.context.append({
+                    "role": "assistant",
+                    "content": answer
+                })
+                return answer
+
+            turn.set(error=str(e))
+            session.last_turn_stats["error"] = f"{type(e).__name__}: {e}"
+            error_msg = f"Error: {str(e)}"
+            session.context.append({
+                "role": "assistant",
+                "content": error_msg
+            })
+            return error_msg
+
+        finally:
+            turn.set(iterations=iterations, cache_hits=session.last_turn_stats["cache_hits"])
+            TURN_ITERATIONS.observe(iterations)
+
+    def reset_context(self, session_id: str = "default") -> None:
+        """Reset the conversation context of a session."""
+        self.get_session(session_id).reset()
+
+    def show_context(self, session_id: str = "default") -> List[Dict[str, Any]]:
+        """Show the current context of a session."""
+        return self.get_session(session_id).context.copy()
+
+    async def close(self) -> None:
+        """Close the HTTP clients of all providers."""
+        await self.providers.aclose()
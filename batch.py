@@ -0,0 +1,248 @@
+"""
+Batch mode: answer a JSONL file of questions with bounded concurrency.
+
+Each input line is one item:
+    {"id": "site-1", "prompt": "Is example.com reachable?", "model": "gpt-4o-mini", "persona": "minimal"}
+
+Only ``prompt`` is required; ``id`` defaults to the line number and
+``model``/``persona`` to the command line or Config. ``"cache": false``
+skips the LLM response cache for that item. Every item runs in
+its own fresh session. One JSON line per item is appended to the output
+as soon as it finishes, so a crashed or interrupted run can be started
+again with the same arguments and skips the items already answered.
+
+Usage:
+    python batch.py questions.jsonl -o answers.jsonl --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Iterator, Optional, Set, Tuple
+
+from async_agent import AsyncAgent
+from config import Config
+from tool_cache import ToolCache
+
+class BatchItem:
+    """One question from the input file."""
+
+    __slots__ = ("id", "prompt", "model", "persona", "use_cache")
+
+    def __init__(self, item_id: str, prompt: str, model: Optional[str], persona: Optional[str],
+                 use_cache: bool = True):
+        self.id = item_id
+        self.prompt = prompt
+        self.model = model
+        self.persona = persona
+        self.use_cache = use_cache
+
+def read_items(path: str) -> Iterator[BatchItem]:
+    """Yield the items of a JSONL file; blank lines are skipped, malformed ones raise ValueError."""
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path} line {number}: {e.msg}") from None
+            if not isinstance(data, dict) or not isinstance(data.get("prompt"), str) or not data["prompt"].strip():
+                raise ValueError(f"{path} line {number}: expected an object with a non-empty prompt")
+            yield BatchItem(str(data.get("id", f"line-{number}")), data["prompt"], data.get("model"), data.get("persona"),
+                            data.get("cache", True) is not False)
+
+def completed_ids(path: str) -> Set[str]:
+    """Ids already answered successfully in an earlier run's output; failed items are retried."""
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by a crash
+                continue
+            if isinstance(record, dict) and record.get("status") == "ok":
+                done.add(str(record.get("id")))
+    return done
+
+class BatchRunner:
+    """
+    Run items through AsyncAgent sessions, at most ``concurrency`` at a time.
+
+    Workers pull items from the input lazily, so memory does not grow with
+    the size of the file. There is one AsyncAgent per model/persona pair;
+    all of them share one tool cache, so a host probed for one item is not
+    probed again for the next one a few seconds later.
+    """
+
+    def __init__(self, output: str, concurrency: int, model: Optional[str] = None, persona: Optional[str] = None,
+                 use_cache: bool = True):
+        self.output = output
+        self.use_cache = use_cache
+        self.concurrency = max(1, concurrency)
+        self.model = model or Config.DEFAULT_MODEL
+        self.persona = persona or Config.DEFAULT_PERSONA
+        self.tool_cache = ToolCache(Config.TOOL_CACHE_ENTRIES, Config.TOOL_CACHE_MAX_BYTES)
+        self._agents: Dict[Tuple[str, str], AsyncAgent] = {}
+        self._file = None
+
+        self.done = 0
+        self.errors = 0
+        self.skipped = 0
+        self.latencies: List[float] = []
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def _agent(self, model: str, persona: str) -> AsyncAgent:
+        agent = self._agents.get((model, persona))
+        if agent is None:
+            agent = self._agents[(model, persona)] = AsyncAgent(model=model, persona=persona)
+            agent.tool_cache = self.tool_cache
+        return agent
+
+    async def run_item(self, item: BatchItem) -> Dict[str, Any]:
+        """Answer one item in a fresh session and build its result record."""
+        model = item.model or self.model
+        persona = item.persona or self.persona
+        record: Dict[str, Any] = {"id": item.id, "prompt": item.prompt, "model": model, "persona": persona}
+        if persona not in Config.get_available_personas():
+            record.update(status="error", error=f"unknown persona {persona}")
+            return record
+
+        agent = self._agent(model, persona)
+        # Ids are unique within a run, so the session is this item's alone
+        session_id = f"batch:{item.id}"
+        session = agent.get_session(session_id)
+        start = time.perf_counter()
+        try:
+            answer = await agent.process(item.prompt, session_id, use_cache=self.use_cache and item.use_cache)
+            stats = session.last_turn_stats
+        finally:
+            agent.close_session(session_id)
+        latency = time.perf_counter() - start
+
+        record.update(
+            status="error" if stats.get("error") else "timeout" if stats.get("timed_out") else "ok",
+            answer=answer,
+            tool_calls=stats.get("tool_calls", []),
+            latency_s=round(latency, 3),
+            usage={
+                "requests": stats.get("requests", 0),
+                "prompt_tokens": stats.get("prompt_tokens", 0),
+                "completion_tokens": stats.get("completion_tokens", 0)
+            },
+            cache_hits=stats.get("cache_hits", 0)
+        )
+        if stats.get("error"):
+            record["error"] = stats["error"]
+        return record
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        record["finished_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self._file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        # One line per item reaches the file before the next item is counted as done
+        self._file.flush()
+
+    async def _worker(self, items: Iterator[BatchItem], seen: Set[str]) -> None:
+        for item in items:
+            if item.id in seen:
+                self.skipped += 1
+                continue
+            seen.add(item.id)
+            try:
+                record = await self.run_item(item)
+            except Exception as e:
+                record = {"id": item.id, "prompt": item.prompt, "status": "error", "error": f"{type(e).__name__}: {e}"}
+
+            self.done += 1
+            if record["status"] != "ok":
+                self.errors += 1
+            else:
+                self.latencies.append(record["latency_s"])
+                self.prompt_tokens += record["usage"]["prompt_tokens"]
+                self.completion_tokens += record["usage"]["completion_tokens"]
+            self._write(record)
+
+    async def _report(self, started: float) -> None:
+        while True:
+            await asyncio.sleep(5)
+            elapsed = time.perf_counter() - started
+            print(f"📦 {self.done} done, {self.errors} errors, {self.done / elapsed:.1f} items/s", flush=True)
+
+    async def run(self, items: Iterator[BatchItem], seen: Optional[Set[str]] = None) -> None:
+        """Answer all items not in ``seen`` (completed ids), appending results to the output file."""
+        seen = set(seen or ())
+        self.skipped = 0
+        # A crash may have left a partial last line; start on a fresh one
+        needs_newline = False
+        if os.path.exists(self.output) and os.path.getsize(self.output):
+            with open(self.output, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"
+
+        started = time.perf_counter()
+        with open(self.output, "a", encoding="utf-8") as self._file:
+            if needs_newline:
+                self._file.write("\n")
+            reporter = asyncio.create_task(self._report(started))
+            try:
+                # Workers share one iterator; the event loop hands each item to exactly one of them
+                await asyncio.gather(*(self._worker(items, seen) for _ in range(self.concurrency)))
+            finally:
+                reporter.cancel()
+                for agent in self._agents.values():
+                    await agent.close()
+        self.elapsed = time.perf_counter() - started
+
+    def summary(self) -> str:
+        latencies = sorted(self.latencies)
+        line = (f"✅ {self.done - self.errors} answered, ❌ {self.errors} failed, ⏭️  {self.skipped} skipped "
+                f"in {self.elapsed:.1f}s ({self.done / self.elapsed if self.elapsed else 0:.1f} items/s)")
+        if latencies:
+            line += (f"\n⏱️  latency p50 {latencies[len(latencies) // 2]:.2f}s, "
+                     f"p95 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]:.2f}s; "
+                     f"tokens {self.prompt_tokens} prompt + {self.completion_tokens} completion")
+        return line
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of diagnostic questions")
+    parser.add_argument("input", help="JSONL file with one {\"id\", \"prompt\", \"model\", \"persona\"} object per line")
+    parser.add_argument("-o", "--output", help="JSONL results file (default: <input>.results.jsonl)")
+    parser.add_argument("-c", "--concurrency", type=int, default=Config.BATCH_CONCURRENCY,
+                        help="Items answered at the same time")
+    parser.add_argument("--model", help="Default model for items without one")
+    parser.add_argument("--persona", help="Default persona for items without one")
+    parser.add_argument("--no-cache", action="store_true", help="Skip the LLM response cache for every item")
+    args = parser.parse_args()
+
+    if not Config.validate():
+        sys.exit(1)
+    output = args.output or os.path.splitext(args.input)[0] + ".results.jsonl"
+
+    try:
+        # Validate the whole file up front rather than failing halfway through
+        total = sum(1 for _ in read_items(args.input))
+    except (OSError, ValueError) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+    done = completed_ids(output)
+    print(f"📋 {total} items in {args.input}, {len(done)} already answered in {output}; "
+          f"running {args.concurrency} at a time")
+
+    runner = BatchRunner(output, args.concurrency, args.model, args.persona, not args.no_cache)
+    try:
+        asyncio.run(runner.run(read_items(args.input), done))
+    except KeyboardInterrupt:
+        print(f"\n⏸️  Interrupted after {runner.done} items; run the same command again to resume")
+        sys.exit(130)
+    print(runner.summary())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Load benchmark for AsyncAgent.
+
+Runs many concurrent sessions on one event loop against the local fake
+OpenAI server. Each turn makes two LLM requests with a ping tool call in
+between; the ping tool is replaced by a fixed-latency fake (see
+benchmarks.fake_tools) so the numbers measure the agent, not the network.
+
+Usage:
+    python -m benchmarks.async_load --sessions 500 --turns 3
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+
+from config import Config
+from tool_registry import ToolRegistry
+from tools import percentile
+from benchmarks.fake_openai import FakeOpenAIServer
+from benchmarks.fake_tools import FakePingTool
+
+async def run_benchmark(sessions: int, turns: int, tool_latency: float,
+                        tools: Optional[ToolRegistry] = None) -> Dict[str, float]:
+    """Run ``sessions`` concurrent sessions of ``turns`` turns each (with only the fake ping tool by default)."""
+    from async_agent import AsyncAgent
+
+    agent = AsyncAgent()
+    agent.tools = tools or ToolRegistry([FakePingTool(tool_latency)])
+    latencies: List[float] = []
+
+    async def run_session(session_id: str) -> None:
+        for turn in range(turns):
+            start = time.perf_counter()
+            await agent.process(f"ping 127.0.0.1 (turn {turn})", session_id=session_id)
+            latencies.append(time.perf_counter() - start)
+
+    # Warm up lazy SDK imports and the connection pool before measuring
+    await agent.process("warm up", session_id="warmup")
+    agent.close_session("warmup")
+    latencies.clear()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_session(f"session-{i}") for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+    await agent.close()
+
+    return {
+        "sessions": sessions,
+        "turns": len(latencies),
+        "elapsed_s": elapsed,
+        "sessions_per_s": sessions / elapsed,
+        "turns_per_s": len(latencies) / elapsed,
+        "p50_turn_ms": percentile(sorted(latencies), 50) * 1000,
+        "p99_turn_ms": percentile(sorted(latencies), 99) * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="AsyncAgent load benchmark")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=2)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Fake LLM response delay in seconds")
+    parser.add_argument("--tool-latency", type=float, default=0.02, help="Fake ping delay in seconds")
+    args = parser.parse_args()
+
+    # Tool logging would dominate the measurement
+    logging.getLogger("tool_calls").disabled = True
+
+    server = FakeOpenAIServer(latency=args.llm_latency).start()
+    Config.OPENAI_BASE_URL = server.base_url
+    Config.OPENAI_API_KEY = Config.OPENAI_API_KEY or "benchmark"
+
+    try:
+        results = asyncio.run(run_benchmark(args.sessions, args.turns, args.tool_latency))
+    finally:
+        server.stop()
+
+    print("📊 AsyncAgent load benchmark")
+    for key, value in results.items():
+        print(f"  {key}: {value:.2f}" if isinstance(value, float) else f"  {key}: {value}")
+
+if __name__ == "__main__":
+    main()
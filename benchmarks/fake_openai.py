@@ -0,0 +1,278 @@
+"""
+Local stand-in for an OpenAI-compatible chat-completions API.
+
+The server answers every request from a script: a list of steps, each
+either a list of tool calls to request or the final answer. The step is
+picked by how many assistant messages follow the last user message, so
+the default "ping" script asks for a ``ping`` tool call and, once its
+result is in the context, returns a final answer. Requests with
+``stream: true`` get the same completion as server-sent events, with a
+usage chunk when ``stream_options.include_usage`` is set. It runs on its
+own event loop in a background thread so benchmarks can point an agent
+at it.
+
+Run standalone with:
+    python -m benchmarks.fake_openai --port 8765 --latency 0.05 --script diagnose
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+_ids = itertools.count(1)
+
+# Scripted conversations: rounds of (tool name, arguments) calls, then the final answer
+SCRIPTS: Dict[str, List[Any]] = {
+    "ping": [
+        [("ping", {"host": "127.0.0.1", "count": 1})],
+        "127.0.0.1 is reachable and latency looks normal."
+    ],
+    "diagnose": [
+        [("ping", {"host": "example.test", "count": 4}), ("dns_lookup", {"domain": "example.test"})],
+        [("traceroute", {"host": "example.test"})],
+        "example.test resolves, answers every ping in about 12ms and is 6 hops away; "
+        "hop 3 does not answer probes, which is normal for many routers."
+    ],
+    "chat": [
+        "I can ping hosts, trace routes and look up DNS records. Which host should I check?"
+    ],
+}
+
+def scripted_completion(request: Dict[str, Any], script: Optional[List[Any]] = None) -> Dict[str, Any]:
+    """Build the next completion of ``script`` (default: SCRIPTS["ping"]) for a chat request."""
+    script = script or SCRIPTS["ping"]
+    messages = request.get("messages", [])
+    prompt_tokens = sum(len(str(m.get("content") or "")) for m in messages) // 4
+
+    # Rounds already answered in this turn
+    step = 0
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            break
+        if message.get("role") == "assistant":
+            step += 1
+    step = min(step, len(script) - 1)
+
+    if isinstance(script[step], str):
+        message = {
+            "role": "assistant",
+            "content": script[step]
+        }
+        finish_reason = "stop"
+    else:
+        message = {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [{
+                "id": f"call_{next(_ids)}",
+                "type": "function",
+                "function": {
+                    "name": name,
+                    "arguments": json.dumps(arguments)
+                }
+            } for name, arguments in script[step]]
+        }
+        finish_reason = "tool_calls"
+
+    return {
+        "id": f"chatcmpl-{next(_ids)}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "fake-model"),
+        "choices": [{
+            "index": 0,
+            "message": message,
+            "finish_reason": finish_reason
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": 12,
+            "total_tokens": prompt_tokens + 12
+        }
+    }
+
+def stream_chunks(completion: Dict[str, Any], include_usage: bool = False) -> List[Dict[str, Any]]:
+    """Split a completion into the chunks a streaming response would send."""
+    message = completion["choices"][0]["message"]
+    base = {
+        "id": completion["id"],
+        "object": "chat.completion.chunk",
+        "created": completion["created"],
+        "model": completion["model"]
+    }
+    deltas: List[Dict[str, Any]] = [{"role": "assistant", "content": ""}]
+
+    for word in (message.get("content") or "").split(" "):
+        if word:
+            deltas.append({"content": word + " "})
+
+    for index, tool_call in enumerate(message.get("tool_calls") or []):
+        arguments = tool_call["function"]["arguments"]
+        deltas.append({"tool_calls": [{
+            "index": index,
+            "id": tool_call["id"],
+            "type": "function",
+            "function": {"name": tool_call["function"]["name"], "arguments": ""}
+        }]})
+        for start in range(0, len(arguments), 8):
+            deltas.append({"tool_calls": [{
+                "index": index,
+                "function": {"arguments": arguments[start:start + 8]}
+            }]})
+
+    chunks = [dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": None}]) for delta in deltas]
+    chunks.append(dict(base, choices=[{
+        "index": 0,
+        "delta": {},
+        "finish_reason": completion["choices"][0]["finish_reason"]
+    }]))
+    if include_usage:
+        chunks.append(dict(base, choices=[], usage=completion["usage"]))
+    return chunks
+
+class FakeOpenAIServer:
+    """Minimal HTTP/1.1 keep-alive server speaking the chat-completions API."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, chunk_delay: float = 0.0,
+                 script: str = "ping"):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        # Name of the SCRIPTS entry to answer with; may be changed between runs
+        self.script = script
+        self.requests = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get("content-length", "0")))
+                self.requests += 1
+
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+
+                try:
+                    request = json.loads(body or b"{}")
+                except ValueError:
+                    request = None
+
+                if request is not None and request.get("stream"):
+                    include_usage = bool((request.get("stream_options") or {}).get("include_usage"))
+                    await self._write_stream(writer, scripted_completion(request, SCRIPTS[self.script]), include_usage)
+                    continue
+
+                if request is not None:
+                    payload = json.dumps(scripted_completion(request, SCRIPTS[self.script])).encode()
+                    status = "200 OK"
+                else:
+                    payload = json.dumps({"error": {"message": "invalid JSON body"}}).encode()
+                    status = "400 Bad Request"
+
+                writer.write(
+                    f"HTTP/1.1 {status}\r\n"
+                    "Content-Type: application/json\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    "Connection: keep-alive\r\n\r\n".encode() + payload
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def _write_stream(self, writer: asyncio.StreamWriter, completion: Dict[str, Any],
+                            include_usage: bool = False) -> None:
+        """Send a completion as server-sent events with chunked encoding."""
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Transfer-Encoding: chunked\r\n"
+            b"Connection: keep-alive\r\n\r\n"
+        )
+        events = [f"data: {json.dumps(chunk)}\n\n" for chunk in stream_chunks(completion, include_usage)]
+        events.append("data: [DONE]\n\n")
+
+        for event in events:
+            data = event.encode()
+            writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            await writer.drain()
+            if self.chunk_delay:
+                await asyncio.sleep(self.chunk_delay)
+
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    def _run(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port, backlog=1024)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+        # Drop open keep-alive connections before closing the loop
+        self._server.close()
+        tasks = asyncio.all_tasks(self._loop)
+        for task in tasks:
+            task.cancel()
+        self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self._loop.close()
+
+    def start(self) -> "FakeOpenAIServer":
+        """Start serving in a background thread."""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self) -> None:
+        """Stop the server and wait for its thread."""
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread:
+            self._thread.join()
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each response")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="Seconds between streamed chunks")
+    parser.add_argument("--script", choices=sorted(SCRIPTS), default="ping", help="Scripted conversation to answer with")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(args.host, args.port, args.latency, args.chunk_delay, args.script).start()
+    print(f"Fake OpenAI API listening on {server.base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Deterministic stand-ins for the ping, traceroute and dig commands.
+
+Each fake is the real tool with the command replaced: after a fixed delay
+it feeds canned Linux-style output through the tool's own parser, so
+benchmarks exercise result parsing and serialization exactly as a real
+run would, without touching the network or depending on which binaries
+are installed. Outputs depend only on the arguments.
+"""
+import asyncio
+import time
+import zlib
+from typing import Any, Dict
+
+from results import ErrorResult, ToolResult
+from tool_registry import ToolRegistry
+from tools import CommandResult, PingTool, TracerouteTool, DNSLookupTool
+
+def fake_address(host: str) -> str:
+    """A stable documentation-range address for a host name."""
+    digest = zlib.crc32(host.encode())
+    return f"192.0.2.{digest % 250 + 1}"
+
+def ping_output(host: str, count: int) -> str:
+    """Output of ``ping -c count host`` with every reply around 12ms."""
+    address = fake_address(host)
+    rtts = [12.0 + (seq % 3) * 0.25 for seq in range(count)]
+    lines = [f"PING {host} ({address}) 56(84) bytes of data."]
+    lines += [f"64 bytes from {address}: icmp_seq={seq + 1} ttl=57 time={rtt:.2f} ms" for seq, rtt in enumerate(rtts)]
+    lines += [
+        "",
+        f"--- {host} ping statistics ---",
+        f"{count} packets transmitted, {count} received, 0% packet loss, time {count * 1000}ms",
+        f"rtt min/avg/max/mdev = {min(rtts):.3f}/{sum(rtts) / count:.3f}/{max(rtts):.3f}/0.204 ms"
+    ]
+    return "\n".join(lines) + "\n"
+
+def traceroute_output(host: str, hops: int = 6) -> str:
+    """Output of ``traceroute host`` over ``hops`` hops, with one silent hop."""
+    address = fake_address(host)
+    lines = [f"traceroute to {host} ({address}), 30 hops max, 60 byte packets"]
+    for ttl in range(1, hops + 1):
+        if ttl == 3:
+            lines.append(f" {ttl}  * * *")
+            continue
+        hop = address if ttl == hops else f"10.0.{ttl}.1"
+        base = ttl * 2.0
+        lines.append(f" {ttl}  {hop} ({hop})  {base:.3f} ms  {base + 0.1:.3f} ms  {base + 0.2:.3f} ms")
+    return "\n".join(lines) + "\n"
+
+def dig_output(domain: str, record_type: str) -> str:
+    """Output of ``dig domain record_type`` with one answer record."""
+    value = fake_address(domain) if record_type == "A" else f"10 mail.{domain}."
+    return (
+        f"; <<>> DiG 9.18.18 <<>> {domain} {record_type}\n"
+        ";; global options: +cmd\n"
+        ";; Got answer:\n"
+        ";; ->>HEADER<<- opcode: QUERY, status: NOERROR, id: 4242\n"
+        ";; flags: qr rd ra; QUERY: 1, ANSWER: 1, AUTHORITY: 0, ADDITIONAL: 1\n"
+        "\n"
+        ";; QUESTION SECTION:\n"
+        f";{domain}.\t\t\tIN\t{record_type}\n"
+        "\n"
+        ";; ANSWER SECTION:\n"
+        f"{domain}.\t\t300\tIN\t{record_type}\t{value}\n"
+        "\n"
+        ";; Query time: 4 msec\n"
+        ";; SERVER: 192.0.2.53#53(192.0.2.53) (UDP)\n"
+        ";; MSG SIZE  rcvd: 56\n"
+    )
+
+class CannedCommandTool:
+    """
+    Mixin for CommandTool subclasses: run nothing, wait ``latency`` seconds
+    and parse canned output. Results are not cached by default, so every
+    call pays the same delay.
+    """
+
+    CACHE_TTL = 0
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+
+    def canned_output(self, args: Dict[str, Any]) -> str:
+        raise NotImplementedError
+
+    def _completed(self, args: Dict[str, Any]) -> CommandResult:
+        cmd, _ = self.build_command(args)
+        return CommandResult(cmd, 0, self.canned_output(args), "")
+
+    def execute(self, args: Dict[str, Any]) -> ToolResult:
+        error = self.validate(args)
+        if error:
+            return ErrorResult(error)
+        time.sleep(self.latency)
+        return self.format_result(args, self._completed(args))
+
+    async def execute_async(self, args: Dict[str, Any]) -> ToolResult:
+        error = self.validate(args)
+        if error:
+            return ErrorResult(error)
+        await asyncio.sleep(self.latency)
+        return self.format_result(args, self._completed(args))
+
+class FakePingTool(CannedCommandTool, PingTool):
+    """ping that always gets every reply."""
+
+    def canned_output(self, args: Dict[str, Any]) -> str:
+        return ping_output(args.get("host", ""), args.get("count", 4))
+
+class FakeTracerouteTool(CannedCommandTool, TracerouteTool):
+    """traceroute that always finds the same six-hop path."""
+
+    def canned_output(self, args: Dict[str, Any]) -> str:
+        return traceroute_output(args.get("host", ""))
+
+class FakeDNSLookupTool(CannedCommandTool, DNSLookupTool):
+    """dig that always answers NOERROR with one record."""
+
+    def canned_output(self, args: Dict[str, Any]) -> str:
+        return dig_output(args.get("domain", ""), args.get("record_type", "A").upper())
+
+def fake_tools(latency: float = 0.0) -> ToolRegistry:
+    """A registry of the fake ping, traceroute and dns_lookup tools, each taking ``latency`` seconds."""
+    return ToolRegistry([FakePingTool(latency), FakeTracerouteTool(latency), FakeDNSLookupTool(latency)])
@@ -0,0 +1,64 @@
+"""
+Compare the in-process ICMP pinger with the ping subprocess.
+
+Pings a host (127.0.0.1 by default) repeatedly through both paths of
+PingTool and reports the wall time per call. The subprocess path is
+skipped when no ping binary is installed.
+
+Usage:
+    python -m benchmarks.ping_native --host 127.0.0.1 --runs 20 --count 1
+"""
+import argparse
+import logging
+import shutil
+import statistics
+import time
+from typing import Callable, Dict, List
+
+from config import Config
+from icmp import IcmpPinger
+from tools import PingTool
+
+def time_calls(call: Callable[[], str], runs: int) -> List[float]:
+    """Time ``runs`` calls and return their durations in milliseconds."""
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        call()
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+def main():
+    parser = argparse.ArgumentParser(description="Native ICMP vs ping subprocess benchmark")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--count", type=int, default=1, help="Probes per ping call")
+    args = parser.parse_args()
+
+    logging.getLogger("tool_calls").disabled = True
+    tool = PingTool()
+    tool_args = {"host": args.host, "count": args.count, "timeout": 1}
+    results: Dict[str, List[float]] = {}
+
+    try:
+        IcmpPinger().close()
+        Config.NATIVE_PING = True
+        results["native"] = time_calls(lambda: tool.execute(tool_args), args.runs)
+        print(f"native result:     {tool.execute(tool_args)}")
+    except OSError as e:
+        print(f"⚠️  native pinger unavailable: {e}")
+
+    if shutil.which("ping"):
+        Config.NATIVE_PING = False
+        results["subprocess"] = time_calls(lambda: tool.execute(tool_args), args.runs)
+        print(f"subprocess result: {tool.execute(tool_args)}")
+    else:
+        print("⚠️  ping command not found, skipping subprocess path")
+
+    print(f"\n📊 {args.runs} calls of {args.count} probe(s) to {args.host}")
+    for name, durations in results.items():
+        print(f"  {name:<10} median {statistics.median(durations):8.2f} ms   "
+              f"min {min(durations):8.2f} ms   max {max(durations):8.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Cold start benchmark: how long the agent takes before it can send its first request.
+
+Each run starts a fresh interpreter with ``-X importtime``, imports a
+module (``agent`` by default) and builds an Agent, which is all the work
+done before the first REPL prompt or ``--ask`` question. Reported:
+
+- the median wall time of the import and of building the agent
+- the import time of every module of the repository, self and cumulative
+- the slowest third-party packages imported on the way
+- whether the openai SDK was imported (it should only load on the first
+  LLM request)
+
+The first run is a warm-up that only fills the bytecode cache.
+
+Usage:
+    python -m benchmarks.startup --runs 10
+    python -m benchmarks.startup --module async_agent
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child interpreter; json is imported after the clock stops
+PROBE = """
+import time
+start = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+{setup}
+ready = time.perf_counter()
+import json, sys
+print(json.dumps({{"import_ms": (imported - start) * 1000, "setup_ms": (ready - imported) * 1000,
+                  "openai_loaded": "openai" in sys.modules}}))
+"""
+
+SETUPS = {
+    "agent": "agent.Agent()",
+    "async_agent": "async_agent.AsyncAgent()",
+}
+
+def repo_modules() -> List[str]:
+    return sorted(name[:-3] for name in os.listdir(ROOT) if name.endswith(".py"))
+
+def parse_importtime(stderr: str) -> Dict[str, Tuple[float, float]]:
+    """{module: (self_ms, cumulative_ms)} from the output of ``python -X importtime``."""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            self_us, cumulative_us = int(fields[0]), int(fields[1])
+        except ValueError:
+            # The header line
+            continue
+        times[fields[2].strip()] = (self_us / 1000, cumulative_us / 1000)
+    return times
+
+def run_once(module: str) -> Tuple[Dict[str, Any], Dict[str, Tuple[float, float]]]:
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "benchmark")
+    code = PROBE.format(module=module, setup=SETUPS.get(module, "pass"))
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, env=env,
+                             capture_output=True, text=True, timeout=120)
+    if process.returncode != 0:
+        raise RuntimeError(f"python -c 'import {module}' failed:\n{process.stderr[-2000:]}")
+    return json.loads(process.stdout.strip().splitlines()[-1]), parse_importtime(process.stderr)
+
+def measure_startup(runs: int = 5, module: str = "agent", top: int = 5) -> Dict[str, Any]:
+    """Median startup timings over ``runs`` fresh interpreters, per step and per module."""
+    run_once(module)
+    timings: List[Dict[str, Any]] = []
+    imports: List[Dict[str, Tuple[float, float]]] = []
+    for _ in range(max(1, runs)):
+        timing, modules = run_once(module)
+        timings.append(timing)
+        imports.append(modules)
+
+    def median(name: str, index: int) -> float:
+        return round(statistics.median(run.get(name, (0.0, 0.0))[index] for run in imports), 2)
+
+    results: Dict[str, Any] = {
+        "total": {
+            "import_ms": round(statistics.median(t["import_ms"] for t in timings), 2),
+            "setup_ms": round(statistics.median(t["setup_ms"] for t in timings), 2),
+            "openai_loaded": any(t["openai_loaded"] for t in timings)
+        }
+    }
+
+    own = set(repo_modules())
+    for name in sorted(own & set(imports[0]), key=lambda name: -median(name, 1)):
+        results[name] = {"self_ms": median(name, 0), "cumulative_ms": median(name, 1)}
+
+    # Top-level packages that are neither the repository's nor the standard library's
+    # (failed optional imports are listed too, so keep only what can be found)
+    third_party = [name for name in imports[0]
+                   if "." not in name and name not in own and name not in sys.stdlib_module_names
+                   and not name.startswith("_") and name not in ("sitecustomize", "usercustomize")
+                   and importlib.util.find_spec(name) is not None]
+    for name in sorted(third_party, key=lambda name: -median(name, 1))[:top]:
+        results[f"third_party:{name}"] = {"self_ms": median(name, 0), "cumulative_ms": median(name, 1)}
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start benchmark with per-module import times")
+    parser.add_argument("--runs", type=int, default=10, help="Fresh interpreters to start")
+    parser.add_argument("--module", default="agent", help="Module to import (agent, async_agent, server, ...)")
+    parser.add_argument("--top", type=int, default=5, help="Third-party packages to list")
+    args = parser.parse_args()
+
+    results = measure_startup(args.runs, args.module, args.top)
+    total = results.pop("total")
+    line = f"🚀 import {args.module}: median {total['import_ms']:.1f} ms"
+    if args.module in SETUPS:
+        line += f", then {total['setup_ms']:.1f} ms to build the agent"
+    print(f"{line} ({args.runs} runs)")
+    print(f"   openai SDK imported at startup: {'yes ⚠️' if total['openai_loaded'] else 'no'}")
+    print(f"\n📦 {'module':<28} {'self ms':>9} {'cumulative ms':>14}")
+    for name, values in results.items():
+        print(f"   {name:<28} {values['self_ms']:>9.2f} {values['cumulative_ms']:>14.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Local stub DNS server with canned records.
+
+Answers A/AAAA/MX/TXT/CNAME/NS queries from a fixed zone over UDP and TCP,
+returns NXDOMAIN with an SOA record for unknown names, and sets the
+truncation bit over UDP for names listed in ``truncate`` so clients have
+to retry over TCP. Used to exercise resolver.Resolver without network.
+"""
+import asyncio
+import socket
+import struct
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from resolver import RECORD_TYPES, build_query
+
+# (name, type) -> [(ttl, value)]
+DEFAULT_ZONE: Dict[Tuple[str, str], List[Tuple[int, str]]] = {
+    ("example.test", "A"): [(300, "192.0.2.10"), (300, "192.0.2.11")],
+    ("example.test", "AAAA"): [(300, "2001:db8::10")],
+    ("example.test", "MX"): [(600, "10 mail.example.test")],
+    ("example.test", "TXT"): [(60, "v=spf1 -all")],
+    ("example.test", "NS"): [(3600, "ns1.example.test")],
+    ("www.example.test", "CNAME"): [(120, "example.test")],
+    ("big.example.test", "TXT"): [(60, "x" * 200) for _ in range(5)],
+}
+
+def _encode_name(name: str) -> bytes:
+    return build_query(name, 1, 0)[12:-4]
+
+def _encode_rdata(rtype: str, value: str) -> bytes:
+    if rtype == "A":
+        return socket.inet_pton(socket.AF_INET, value)
+    if rtype == "AAAA":
+        return socket.inet_pton(socket.AF_INET6, value)
+    if rtype in ("CNAME", "NS"):
+        return _encode_name(value)
+    if rtype == "MX":
+        preference, exchange = value.split(" ", 1)
+        return struct.pack("!H", int(preference)) + _encode_name(exchange)
+    if rtype == "TXT":
+        data = value.encode()
+        return b"".join(bytes([len(data[i:i + 255])]) + data[i:i + 255] for i in range(0, len(data), 255))
+    raise ValueError(rtype)
+
+class StubDNSServer:
+    """Serves a fixed zone on localhost in a background thread."""
+
+    def __init__(self, zone: Optional[Dict] = None, truncate: Optional[Set[str]] = None,
+                 negative_ttl: int = 30, host: str = "127.0.0.1", port: int = 0):
+        self.zone = zone if zone is not None else DEFAULT_ZONE
+        self.truncate = truncate if truncate is not None else {"big.example.test"}
+        self.negative_ttl = negative_ttl
+        self.host = host
+        self.port = port
+        self.queries = 0
+        self.tcp_queries = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+
+    def answer(self, query: bytes, over_tcp: bool) -> bytes:
+        """Build the response to a query message."""
+        qid = struct.unpack("!H", query[:2])[0]
+        end = query.index(b"\0", 12) + 1
+        labels, offset = [], 12
+        while query[offset]:
+            labels.append(query[offset + 1:offset + 1 + query[offset]].decode())
+            offset += 1 + query[offset]
+        name = ".".join(labels).lower()
+        rtype_code = struct.unpack("!H", query[end:end + 2])[0]
+        rtype = next((k for k, v in RECORD_TYPES.items() if v == rtype_code), "")
+        question = query[12:end + 4]
+
+        records = list(self.zone.get((name, rtype), []))
+        answers = b""
+        count = 0
+        rcode = 0
+        # Follow one CNAME like a recursive server would
+        cname = self.zone.get((name, "CNAME"))
+        if not records and cname and rtype != "CNAME":
+            answers += _encode_name(name) + struct.pack("!HHIH", 5, 1, cname[0][0], len(_encode_name(cname[0][1]))) + _encode_name(cname[0][1])
+            count += 1
+            name, records = cname[0][1], list(self.zone.get((cname[0][1], rtype), []))
+        elif not records and rtype == "CNAME" and cname:
+            records = cname
+
+        for ttl, value in records:
+            rdata = _encode_rdata(rtype, value)
+            answers += _encode_name(name) + struct.pack("!HHIH", rtype_code, 1, ttl, len(rdata)) + rdata
+            count += 1
+
+        authority = b""
+        nscount = 0
+        if not count:
+            if not any(key[0] == name for key in self.zone):
+                rcode = 3
+            soa = _encode_name("ns1.example.test") + _encode_name("admin.example.test") + struct.pack(
+                "!IIIII", 1, 3600, 600, 86400, self.negative_ttl)
+            authority = _encode_name("example.test") + struct.pack("!HHIH", 6, 1, 3600, len(soa)) + soa
+            nscount = 1
+
+        flags = 0x8180 | rcode
+        if not over_tcp and name in self.truncate:
+            return struct.pack("!HHHHHH", qid, flags | 0x0200, 1, 0, 0, 0) + question
+        return struct.pack("!HHHHHH", qid, flags, 1, count, nscount, 0) + question + answers + authority
+
+    def _run(self) -> None:
+        server = self
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+
+        class UDP(asyncio.DatagramProtocol):
+            def connection_made(self, transport):
+                self.transport = transport
+
+            def datagram_received(self, data, addr):
+                server.queries += 1
+                self.transport.sendto(server.answer(data, over_tcp=False), addr)
+
+        async def handle_tcp(reader, writer):
+            try:
+                length = struct.unpack("!H", await reader.readexactly(2))[0]
+                query = await reader.readexactly(length)
+                server.queries += 1
+                server.tcp_queries += 1
+                response = server.answer(query, over_tcp=True)
+                writer.write(struct.pack("!H", len(response)) + response)
+                await writer.drain()
+            finally:
+                writer.close()
+
+        transport, _ = self._loop.run_until_complete(
+            self._loop.create_datagram_endpoint(UDP, local_addr=(self.host, self.port))
+        )
+        self.port = transport.get_extra_info("sockname")[1]
+        tcp = self._loop.run_until_complete(asyncio.start_server(handle_tcp, self.host, self.port))
+        self._ready.set()
+        self._loop.run_forever()
+        transport.close()
+        tcp.close()
+        self._loop.close()
+
+    def start(self) -> "StubDNSServer":
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self) -> None:
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread:
+            self._thread.join()
@@ -0,0 +1,342 @@
+"""
+Offline benchmark suite for the agent loop.
+
+Everything runs locally: the LLM is the scripted fake server from
+benchmarks.fake_openai and ping/traceroute/dig are the deterministic
+fakes from benchmarks.fake_tools. Six things are measured:
+
+- turn_latency: end-to-end Agent.process() time per scripted turn, with
+  and without streaming, at a fixed LLM and tool latency
+- loop_overhead: time each loop iteration spends in the agent itself,
+  i.e. a turn minus its LLM requests and tool rounds, with zero latency
+  everywhere (measured through a tracing hook)
+- context_serialization: cost of appending messages, preparing the
+  context and encoding the request body for contexts of several sizes
+- tool_registry: per-request cost of the tool schema, tool dispatch and
+  the response cache key with 3 and 60 registered tools
+- concurrency: AsyncAgent throughput and latency with N concurrent
+  sessions
+- startup: cold import time of the agent, in total and per module
+  (see benchmarks.startup)
+
+Results are written as JSON so two runs can be compared.
+
+Usage:
+    python -m benchmarks.suite --output before.json
+    python -m benchmarks.suite --compare before.json           # run, then compare with before.json
+    python -m benchmarks.suite --compare before.json after.json  # compare two saved runs only
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from config import Config
+from context import ContextWindow
+from results import serialize
+from tracing import Span, TraceHook, add_hook, remove_hook
+from tools import percentile
+from benchmarks.async_load import run_benchmark
+from benchmarks.fake_openai import FakeOpenAIServer
+from benchmarks.fake_tools import fake_tools, FakePingTool
+from benchmarks.startup import measure_startup
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+def summarize(values: List[float], scale: float = 1000.0, unit: str = "ms") -> Dict[str, float]:
+    """Mean and percentiles of durations in seconds, converted to ``unit``."""
+    if not values:
+        return {}
+    values = sorted(values)
+    return {
+        f"mean_{unit}": round(sum(values) / len(values) * scale, 3),
+        f"p50_{unit}": round(percentile(values, 50) * scale, 3),
+        f"p95_{unit}": round(percentile(values, 95) * scale, 3),
+        f"p99_{unit}": round(percentile(values, 99) * scale, 3),
+    }
+
+def measure_turn_latency(server: FakeOpenAIServer, script: str, stream: bool,
+                         turns: int, tool_latency: float) -> Dict[str, Any]:
+    """End-to-end latency of ``turns`` turns of one script, each in a fresh context."""
+    from agent import Agent
+
+    server.script = script
+    agent = Agent(stream=stream)
+    agent.tools = fake_tools(tool_latency)
+    agent.process("warm up")
+
+    latencies = []
+    requests_before = server.requests
+    try:
+        for turn in range(turns):
+            agent.reset_context()
+            start = time.perf_counter()
+            agent.process(f"check example.test (turn {turn})")
+            latencies.append(time.perf_counter() - start)
+    finally:
+        agent.close()
+
+    result = summarize(latencies)
+    result["llm_requests_per_turn"] = (server.requests - requests_before) / turns
+    return result
+
+class OverheadHook(TraceHook):
+    """Splits each traced turn into LLM time, tool time and everything else."""
+
+    def __init__(self):
+        self.open: Dict[int, Dict[str, float]] = {}
+        self.per_iteration: List[float] = []
+        self.llm_requests: List[float] = []
+
+    def on_span_end(self, span: Span) -> None:
+        totals = self.open.setdefault(span.trace_id, {"llm": 0.0, "tools": 0.0})
+        if span.kind == "llm":
+            totals["llm"] += span.duration
+            self.llm_requests.append(span.duration)
+        elif span.kind == "tool_round":
+            totals["tools"] += span.duration
+        elif span.kind == "turn":
+            del self.open[span.trace_id]
+            iterations = span.attributes.get("iterations") or 1
+            self.per_iteration.append((span.duration - totals["llm"] - totals["tools"]) / iterations)
+
+def measure_loop_overhead(server: FakeOpenAIServer, script: str, stream: bool, turns: int) -> Dict[str, Any]:
+    """Agent-side time per loop iteration with an instant LLM and instant tools."""
+    from agent import Agent
+
+    server.script = script
+    latency, server.latency = server.latency, 0.0
+    agent = Agent(stream=stream)
+    agent.tools = fake_tools(0.0)
+    agent.process("warm up")
+
+    hook = add_hook(OverheadHook())
+    try:
+        for turn in range(turns):
+            agent.reset_context()
+            agent.process(f"check example.test (turn {turn})")
+    finally:
+        remove_hook(hook)
+        server.latency = latency
+        agent.close()
+
+    result = {"per_iteration_" + key: value for key, value in summarize(hook.per_iteration, 1e6, "us").items()}
+    result.update({"llm_request_" + key: value for key, value in summarize(hook.llm_requests).items()})
+    return result
+
+def filled_context(messages: int) -> ContextWindow:
+    """A context holding about ``messages`` messages of realistic ping turns, with no trimming."""
+    context = ContextWindow("You are a network diagnostics assistant.", max_tokens=10 ** 9, max_messages=10 ** 9)
+    ping = serialize(FakePingTool().execute({"host": "example.test", "count": 4}))
+    turn = 0
+    while len(context.messages) < messages:
+        call_id = f"call_{turn}"
+        context.append({"role": "user", "content": f"Is example.test reachable? (turn {turn})"})
+        context.append({"role": "assistant", "content": None, "tool_calls": [{
+            "id": call_id, "type": "function",
+            "function": {"name": "ping", "arguments": '{"host": "example.test", "count": 4}'}
+        }]})
+        context.append({"role": "tool", "tool_call_id": call_id, "name": "ping", "content": ping})
+        context.append({"role": "assistant", "content": "example.test is reachable with about 12ms latency."})
+        turn += 1
+    return context
+
+def time_per_call(call, min_time: float = 0.2) -> float:
+    """Seconds per call of ``call``, repeated for at least ``min_time`` seconds."""
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        call()
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / runs
+
+def measure_context_serialization(sizes: List[int]) -> Dict[str, Any]:
+    """Per-call cost of append, prepare and request encoding at several context sizes."""
+    schema = fake_tools().schema()
+    results = {}
+    for size in sizes:
+        context = filled_context(size)
+        message = context.messages[3]
+
+        def append() -> None:
+            context.append(message)
+            context.messages.pop()
+            context.total_tokens -= context._tokens.pop()
+
+        def encode() -> str:
+            return json.dumps({"model": Config.DEFAULT_MODEL, "messages": context.prepare(),
+                               "tools": schema, "tool_choice": "auto"})
+
+        results[f"{size}_messages"] = {
+            "append_us": round(time_per_call(append) * 1e6, 2),
+            "prepare_us": round(time_per_call(context.prepare) * 1e6, 2),
+            "encode_request_us": round(time_per_call(encode) * 1e6, 2),
+            "request_bytes": len(encode()),
+            "prompt_tokens": context.total_tokens
+        }
+    return results
+
+def measure_tool_registry(counts: List[int]) -> Dict[str, Any]:
+    """Per-request cost of the tool registry as the number of tools grows."""
+    from response_cache import ResponseCache
+
+    messages = filled_context(10).prepare()
+    results = {}
+    for count in counts:
+        registry = fake_tools()
+        for index in range(len(registry), count):
+            tool = FakePingTool()
+            tool.name = f"diagnostic_{index}"
+            registry.add(tool)
+        last = registry.names()[-1]
+        results[f"{count}_tools"] = {
+            "schema_us": round(time_per_call(registry.schema) * 1e6, 3),
+            "dispatch_us": round(time_per_call(lambda: registry.get(last)) * 1e6, 3),
+            "cache_key_us": round(time_per_call(
+                lambda: ResponseCache.key(Config.DEFAULT_MODEL, registry.fingerprint, messages)) * 1e6, 2),
+            "schema_bytes": len(registry.schema_json)
+        }
+    return results
+
+def measure_concurrency(server: FakeOpenAIServer, sessions: List[int], turns: int,
+                        tool_latency: float) -> Dict[str, Any]:
+    """AsyncAgent throughput for each number of concurrent sessions."""
+    server.script = "diagnose"
+    results = {}
+    for count in sessions:
+        outcome = asyncio.run(run_benchmark(count, turns, tool_latency, tools=fake_tools(tool_latency)))
+        results[f"{count}_sessions"] = {key: round(value, 3) if isinstance(value, float) else value
+                                        for key, value in outcome.items()}
+    return results
+
+def run_suite(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run every benchmark and return the results with run metadata."""
+    # Per-call logging would dominate the agent-side numbers
+    logging.getLogger("tool_calls").disabled = True
+
+    server = FakeOpenAIServer(latency=args.llm_latency, chunk_delay=args.chunk_delay).start()
+    Config.OPENAI_BASE_URL = server.base_url
+    Config.OPENAI_API_KEY = Config.OPENAI_API_KEY or "benchmark"
+
+    results: Dict[str, Any] = {"meta": run_metadata(args)}
+    try:
+        print("⏱️  turn latency...")
+        results["turn_latency"] = {
+            f"{script}/{'stream' if stream else 'nonstream'}": measure_turn_latency(
+                server, script, stream, args.turns, args.tool_latency
+            )
+            for script in ("ping", "diagnose")
+            for stream in (False, True)
+        }
+        print("🔬 loop overhead...")
+        results["loop_overhead"] = {
+            f"diagnose/{'stream' if stream else 'nonstream'}": measure_loop_overhead(server, "diagnose", stream, args.turns)
+            for stream in (False, True)
+        }
+        print("📏 context serialization...")
+        results["context_serialization"] = measure_context_serialization([10, 50, 200])
+        print("🧰 tool registry...")
+        results["tool_registry"] = measure_tool_registry([3, 60])
+        print("🔀 concurrent sessions...")
+        results["concurrency"] = measure_concurrency(server, args.sessions, args.session_turns, args.tool_latency)
+        print("🚀 startup...")
+        results["startup"] = measure_startup(args.startup_runs)
+    finally:
+        server.stop()
+    return results
+
+def run_metadata(args: argparse.Namespace) -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, timeout=5, cwd=os.path.dirname(__file__)).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit or None,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+    }
+
+def flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    """Numeric leaves as {"turn_latency.ping/stream.p50_ms": 41.2, ...}, without metadata."""
+    flat = {}
+    for key, value in results.items():
+        if key == "meta":
+            continue
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+def compare(old: Dict[str, Any], new: Dict[str, Any]) -> None:
+    """Print every metric of two runs side by side with the relative change."""
+    before, after = flatten(old), flatten(new)
+    print(f"📊 {old['meta'].get('commit') or old['meta']['timestamp']} → {new['meta'].get('commit') or new['meta']['timestamp']}")
+    width = max((len(name) for name in after), default=0)
+    for name, value in after.items():
+        previous = before.get(name)
+        if previous is None:
+            print(f"  {name:<{width}}  {'-':>12}  {value:>12g}")
+            continue
+        change = f"{(value - previous) / previous:+.1%}" if previous else ""
+        print(f"  {name:<{width}}  {previous:>12g}  {value:>12g}  {change}")
+
+def print_results(results: Dict[str, Any]) -> None:
+    for section, entries in results.items():
+        if section == "meta":
+            continue
+        print(f"\n{section}")
+        for name, values in entries.items():
+            print(f"  {name}: " + ", ".join(f"{key}={value}" for key, value in values.items()))
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite for the agent loop")
+    parser.add_argument("--turns", type=int, default=20, help="Turns per latency/overhead measurement")
+    parser.add_argument("--llm-latency", type=float, default=0.02, help="Fake LLM response delay in seconds")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="Fake delay between streamed chunks in seconds")
+    parser.add_argument("--tool-latency", type=float, default=0.005, help="Fake tool delay in seconds")
+    parser.add_argument("--sessions", type=lambda value: [int(n) for n in value.split(",")], default=[1, 50, 200],
+                        help="Comma-separated concurrent session counts")
+    parser.add_argument("--session-turns", type=int, default=2, help="Turns per concurrent session")
+    parser.add_argument("--startup-runs", type=int, default=5, help="Fresh interpreters for the startup benchmark")
+    parser.add_argument("--output", help="Where to save the JSON results (default: benchmarks/results/<time>.json)")
+    parser.add_argument("--compare", nargs="+", metavar="RESULTS",
+                        help="Compare with a saved run, or compare two saved runs without running")
+    args = parser.parse_args()
+
+    if args.compare and len(args.compare) == 2:
+        with open(args.compare[0], encoding="utf-8") as f_old, open(args.compare[1], encoding="utf-8") as f_new:
+            compare(json.load(f_old), json.load(f_new))
+        return
+
+    results = run_suite(args)
+    print_results(results)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare[0], encoding="utf-8") as f:
+            print()
+            compare(json.load(f), results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Measure what tool call logging costs the calling thread.
+
+Runs a fake probe (a short sleep) through execute_with_logging from many
+threads at once and reports the per-call latency with logging off, with
+the queue-based JSON-lines logger, and with the previous style of seven
+synchronous log lines per call going to a FileHandler and the console.
+
+Usage:
+    python -m benchmarks.tool_logging --threads 32 --calls 200 --probe-ms 1
+"""
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import tool_log
+from results import PingResult
+from tools import Tool
+
+class FakeProbeTool(Tool):
+    """Tool that waits like a network probe and returns a fixed ping result."""
+
+    RESULT = PingResult.from_replies("127.0.0.1", "127.0.0.1", [0.1, 0.12, 0.11, 0.13])
+
+    def __init__(self, probe_seconds: float):
+        super().__init__(name="fake_probe", description="Sleeps, then returns a ping result")
+        self.probe_seconds = probe_seconds
+
+    def execute(self, args: Dict[str, Any]) -> PingResult:
+        time.sleep(self.probe_seconds)
+        return self.RESULT
+
+    @property
+    def parameters(self) -> Dict[str, Any]:
+        return {"type": "object", "properties": {}, "required": []}
+
+class SyncLineLoggingTool(FakeProbeTool):
+    """The previous logging style: several formatted lines per call, written synchronously."""
+
+    logger = logging.getLogger("benchmark_sync_lines")
+
+    def execute_with_logging(self, args: Dict[str, Any]):
+        start = time.time()
+        self.logger.info(f"🚀 CALLING TOOL: {self.name}")
+        self.logger.info(f"📋 Arguments: {args}")
+        self.logger.info(f"⏰ Started at: {time.strftime('%Y-%m-%d %H:%M:%S')}")
+        result = self.execute(args)
+        text = str(result)
+        self.logger.info(f"✅ TOOL COMPLETED: {self.name}")
+        self.logger.info(f"⏱️  Execution time: {time.time() - start:.2f}s")
+        self.logger.info(f"📊 Result: {text[:100]}{'...' if len(text) > 100 else ''}")
+        self.logger.info("-" * 60)
+        return result
+
+def measure(tool: Tool, threads: int, calls: int) -> List[float]:
+    """Per-call latency in microseconds with ``threads`` callers."""
+    def worker(_: int) -> List[float]:
+        durations = []
+        for _ in range(calls):
+            start = time.perf_counter()
+            tool.execute_with_logging({"host": "127.0.0.1", "count": 4})
+            durations.append((time.perf_counter() - start) * 1e6)
+        return durations
+
+    with ThreadPoolExecutor(threads) as pool:
+        return [d for chunk in pool.map(worker, range(threads)) for d in chunk]
+
+def report(name: str, durations: List[float]) -> None:
+    durations.sort()
+    print(f"  {name:<16} median {statistics.median(durations):8.1f} µs   "
+          f"p99 {durations[int(len(durations) * 0.99) - 1]:8.1f} µs")
+
+def main():
+    parser = argparse.ArgumentParser(description="Tool call logging overhead benchmark")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--calls", type=int, default=200, help="Calls per thread")
+    parser.add_argument("--probe-ms", type=float, default=1.0, help="Simulated probe time")
+    args = parser.parse_args()
+    probe = args.probe_ms / 1000
+
+    directory = tempfile.mkdtemp()
+    null = open(os.devnull, "w")
+
+    # Logging off
+    tool_log._tool_logger = tool_log.ToolCallLogger(path="", console=False)
+    tool_log._tool_logger.logger.disabled = True
+    off = measure(FakeProbeTool(probe), args.threads, args.calls)
+    tool_log._tool_logger.close()
+    tool_log._tool_logger.logger.disabled = False
+
+    # Queue-based JSON lines, file plus console echo (to /dev/null)
+    tool_log._tool_logger = tool_log.ToolCallLogger(path=os.path.join(directory, "queued.log"), console=False)
+    console = tool_log.BatchedStreamHandler(null)
+    console.setFormatter(tool_log.ConsoleFormatter())
+    tool_log._tool_logger.handlers.append(console)
+    queued = measure(FakeProbeTool(probe), args.threads, args.calls)
+    tool_log._tool_logger.close()
+    written = sum(1 for _ in open(os.path.join(directory, "queued.log"), encoding="utf-8"))
+
+    # Previous style: synchronous FileHandler and console handler
+    sync_logger = SyncLineLoggingTool.logger
+    sync_logger.setLevel(logging.INFO)
+    sync_logger.propagate = False
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    for handler in (logging.FileHandler(os.path.join(directory, "sync.log"), encoding="utf-8"), logging.StreamHandler(null)):
+        handler.setFormatter(formatter)
+        sync_logger.addHandler(handler)
+    sync = measure(SyncLineLoggingTool(probe), args.threads, args.calls)
+
+    print(f"📊 {args.threads} threads x {args.calls} calls, {args.probe_ms}ms probes")
+    report("no logging", off)
+    report("queued jsonl", queued)
+    report("sync lines", sync)
+    print(f"  {written} JSON lines written, {tool_log._tool_logger.dropped} dropped; log files in {directory}")
+
+if __name__ == "__main__":
+    main()
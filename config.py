@@ -1,9 +1,25 @@
 import os
 from typing import Optional
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+def _find_env_file() -> Optional[str]:
+    """The nearest .env in this directory or a parent, where load_dotenv() would look."""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        path = os.path.join(directory, ".env")
+        if os.path.isfile(path):
+            return path
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+# Load environment variables from .env file, once; python-dotenv is only
+# imported when there is one, which saves its import on every start of a
+# CLI configured through the environment
+_env_file = _find_env_file()
+if _env_file:
+    from dotenv import load_dotenv
+    load_dotenv(_env_file)
 
 class Config:
     """Configuration management for the ping agent."""
@@ -17,13 +33,85 @@ class Config:
     DEFAULT_PERSONA: str = os.getenv("AGENT_PERSONA", "network_specialist")
 
     # Agent Configuration
-    MAX_CONTEXT_LENGTH: int = int(os.getenv("MAX_CONTEXT_LENGTH", "10"))
+    # Optional cap on the number of messages kept, on top of the token budget (0 = no cap)
+    MAX_CONTEXT_LENGTH: int = int(os.getenv("MAX_CONTEXT_LENGTH", "0"))
+    MAX_CONTEXT_TOKENS: int = int(os.getenv("MAX_CONTEXT_TOKENS", "8000"))
     MAX_TOOL_TIMEOUT: int = int(os.getenv("MAX_TOOL_TIMEOUT", "60"))
+    # Time budget of one user turn, shared by its LLM requests and tool calls (0 = no limit)
+    TURN_TIMEOUT: float = float(os.getenv("TURN_TIMEOUT", "120"))
+    MAX_TOOL_CONCURRENCY: int = int(os.getenv("MAX_TOOL_CONCURRENCY", "8"))
+    STREAM_RESPONSES: bool = os.getenv("STREAM_RESPONSES", "false").lower() == "true"
+    TOOL_CACHE_ENTRIES: int = int(os.getenv("TOOL_CACHE_ENTRIES", "256"))
+    TOOL_CACHE_MAX_BYTES: int = int(os.getenv("TOOL_CACHE_MAX_BYTES", "1048576"))
 
     # Tool Configuration
     DEFAULT_PING_COUNT: int = int(os.getenv("DEFAULT_PING_COUNT", "4"))
     DEFAULT_PING_TIMEOUT: int = int(os.getenv("DEFAULT_PING_TIMEOUT", "3"))
+    NATIVE_PING: bool = os.getenv("NATIVE_PING", "true").lower() == "true"
     DEFAULT_TRACEROUTE_HOPS: int = int(os.getenv("DEFAULT_TRACEROUTE_HOPS", "15"))
+    SWEEP_WINDOW: int = int(os.getenv("SWEEP_WINDOW", "256"))
+    # ping_sweep only reads inventory files inside this directory; empty disables them
+    INVENTORY_DIR: str = os.getenv("INVENTORY_DIR", "inventory")
+    TCP_CONNECT_WINDOW: int = int(os.getenv("TCP_CONNECT_WINDOW", "512"))
+    DNS_NAMESERVERS: str = os.getenv("DNS_NAMESERVERS", "")
+    DNS_TIMEOUT: float = float(os.getenv("DNS_TIMEOUT", "2"))
+    # Load tools from installed packages' "ping_agent.tools" entry points
+    TOOL_PLUGINS: bool = os.getenv("TOOL_PLUGINS", "true").lower() == "true"
+
+    # Tool Call Logging
+    TOOL_LOG_FILE: str = os.getenv("TOOL_LOG_FILE", "tool_calls.log")
+    TOOL_LOG_CONSOLE: bool = os.getenv("TOOL_LOG_CONSOLE", "true").lower() == "true"
+    TOOL_LOG_MAX_BYTES: int = int(os.getenv("TOOL_LOG_MAX_BYTES", "10485760"))
+    TOOL_LOG_BACKUPS: int = int(os.getenv("TOOL_LOG_BACKUPS", "5"))
+    TOOL_LOG_ROTATE_SECONDS: int = int(os.getenv("TOOL_LOG_ROTATE_SECONDS", "0"))
+    TOOL_LOG_SAMPLE: str = os.getenv("TOOL_LOG_SAMPLE", "")
+
+    # Metrics endpoint (Prometheus text format, 0 disables it)
+    METRICS_PORT: int = int(os.getenv("METRICS_PORT", "0"))
+    METRICS_HOST: str = os.getenv("METRICS_HOST", "127.0.0.1")
+
+    # Tracing exporters (empty disables them)
+    TRACE_FILE: str = os.getenv("TRACE_FILE", "")
+    TRACE_CHROME_FILE: str = os.getenv("TRACE_CHROME_FILE", "")
+
+    # HTTP API server (server.py)
+    SERVER_HOST: str = os.getenv("SERVER_HOST", "127.0.0.1")
+    SERVER_PORT: int = int(os.getenv("SERVER_PORT", "8080"))
+    SERVER_TOKEN: str = os.getenv("SERVER_TOKEN", "")
+    SERVER_MAX_SESSIONS: int = int(os.getenv("SERVER_MAX_SESSIONS", "1000"))
+    SERVER_SESSION_IDLE: float = float(os.getenv("SERVER_SESSION_IDLE", "1800"))
+    SERVER_SESSION_QUEUE: int = int(os.getenv("SERVER_SESSION_QUEUE", "4"))
+    SERVER_MAX_CONCURRENT: int = int(os.getenv("SERVER_MAX_CONCURRENT", "8"))
+    SERVER_MAX_QUEUED: int = int(os.getenv("SERVER_MAX_QUEUED", "32"))
+    SERVER_QUEUE_TIMEOUT: float = float(os.getenv("SERVER_QUEUE_TIMEOUT", "30"))
+
+    # LLM provider pool: fallback endpoints, retries and hedging
+    LLM_FALLBACKS: str = os.getenv("LLM_FALLBACKS", "")
+    LLM_RETRIES: int = int(os.getenv("LLM_RETRIES", "2"))
+    LLM_BACKOFF: float = float(os.getenv("LLM_BACKOFF", "0.5"))
+    LLM_COOLDOWN: float = float(os.getenv("LLM_COOLDOWN", "30"))
+    LLM_HEDGE: bool = os.getenv("LLM_HEDGE", "false").lower() == "true"
+    LLM_KEEPALIVE: float = float(os.getenv("LLM_KEEPALIVE", "120"))
+    LLM_MAX_CONNECTIONS: int = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+
+    # Persistent LLM response cache (off unless a file is set)
+    LLM_CACHE_FILE: str = os.getenv("LLM_CACHE_FILE", "")
+    LLM_CACHE_MAX_BYTES: int = int(os.getenv("LLM_CACHE_MAX_BYTES", "67108864"))
+
+    # Batch mode (batch.py)
+    BATCH_CONCURRENCY: int = int(os.getenv("BATCH_CONCURRENCY", "16"))
+
+    # Probe history (probe_history tool); HISTORY_FILE keeps it across restarts
+    HISTORY_CAPACITY: int = int(os.getenv("HISTORY_CAPACITY", "4096"))
+    HISTORY_MAX_SERIES: int = int(os.getenv("HISTORY_MAX_SERIES", "256"))
+    HISTORY_FILE: str = os.getenv("HISTORY_FILE", "")
+
+    # Monitoring daemon (monitor.py)
+    MONITOR_INTERVAL: float = float(os.getenv("MONITOR_INTERVAL", "60"))
+    MONITOR_COOLDOWN: float = float(os.getenv("MONITOR_COOLDOWN", "600"))
+    MONITOR_FAILURES: int = int(os.getenv("MONITOR_FAILURES", "2"))
+    MONITOR_DEVIATIONS: float = float(os.getenv("MONITOR_DEVIATIONS", "3"))
+    MONITOR_ALERT_LOG: str = os.getenv("MONITOR_ALERT_LOG", "monitor_alerts.log")
 
     @classmethod
     def validate(cls) -> bool:
@@ -69,12 +157,39 @@ class Config:
         print("🔧 Ping Agent Configuration:")
         print(f"  Base URL: {cls.OPENAI_BASE_URL}")
         print(f"  Model: {cls.DEFAULT_MODEL}")
+        print(f"  Fallback Providers: {len([e for e in cls.LLM_FALLBACKS.split(',') if e.strip()]) or 'none'} "
+              f"({cls.LLM_RETRIES} retries, backoff {cls.LLM_BACKOFF:g}s, cooldown {cls.LLM_COOLDOWN:g}s, "
+              f"hedging {'on' if cls.LLM_HEDGE else 'off'}, keep-alive {cls.LLM_KEEPALIVE:g}s)")
         print(f"  Persona: {cls.DEFAULT_PERSONA}")
-        print(f"  Max Context Length: {cls.MAX_CONTEXT_LENGTH}")
+        print(f"  Max Context Length: {cls.MAX_CONTEXT_LENGTH or 'none'}")
+        print(f"  Max Context Tokens: {cls.MAX_CONTEXT_TOKENS}")
         print(f"  Max Tool Timeout: {cls.MAX_TOOL_TIMEOUT}s")
+        print(f"  Turn Timeout: {f'{cls.TURN_TIMEOUT:g}s' if cls.TURN_TIMEOUT else 'none'}")
+        print(f"  Max Tool Concurrency: {cls.MAX_TOOL_CONCURRENCY}")
+        print(f"  Stream Responses: {cls.STREAM_RESPONSES}")
+        print(f"  LLM Response Cache: {cls.LLM_CACHE_FILE or 'off'} (max {cls.LLM_CACHE_MAX_BYTES} bytes)")
+        print(f"  Tool Cache: {cls.TOOL_CACHE_ENTRIES} entries, {cls.TOOL_CACHE_MAX_BYTES} bytes")
         print(f"  Default Ping Count: {cls.DEFAULT_PING_COUNT}")
         print(f"  Default Ping Timeout: {cls.DEFAULT_PING_TIMEOUT}s")
+        print(f"  Native Ping: {cls.NATIVE_PING}")
         print(f"  Default Traceroute Hops: {cls.DEFAULT_TRACEROUTE_HOPS}")
+        print(f"  Sweep Window: {cls.SWEEP_WINDOW}")
+        print(f"  Inventory Directory: {cls.INVENTORY_DIR or 'off'}")
+        print(f"  TCP Connect Window: {cls.TCP_CONNECT_WINDOW}")
+        print(f"  DNS Nameservers: {cls.DNS_NAMESERVERS or 'system default'}")
+        print(f"  DNS Timeout: {cls.DNS_TIMEOUT}s")
+        print(f"  Tool Plugins: {cls.TOOL_PLUGINS}")
+        print(f"  Tool Log: {cls.TOOL_LOG_FILE or 'off'} (max {cls.TOOL_LOG_MAX_BYTES} bytes x {cls.TOOL_LOG_BACKUPS}, "
+              f"console {'on' if cls.TOOL_LOG_CONSOLE else 'off'}, sample {cls.TOOL_LOG_SAMPLE or 'all'})")
+        print(f"  Metrics: {f'http://{cls.METRICS_HOST}:{cls.METRICS_PORT}/metrics' if cls.METRICS_PORT else 'off'}")
+        print(f"  Tracing: {', '.join(filter(None, [cls.TRACE_FILE, cls.TRACE_CHROME_FILE])) or 'off'}")
+        print(f"  API Server: http://{cls.SERVER_HOST}:{cls.SERVER_PORT} ({cls.SERVER_MAX_CONCURRENT} concurrent turns, "
+              f"{cls.SERVER_MAX_QUEUED} queued, {cls.SERVER_MAX_SESSIONS} sessions, token {'set' if cls.SERVER_TOKEN else 'off'})")
+        print(f"  Batch Concurrency: {cls.BATCH_CONCURRENCY}")
+        print(f"  Probe History: {cls.HISTORY_CAPACITY} samples x {cls.HISTORY_MAX_SERIES} series, "
+              f"{cls.HISTORY_FILE or 'in memory'}")
+        print(f"  Monitor: every {cls.MONITOR_INTERVAL:g}s, {cls.MONITOR_FAILURES} bad probes to change state, "
+              f"{cls.MONITOR_DEVIATIONS:g} std devs, cooldown {cls.MONITOR_COOLDOWN:g}s, alerts to {cls.MONITOR_ALERT_LOG or 'console'}")
         print(f"  OpenAI API Key: {'✅ Set' if cls.OPENAI_API_KEY else '❌ Not set'}")
 
     @classmethod
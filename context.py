@@ -0,0 +1,154 @@
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Fixed per-message cost of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_encoding = None
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens in a piece of text.
+
+    Uses tiktoken when it is installed and falls back to the common
+    estimate of four characters per token otherwise.
+    """
+    global _encoding
+    if not text:
+        return 0
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        return len(_encoding.encode(text))
+    return len(text) // 4 + 1
+
+def count_message_tokens(message: Dict[str, Any]) -> int:
+    """Count the tokens a single chat message adds to a prompt."""
+    tokens = MESSAGE_OVERHEAD_TOKENS + count_tokens(message.get("content") or "")
+    for tool_call in message.get("tool_calls") or []:
+        function = tool_call.get("function", {})
+        tokens += count_tokens(function.get("name", "")) + count_tokens(function.get("arguments", ""))
+    return tokens
+
+class ContextWindow:
+    """
+    Conversation context kept within a token budget, and optionally a message cap.
+
+    Token counts are computed once per message as it is appended. When the
+    budget is exceeded, completed turns are trimmed oldest first: a turn is
+    first compacted to its user question and final answer, dropping the
+    tool calls and raw tool output, and then dropped entirely. The system
+    message and the current turn are never removed, and an assistant
+    tool_calls message is always removed together with its tool results.
+    """
+
+    def __init__(self, system_prompt: str, max_tokens: int, max_messages: Optional[int] = None):
+        self.system_prompt = system_prompt
+        self.max_tokens = max_tokens
+        # Falsy for no cap on the number of messages
+        self.max_messages = max_messages
+        self.messages: List[Dict[str, Any]] = []
+        self._tokens: List[int] = []
+        self.total_tokens = 0
+
+        # Prompt size of the last request and the running total trimmed away
+        self.last_prompt_tokens = 0
+        self.tokens_saved = 0
+
+        self.reset()
+
+    def reset(self) -> None:
+        """Reset the context to just the system message."""
+        self.messages = []
+        self._tokens = []
+        self.total_tokens = 0
+        self.append({
+            "role": "system",
+            "content": self.system_prompt
+        })
+
+    def append(self, message: Dict[str, Any]) -> None:
+        """Add a message and count its tokens."""
+        tokens = count_message_tokens(message)
+        self.messages.append(message)
+        self._tokens.append(tokens)
+        self.total_tokens += tokens
+
+    def prepare(self) -> List[Dict[str, Any]]:
+        """
+        Trim the context to its budget and return the messages to send.
+
+        Records the resulting prompt size in last_prompt_tokens.
+        """
+        before = self.total_tokens
+        self.fit()
+        self.tokens_saved += before - self.total_tokens
+        self.last_prompt_tokens = self.total_tokens
+        return self.messages
+
+    def fit(self) -> None:
+        """Compact, then drop, the oldest completed turns until within budget."""
+        if not self._over_budget():
+            return
+
+        # Compact completed turns, oldest first
+        for index in range(len(self._turn_starts()) - 1):
+            if not self._over_budget():
+                return
+            start, end = self._turn_bounds(index)
+            self._compact(start, end)
+
+        # Drop completed turns, oldest first
+        while self._over_budget() and len(self._turn_starts()) > 1:
+            start, end = self._turn_bounds(0)
+            self._remove(range(start, end))
+
+    def _over_budget(self) -> bool:
+        return self.total_tokens > self.max_tokens or bool(self.max_messages and len(self.messages) > self.max_messages)
+
+    def _turn_starts(self) -> List[int]:
+        """Indices of the user messages that start each turn."""
+        return [i for i, message in enumerate(self.messages) if message.get("role") == "user"]
+
+    def _turn_bounds(self, index: int) -> Tuple[int, int]:
+        """Start and end (exclusive) of the turn at the given position."""
+        starts = self._turn_starts()
+        end = starts[index + 1] if index + 1 < len(starts) else len(self.messages)
+        return starts[index], end
+
+    def _compact(self, start: int, end: int) -> None:
+        """Drop tool calls and tool results from a completed turn."""
+        drop = [
+            i for i in range(start, end)
+            if self.messages[i].get("role") == "tool" or self.messages[i].get("tool_calls")
+        ]
+        # Keep turns that never got a final answer, so the exchange still reads correctly
+        has_answer = any(
+            self.messages[i].get("role") == "assistant" and not self.messages[i].get("tool_calls")
+            for i in range(start, end)
+        )
+        if drop and has_answer:
+            self._remove(drop)
+
+    def _remove(self, indices) -> None:
+        removed = set(indices)
+        self.total_tokens -= sum(self._tokens[i] for i in removed)
+        self.messages = [m for i, m in enumerate(self.messages) if i not in removed]
+        self._tokens = [t for i, t in enumerate(self._tokens) if i not in removed]
+
+    def copy(self) -> List[Dict[str, Any]]:
+        """Return a shallow copy of the messages."""
+        return self.messages.copy()
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.messages)
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def __getitem__(self, index):
+        return self.messages[index]
@@ -0,0 +1,124 @@
+"""
+Time budget of one agent turn.
+
+A turn runs inside ``deadline_scope(Config.TURN_TIMEOUT)``; every LLM
+request, tool call and subprocess it starts asks ``remaining()`` or
+``budget()`` how long it may take, instead of using a fixed timeout of
+its own. Each tool call opens a nested scope capped at
+Config.MAX_TOOL_TIMEOUT, so a tool stops at whichever limit comes first.
+
+The current deadline lives in a context variable, so it follows the turn
+into asyncio tasks and into tool worker threads (which run in a copy of
+the caller's context). Subprocesses register with ``track()``; cancelling
+a deadline, e.g. on Ctrl-C, kills every process still running under it.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional, Set
+
+class DeadlineExceeded(TimeoutError):
+    """The turn ran out of time, or was cancelled, before a step could finish."""
+
+class Deadline:
+    """A point in time a turn, or one step of it, must finish by."""
+
+    __slots__ = ("seconds", "expires_at", "parent", "cancelled", "_processes", "_lock")
+
+    def __init__(self, seconds: float, parent: Optional["Deadline"] = None):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.parent = parent
+        self.cancelled = False
+        self._processes: Set[Any] = set()
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        """Seconds left, never negative; 0 once cancelled."""
+        if self.cancelled:
+            return 0.0
+        left = max(0.0, self.expires_at - time.monotonic())
+        if self.parent is not None:
+            left = min(left, self.parent.remaining())
+        return left
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def cancel(self) -> None:
+        """Expire now and kill the subprocesses running under this deadline."""
+        self.cancelled = True
+        with self._lock:
+            processes = list(self._processes)
+        for process in processes:
+            _kill(process)
+
+    @contextmanager
+    def track(self, process: Any) -> Iterator[None]:
+        """Kill ``process`` if this deadline, or one it is nested in, is cancelled while the block runs."""
+        owners = []
+        deadline: Optional[Deadline] = self
+        while deadline is not None:
+            with deadline._lock:
+                deadline._processes.add(process)
+            owners.append(deadline)
+            deadline = deadline.parent
+        try:
+            # Cancelled between starting the process and registering it
+            if any(owner.cancelled for owner in owners):
+                _kill(process)
+            yield
+        finally:
+            for owner in owners:
+                with owner._lock:
+                    owner._processes.discard(process)
+
+def _kill(process: Any) -> None:
+    if process.returncode is not None:
+        return
+    try:
+        process.kill()
+    except (ProcessLookupError, OSError):
+        # Exited in the meantime
+        pass
+
+_current: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("deadline", default=None)
+
+def current() -> Optional[Deadline]:
+    """The innermost deadline of the running turn, or None outside a turn."""
+    return _current.get()
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current deadline, or None when there is none."""
+    deadline = _current.get()
+    return None if deadline is None else deadline.remaining()
+
+def budget(seconds: float) -> float:
+    """``seconds``, cut down to what is left of the current deadline."""
+    left = remaining()
+    return seconds if left is None else min(seconds, left)
+
+def expired() -> bool:
+    """Whether the current deadline has passed or been cancelled."""
+    deadline = _current.get()
+    return deadline is not None and deadline.expired
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[Optional[Deadline]]:
+    """
+    Run the block under a deadline ``seconds`` from now, nested in the current one.
+
+    A falsy ``seconds`` keeps the current deadline (if any) unchanged.
+    """
+    parent = _current.get()
+    if not seconds:
+        yield parent
+        return
+    deadline = Deadline(seconds, parent)
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
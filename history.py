@@ -0,0 +1,291 @@
+"""
+Probe history: fixed-size time series of RTT and loss per target and probe.
+
+Each series is a ring buffer of three typed columns (timestamp, RTT in
+milliseconds, loss percent) laid out in one flat buffer, so a series
+always takes the same memory and a window is read with at most two
+slice copies of each column. Buffers are either private bytearrays or
+slots of one memory-mapped file, which keeps history across restarts.
+"""
+import atexit
+import bisect
+import itertools
+import math
+import mmap
+import operator
+import os
+import struct
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+from config import Config
+
+MAGIC = b"PAH1"
+# Magic, capacity, series slots, padded so the columns stay 8-byte aligned
+FILE_HEADER = struct.Struct("<4sII4x")
+# Series key, ring start, sample count
+SLOT_HEADER = struct.Struct("<256sII")
+KEY_BYTES = 256
+
+# Bytes per sample: float64 timestamp, float64 RTT, float32 loss
+SAMPLE_BYTES = 8 + 8 + 4
+
+NAN = float("nan")
+
+def _slot_size(capacity: int) -> int:
+    size = SLOT_HEADER.size + capacity * SAMPLE_BYTES
+    return (size + 7) // 8 * 8
+
+def _nearest_rank(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted, non-empty list."""
+    index = max(0, min(len(values) - 1, math.ceil(pct / 100 * len(values)) - 1))
+    return values[index]
+
+class Series:
+    """
+    One ring buffer of samples, appended in time order.
+
+    ``buffer`` is a writable memoryview laid out as a slot header followed
+    by the timestamp, RTT and loss columns; the start and count in the
+    header are updated after each sample is written.
+    """
+
+    __slots__ = ("key", "capacity", "_buffer", "timestamps", "rtts", "losses", "start", "count")
+
+    def __init__(self, key: str, buffer: memoryview, capacity: int):
+        self.key = key
+        self.capacity = capacity
+        self._buffer = buffer
+        columns = buffer[SLOT_HEADER.size:]
+        self.timestamps = columns[:capacity * 8].cast("d")
+        self.rtts = columns[capacity * 8:capacity * 16].cast("d")
+        self.losses = columns[capacity * 16:capacity * SAMPLE_BYTES].cast("f")
+        stored_key, self.start, self.count = SLOT_HEADER.unpack_from(buffer)
+        if not stored_key.rstrip(b"\0"):
+            self.start = self.count = 0
+            self._write_header()
+
+    def _write_header(self) -> None:
+        SLOT_HEADER.pack_into(self._buffer, 0, self.key.encode("utf-8"), self.start, self.count)
+
+    def append(self, timestamp: float, rtt: Optional[float], loss: float) -> None:
+        if self.count and timestamp < self.timestamps[(self.start + self.count - 1) % self.capacity]:
+            # Clock went backwards; keep the series sorted so windows can be bisected
+            timestamp = self.timestamps[(self.start + self.count - 1) % self.capacity]
+        if self.count < self.capacity:
+            index = (self.start + self.count) % self.capacity
+            self.count += 1
+        else:
+            index = self.start
+            self.start = (self.start + 1) % self.capacity
+        self.timestamps[index] = timestamp
+        self.rtts[index] = NAN if rtt is None else rtt
+        self.losses[index] = loss
+        self._write_header()
+
+    def _timestamp(self, position: int) -> float:
+        return self.timestamps[(self.start + position) % self.capacity]
+
+    def _column(self, column: memoryview, first: int, last: int) -> List[float]:
+        """Values at logical positions [first, last), copied in at most two slices."""
+        begin = (self.start + first) % self.capacity
+        length = last - first
+        end = begin + length
+        if end <= self.capacity:
+            return column[begin:end].tolist()
+        return column[begin:].tolist() + column[:end - self.capacity].tolist()
+
+    def window(self, since: float) -> Tuple[List[float], List[float], List[float]]:
+        """Timestamps, RTTs (NaN when lost) and losses of the samples at or after ``since``."""
+        first = bisect.bisect_left(range(self.count), since, key=self._timestamp)
+        return (self._column(self.timestamps, first, self.count),
+                self._column(self.rtts, first, self.count),
+                self._column(self.losses, first, self.count))
+
+    def release(self) -> None:
+        for view in (self.timestamps, self.rtts, self.losses, self._buffer):
+            view.release()
+
+def summarize(timestamps: List[float], rtts: List[float], losses: List[float]) -> Dict[str, Any]:
+    """
+    Statistics of one window of samples.
+
+    Percentiles are nearest-rank over answered probes. Jitter is the mean
+    absolute difference between consecutive RTTs (as in RFC 3550), and the
+    trend is the least-squares slope of RTT over time in ms per hour.
+    """
+    stats: Dict[str, Any] = {"samples": len(timestamps)}
+    if not timestamps:
+        return stats
+    stats["first"] = timestamps[0]
+    stats["last"] = timestamps[-1]
+    stats["loss_pct"] = sum(losses) / len(losses)
+
+    # NaN marks a probe that got no answer, and NaN != NaN
+    answered = [rtt == rtt for rtt in rtts]
+    times = list(itertools.compress(timestamps, answered))
+    values = list(itertools.compress(rtts, answered))
+    stats["answered"] = len(values)
+    if not values:
+        return stats
+    ordered = sorted(values)
+    stats["rtt_ms"] = {
+        "min": ordered[0],
+        "p50": _nearest_rank(ordered, 50),
+        "p90": _nearest_rank(ordered, 90),
+        "p99": _nearest_rank(ordered, 99),
+        "max": ordered[-1]
+    }
+    stats["last_rtt_ms"] = values[-1]
+    if len(values) > 1:
+        stats["jitter_ms"] = sum(map(abs, map(operator.sub, values[1:], values[:-1]))) / (len(values) - 1)
+        mean_t = sum(times) / len(times)
+        deviations = [t - mean_t for t in times]
+        spread = sum(map(operator.mul, deviations, deviations))
+        if spread > 0:
+            # Centered times make the slope independent of the mean RTT
+            slope = sum(map(operator.mul, deviations, values)) / spread
+            stats["trend_ms_per_hour"] = slope * 3600
+    return stats
+
+class HistoryStore:
+    """
+    Probe history for many targets, bounded in memory.
+
+    Every series holds the last ``capacity`` samples; at most
+    ``max_series`` series are kept and samples for further series are
+    dropped (and counted). With a ``path`` the series live in a memory-
+    mapped file of fixed size that is reopened on the next start.
+    """
+
+    def __init__(self, capacity: int = 4096, max_series: int = 256, path: str = ""):
+        self.capacity = max(2, capacity)
+        self.max_series = max(1, max_series)
+        self.path = path
+        self.dropped = 0
+        self._series: Dict[str, Series] = {}
+        self._lock = threading.Lock()
+        self._mmap: Optional[mmap.mmap] = None
+        self._file = None
+        if path:
+            self._open_file(path)
+
+    def _open_file(self, path: str) -> None:
+        slot_size = _slot_size(self.capacity)
+        size = FILE_HEADER.size + self.max_series * slot_size
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "r+b" if not new_file else "w+b")
+        if new_file:
+            self._file.truncate(size)
+        elif os.path.getsize(path) != size:
+            self._file.close()
+            raise ValueError(f"history file {path} was created with a different capacity or series limit")
+
+        self._mmap = mmap.mmap(self._file.fileno(), size)
+        magic, capacity, max_series = FILE_HEADER.unpack_from(self._mmap)
+        if new_file:
+            FILE_HEADER.pack_into(self._mmap, 0, MAGIC, self.capacity, self.max_series)
+        elif (magic, capacity, max_series) != (MAGIC, self.capacity, self.max_series):
+            self._mmap.close()
+            self._file.close()
+            raise ValueError(f"history file {path} was created with a different capacity or series limit")
+
+        view = memoryview(self._mmap)
+        for slot in range(self.max_series):
+            offset = FILE_HEADER.size + slot * slot_size
+            key = SLOT_HEADER.unpack_from(self._mmap, offset)[0].rstrip(b"\0")
+            if not key:
+                break
+            name = key.decode("utf-8")
+            self._series[name] = Series(name, view[offset:offset + slot_size], self.capacity)
+        view.release()
+
+    @staticmethod
+    def key(target: str, probe: str) -> str:
+        return f"{target.lower()}/{probe}"
+
+    def _get_series(self, key: str) -> Optional[Series]:
+        series = self._series.get(key)
+        if series is not None:
+            return series
+        if len(self._series) >= self.max_series or len(key.encode("utf-8")) > KEY_BYTES:
+            return None
+        slot_size = _slot_size(self.capacity)
+        if self._mmap is not None:
+            offset = FILE_HEADER.size + len(self._series) * slot_size
+            buffer = memoryview(self._mmap)[offset:offset + slot_size]
+        else:
+            buffer = memoryview(bytearray(slot_size))
+        series = self._series[key] = Series(key, buffer, self.capacity)
+        return series
+
+    def record(self, target: str, probe: str, rtt: Optional[float], loss: float,
+               timestamp: Optional[float] = None) -> None:
+        """Append one probe outcome; ``rtt`` is None when nothing answered."""
+        with self._lock:
+            series = self._get_series(self.key(target, probe))
+            if series is None:
+                self.dropped += 1
+                return
+            series.append(time.time() if timestamp is None else timestamp, rtt, loss)
+
+    def probes(self, target: str) -> List[str]:
+        """Probes with history for a target, e.g. ``["ping", "tcp:443"]``."""
+        prefix = target.lower() + "/"
+        with self._lock:
+            return sorted(key[len(prefix):] for key in self._series if key.startswith(prefix))
+
+    def query(self, target: str, probe: str, window: float, now: Optional[float] = None) -> Dict[str, Any]:
+        """Statistics of the samples from the last ``window`` seconds."""
+        since = (time.time() if now is None else now) - window
+        with self._lock:
+            series = self._series.get(self.key(target, probe))
+            if series is None:
+                return summarize([], [], [])
+            columns = series.window(since)
+        return summarize(*columns)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "series": len(self._series),
+                "samples": sum(series.count for series in self._series.values()),
+                "bytes_per_series": _slot_size(self.capacity),
+                "dropped": self.dropped
+            }
+
+    def flush(self) -> None:
+        if self._mmap is not None:
+            with self._lock:
+                self._mmap.flush()
+
+    def close(self) -> None:
+        """Write the file back and unmap it; the store is empty afterwards."""
+        with self._lock:
+            for series in self._series.values():
+                series.release()
+            self._series.clear()
+            if self._mmap is not None:
+                self._mmap.flush()
+                self._mmap.close()
+                self._file.close()
+                self._mmap = None
+
+_history: Optional[HistoryStore] = None
+_history_lock = threading.Lock()
+
+def get_history() -> HistoryStore:
+    """Return the process-wide history store, opening HISTORY_FILE on first use."""
+    global _history
+    if _history is None:
+        with _history_lock:
+            if _history is None:
+                try:
+                    store = HistoryStore(Config.HISTORY_CAPACITY, Config.HISTORY_MAX_SERIES, Config.HISTORY_FILE)
+                except (OSError, ValueError) as e:
+                    print(f"⚠️  Probe history kept in memory only: {e}")
+                    store = HistoryStore(Config.HISTORY_CAPACITY, Config.HISTORY_MAX_SERIES)
+                atexit.register(store.close)
+                _history = store
+    return _history
@@ -0,0 +1,360 @@
+import asyncio
+import itertools
+import math
+import os
+import random
+import select
+import socket
+import struct
+import time
+from collections import deque
+from typing import Callable, List, Dict, Optional, Sequence, Set, Tuple
+
+from deadline import remaining
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+
+# Unprivileged users may not send echo requests faster than this on Linux
+MIN_INTERVAL = 0.2
+
+RECEIVE_BUFFER_SIZE = 4 * 1024 * 1024
+
+# Identifiers handed to pingers and tracers: every raw socket sees every
+# ICMP reply, so concurrent probes in one process must not share an identifier
+_idents = itertools.count(os.getpid() ^ 0x5A5A)
+
+def next_ident() -> int:
+    """A 16-bit identifier not used by any other pinger or tracer in the process (until it wraps)."""
+    return next(_idents) & 0xFFFF
+
+def checksum(data: bytes) -> int:
+    """Internet checksum (RFC 1071) of an ICMP message."""
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+def build_echo_request(ident: int, seq: int, payload_size: int = 56) -> bytes:
+    """Build an ICMP echo request with a correct checksum."""
+    payload = (b"ping-agent" * (payload_size // 10 + 1))[:payload_size]
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    return struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksum(header + payload), ident, seq) + payload
+
+def parse_echo_reply(packet: bytes, raw: bool) -> Optional[Tuple[int, int]]:
+    """
+    Extract (identifier, sequence) from an echo reply.
+
+    Raw sockets deliver the IP header in front of the ICMP message.
+    Datagram sockets do not on Linux but do on macOS, so their packets are
+    checked for one: an ICMP message never starts with IP version 4.
+    Anything that is not an echo reply gives None.
+    """
+    if raw or (packet and packet[0] >> 4 == 4):
+        if len(packet) < 20:
+            return None
+        packet = packet[(packet[0] & 0x0F) * 4:]
+    if len(packet) < 8:
+        return None
+    icmp_type, _, _, ident, seq = struct.unpack("!BBHHH", packet[:8])
+    if icmp_type != ICMP_ECHO_REPLY:
+        return None
+    return ident, seq
+
+def open_icmp_socket() -> Tuple[socket.socket, bool]:
+    """
+    Open an ICMP socket.
+
+    Prefers an unprivileged datagram socket (Linux ping_group_range, macOS)
+    and falls back to a raw socket, which needs root or CAP_NET_RAW.
+
+    Returns:
+        The socket and whether it is a raw socket
+    """
+    try:
+        return socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP), False
+    except OSError:
+        return socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP), True
+
+class PingStats:
+    """Probe results for one host."""
+
+    def __init__(self, host: str, address: Optional[str] = None, error: Optional[str] = None):
+        self.host = host
+        self.address = address
+        self.error = error
+        # Set when the host only has IPv6 addresses, which these IPv4 ICMP sockets cannot ping
+        self.ipv6 = False
+        # One entry per probe sent, in milliseconds, None when lost
+        self.rtts: List[Optional[float]] = []
+
+    @property
+    def sent(self) -> int:
+        return len(self.rtts)
+
+    @property
+    def received(self) -> int:
+        return sum(1 for rtt in self.rtts if rtt is not None)
+
+    @property
+    def loss(self) -> float:
+        """Packet loss in percent."""
+        return 100.0 * (self.sent - self.received) / self.sent if self.sent else 100.0
+
+    def summary(self) -> Optional[Tuple[float, float, float, float]]:
+        """Return min/avg/max/mdev in milliseconds, or None without replies."""
+        replies = [rtt for rtt in self.rtts if rtt is not None]
+        if not replies:
+            return None
+        avg = sum(replies) / len(replies)
+        mdev = math.sqrt(sum(rtt * rtt for rtt in replies) / len(replies) - avg * avg) if len(replies) > 1 else 0.0
+        return min(replies), avg, max(replies), mdev
+
+class IcmpPinger:
+    """
+    In-process pinger that probes many hosts from a single ICMP socket.
+
+    Probes for all hosts are interleaved; replies are matched back to their
+    probe by identifier and sequence number, so no ping process is spawned.
+    """
+
+    def __init__(self, timeout: float = 3.0, interval: float = MIN_INTERVAL, payload_size: int = 56):
+        self.timeout = timeout
+        self.interval = max(interval, MIN_INTERVAL)
+        self.payload_size = payload_size
+        self.sock, self.raw = open_icmp_socket()
+        self.sock.setblocking(False)
+        # Replies to a large sweep arrive in a burst; keep the kernel from dropping them
+        try:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER_SIZE)
+        except OSError:
+            pass
+        # Datagram sockets get the identifier rewritten and replies filtered by the kernel
+        self.ident = next_ident()
+        # A random start keeps replies to another process's probes from matching ours
+        self._seq = random.randrange(0x10000)
+        self._pending: Dict[int, Tuple[PingStats, int, float]] = {}
+        # Called with the host's stats and the round-trip time of every reply
+        self.on_reply: Optional[Callable[[PingStats, float], None]] = None
+        # Called by ping_async with the stats of each host that is done
+        self.on_done: Optional[Callable[[PingStats], None]] = None
+
+    def close(self) -> None:
+        self.sock.close()
+
+    def __enter__(self) -> "IcmpPinger":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _next_seq(self) -> int:
+        self._seq = (self._seq + 1) & 0xFFFF
+        return self._seq
+
+    def _send_round(self, targets: List[PingStats]) -> float:
+        """Send one probe to every target and return the send time of the last."""
+        sent_at = time.perf_counter()
+        for stats in targets:
+            seq = self._next_seq()
+            packet = build_echo_request(self.ident, seq, self.payload_size)
+            sent_at = time.perf_counter()
+            try:
+                self.sock.sendto(packet, (stats.address, 0))
+            except OSError as e:
+                stats.error = str(e)
+                stats.rtts.append(None)
+                continue
+            stats.rtts.append(None)
+            self._pending[seq] = (stats, len(stats.rtts) - 1, sent_at)
+        return sent_at
+
+    def _receive(self, packet: bytes, address: str, received_at: float) -> None:
+        """Record the round-trip time of a reply that matches a pending probe."""
+        parsed = parse_echo_reply(packet, self.raw)
+        if parsed is None:
+            return
+        ident, seq = parsed
+        if self.raw and ident != self.ident:
+            return
+        probe = self._pending.get(seq)
+        if probe is None or probe[0].address != address:
+            return
+        stats, index, sent_at = self._pending.pop(seq)
+        stats.rtts[index] = (received_at - sent_at) * 1000
+        if self.on_reply is not None:
+            self.on_reply(stats, stats.rtts[index])
+
+    def _expire(self, now: float) -> None:
+        """Forget probes that have waited longer than the timeout."""
+        for seq, (_, _, sent_at) in list(self._pending.items()):
+            if now - sent_at > self.timeout:
+                del self._pending[seq]
+
+    def _drop_pending(self, hosts: Optional[Set[PingStats]] = None) -> None:
+        """Forget probes still waiting for a reply, as if never sent: all of them, or those to ``hosts``."""
+        probes = [(seq, probe) for seq, probe in self._pending.items() if hosts is None or probe[0] in hosts]
+        # Highest index first, so earlier indices of the same host stay valid
+        for seq, (stats, index, _) in sorted(probes, key=lambda item: -item[1][1]):
+            del stats.rtts[index]
+            del self._pending[seq]
+
+    def _still_probing(self, targets: List[PingStats], stop_after: Optional[int]) -> List[PingStats]:
+        """Drop the targets that already have ``stop_after`` replies, with their outstanding probes."""
+        if not stop_after:
+            return targets
+        answered = {stats for stats in targets if stats.received >= stop_after}
+        if not answered:
+            return targets
+        self._drop_pending(answered)
+        return [stats for stats in targets if stats not in answered]
+
+    def ping(self, hosts: Sequence[str], count: int = 4, stop_after: Optional[int] = None) -> Dict[str, PingStats]:
+        """
+        Probe every host ``count`` times and return stats per host.
+
+        With ``stop_after``, a host is not probed again once it has sent
+        that many replies. Stops early when the turn's deadline passes; the
+        stats then hold the probes answered or timed out so far.
+        """
+        results = {host: self._resolve(host) for host in hosts}
+        targets = [stats for stats in results.values() if stats.address]
+
+        next_round = time.perf_counter()
+        rounds_left = count
+        last_send = next_round
+
+        while targets:
+            now = time.perf_counter()
+            left = remaining()
+            if left is not None and left <= 0:
+                self._drop_pending()
+                break
+            targets = self._still_probing(targets, stop_after)
+            if not targets:
+                break
+            if rounds_left and now >= next_round:
+                last_send = self._send_round(targets)
+                rounds_left -= 1
+                next_round = now + self.interval
+
+            self._expire(now)
+            if not rounds_left and (not self._pending or now - last_send > self.timeout):
+                break
+
+            wait_until = next_round if rounds_left else last_send + self.timeout
+            wait = max(0.0, wait_until - time.perf_counter())
+            readable, _, _ = select.select([self.sock], [], [], wait if left is None else min(wait, left))
+            while readable:
+                try:
+                    packet, (address, _) = self.sock.recvfrom(65535)
+                except BlockingIOError:
+                    break
+                self._receive(packet, address, time.perf_counter())
+
+        self._pending.clear()
+        return results
+
+    async def ping_async(self, hosts: Sequence[str], count: int = 4, stop_after: Optional[int] = None,
+                         window: Optional[int] = None) -> Dict[str, PingStats]:
+        """
+        Probe every host ``count`` times without blocking the event loop, stopping early like ping().
+
+        With a ``window``, at most that many hosts are probed at a time: a
+        host is done once its replies are in or its last probe timed out,
+        and the next host starts right away, so a slow or dead host only
+        holds up its own slot. Hosts not started before the deadline keep
+        no probes.
+        """
+        loop = asyncio.get_running_loop()
+        resolved = await asyncio.gather(*(self._resolve_async(loop, host) for host in hosts))
+        results = dict(zip(hosts, resolved))
+        waiting = deque(stats for stats in results.values() if stats.address)
+        window = window or len(waiting)
+        # Hosts being probed: [probes sent, time of the next probe, time of the last probe]
+        active: Dict[PingStats, List[float]] = {}
+
+        replies: asyncio.Queue = asyncio.Queue()
+
+        def on_readable() -> None:
+            while True:
+                try:
+                    packet, (address, _) = self.sock.recvfrom(65535)
+                except (BlockingIOError, OSError):
+                    return
+                replies.put_nowait((packet, address, time.perf_counter()))
+
+        loop.add_reader(self.sock.fileno(), on_readable)
+        try:
+            while True:
+                now = time.perf_counter()
+                left = remaining()
+                if left is not None and left <= 0:
+                    self._drop_pending()
+                    break
+
+                for stats, (sent, _, last_send) in list(active.items()):
+                    if stop_after and stats.received >= stop_after:
+                        self._drop_pending({stats})
+                    elif sent < count or (stats.received < sent and now - last_send <= self.timeout):
+                        continue
+                    del active[stats]
+                    if self.on_done is not None:
+                        self.on_done(stats)
+                while waiting and len(active) < window:
+                    active[waiting.popleft()] = [0, now, now]
+                if not active:
+                    break
+
+                due = [stats for stats, (sent, next_send, _) in active.items() if sent < count and now >= next_send]
+                if due:
+                    self._send_round(due)
+                    for stats in due:
+                        state = active[stats]
+                        state[0] += 1
+                        state[1] = now + self.interval
+                        state[2] = now
+                self._expire(now)
+
+                wait_until = min(next_send if sent < count else last_send + self.timeout
+                                 for sent, next_send, last_send in active.values())
+                wait = max(0.0, wait_until - time.perf_counter())
+                try:
+                    packet, address, received_at = await asyncio.wait_for(
+                        replies.get(), wait if left is None else min(wait, left)
+                    )
+                except asyncio.TimeoutError:
+                    continue
+                self._receive(packet, address, received_at)
+                while not replies.empty():
+                    self._receive(*replies.get_nowait())
+        finally:
+            loop.remove_reader(self.sock.fileno())
+            self._pending.clear()
+
+        return results
+
+    def _resolve(self, host: str) -> PingStats:
+        try:
+            infos = socket.getaddrinfo(host, None, type=socket.SOCK_RAW)
+        except OSError as e:
+            return PingStats(host, error=f"could not resolve {host}: {e}")
+        return _stats_for(host, infos)
+
+    async def _resolve_async(self, loop: asyncio.AbstractEventLoop, host: str) -> PingStats:
+        try:
+            infos = await loop.getaddrinfo(host, None, type=socket.SOCK_RAW)
+        except OSError as e:
+            return PingStats(host, error=f"could not resolve {host}: {e}")
+        return _stats_for(host, infos)
+
+def _stats_for(host: str, infos: List[tuple]) -> PingStats:
+    """Stats for ``host`` at its first IPv4 address; IPv6-only hosts are flagged and left unprobed."""
+    for family, _, _, _, sockaddr in infos:
+        if family == socket.AF_INET:
+            return PingStats(host, sockaddr[0])
+    stats = PingStats(host, error=f"{host} has no IPv4 address")
+    stats.ipv6 = any(info[0] == socket.AF_INET6 for info in infos)
+    return stats
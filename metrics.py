@@ -0,0 +1,319 @@
+import bisect
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, List, Dict, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+# Bucket upper bounds; +Inf is implicit
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+LLM_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+ITERATION_BUCKETS = (1, 2, 3, 4, 5, 6, 8, 10, 15, 20)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+def is_timeout(error: BaseException) -> bool:
+    """True for timeouts, including the OpenAI client's APITimeoutError."""
+    return isinstance(error, TimeoutError) or "timeout" in type(error).__name__.lower()
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+class _HistogramChild:
+    __slots__ = ("upper_bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        # One slot per bucket plus +Inf; made cumulative only when rendered
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.upper_bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+class _Metric(ABC):
+    """A metric family: one child per combination of label values."""
+
+    TYPE = ""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        """Return the child for these label values, creating it on first use."""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.label_names):
+                raise ValueError(f"{self.name} expects labels {self.label_names}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    @abstractmethod
+    def _new_child(self):
+        """A fresh child holding the value of one label combination."""
+        pass
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.TYPE}"]
+        with self._lock:
+            children = sorted(self._children.items())
+        for key, child in children:
+            lines.extend(self._render_child(key, child))
+        return lines
+
+    @abstractmethod
+    def _render_child(self, key: Tuple[str, ...], child) -> List[str]:
+        """Exposition lines of one child."""
+        pass
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. errors."""
+
+    TYPE = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increment the unlabelled counter."""
+        self.labels().inc(amount)
+
+    def _render_child(self, key: Tuple[str, ...], child: _CounterChild) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_number(child.value)}"]
+
+class Histogram(_Metric):
+    """Distribution of observed values in fixed buckets."""
+
+    TYPE = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        """Record a value in the unlabelled histogram."""
+        self.labels().observe(value)
+
+    def _render_child(self, key: Tuple[str, ...], child: _HistogramChild) -> List[str]:
+        counts, total, count = child.snapshot()
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            le = "+Inf" if bound == float("inf") else _format_number(bound)
+            bucket_labels = _format_labels(self.label_names, key, 'le="' + le + '"')
+            lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+        labels = _format_labels(self.label_names, key)
+        lines.append(f"{self.name}_sum{labels} {_format_number(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+class MetricsRegistry:
+    """
+    In-process metrics, rendered in the Prometheus text format.
+
+    Recording a value takes one dict lookup and a short per-series lock,
+    so metrics can be updated from tool worker threads and the event loop
+    without contention on a global lock.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        """Create (or return the existing) counter ``name``."""
+        return self._register(Counter(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        """Create (or return the existing) histogram ``name``."""
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+LLM_REQUEST_SECONDS = REGISTRY.histogram(
+    "ping_agent_llm_request_seconds", "Chat completion request latency, until the last streamed chunk",
+    ("model",), LLM_LATENCY_BUCKETS
+)
+LLM_ERRORS = REGISTRY.counter("ping_agent_llm_errors_total", "Chat completion requests that failed", ("model",))
+LLM_TIMEOUTS = REGISTRY.counter("ping_agent_llm_timeouts_total", "Chat completion requests that timed out", ("model",))
+LLM_PROVIDER_ATTEMPTS = REGISTRY.counter(
+    "ping_agent_llm_provider_attempts_total",
+    "Requests sent to each LLM endpoint, by outcome (ok, retry, failover, fatal)", ("provider", "outcome")
+)
+LLM_PROVIDER_SECONDS = REGISTRY.histogram(
+    "ping_agent_llm_provider_seconds", "Time until each LLM endpoint answered or failed", ("provider",),
+    LLM_LATENCY_BUCKETS
+)
+LLM_HEDGES = REGISTRY.counter(
+    "ping_agent_llm_hedges_total", "Hedged LLM requests, by which request answered first", ("winner",)
+)
+LLM_CACHE_LOOKUPS = REGISTRY.counter(
+    "ping_agent_llm_cache_lookups_total", "LLM response cache lookups, by result (hit, miss)", ("result",)
+)
+LLM_CACHE_SAVED_SECONDS = REGISTRY.counter(
+    "ping_agent_llm_cache_saved_seconds_total", "LLM request time the response cache replayed instead of waiting for"
+)
+PROMPT_TOKENS = REGISTRY.histogram(
+    "ping_agent_prompt_tokens", "Prompt tokens per request, from response.usage", ("model",), TOKEN_BUCKETS
+)
+COMPLETION_TOKENS = REGISTRY.histogram(
+    "ping_agent_completion_tokens", "Completion tokens per request, from response.usage", ("model",), TOKEN_BUCKETS
+)
+TURN_ITERATIONS = REGISTRY.histogram(
+    "ping_agent_turn_iterations", "Chat completion requests needed to answer one user message",
+    buckets=ITERATION_BUCKETS
+)
+TOOL_SECONDS = REGISTRY.histogram(
+    "ping_agent_tool_seconds", "Tool execution latency (cache hits are not executed)", ("tool",)
+)
+TOOL_ERRORS = REGISTRY.counter(
+    "ping_agent_tool_errors_total", "Tool calls that did not succeed, by status (error, exception, cancelled)", ("tool", "status")
+)
+TOOL_TIMEOUTS = REGISTRY.counter(
+    "ping_agent_tool_timeouts_total", "Tool calls abandoned after MAX_TOOL_TIMEOUT", ("tool",)
+)
+
+MONITOR_PROBE_SECONDS = REGISTRY.histogram(
+    "ping_agent_monitor_probe_seconds", "Monitor probe latency, by probe type (ping, dns, tcp)", ("probe",)
+)
+MONITOR_PROBE_FAILURES = REGISTRY.counter(
+    "ping_agent_monitor_probe_failures_total", "Monitor probes that got no answer, by probe type", ("probe",)
+)
+MONITOR_STATE_CHANGES = REGISTRY.counter(
+    "ping_agent_monitor_state_changes_total", "Monitored targets entering a state (up, degraded, down)", ("state",)
+)
+MONITOR_ESCALATIONS = REGISTRY.counter(
+    "ping_agent_monitor_escalations_total", "Monitor alerts sent to the agent for diagnosis"
+)
+
+SERVER_REQUESTS = REGISTRY.counter(
+    "ping_agent_server_requests_total", "API server requests, by route and status code", ("route", "status")
+)
+SERVER_REJECTED = REGISTRY.counter(
+    "ping_agent_server_rejected_total", "API turns turned away by admission control, by reason", ("reason",)
+)
+SERVER_QUEUE_SECONDS = REGISTRY.histogram(
+    "ping_agent_server_queue_seconds", "Time API turns waited for an admission slot"
+)
+
+@contextmanager
+def llm_request(model: str):
+    """Time one chat completion request and count it if it fails."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        (LLM_TIMEOUTS if is_timeout(e) else LLM_ERRORS).labels(model).inc()
+        raise
+    finally:
+        LLM_REQUEST_SECONDS.labels(model).observe(time.perf_counter() - start)
+
+def record_usage(model: str, usage) -> None:
+    """Record token counts from a response's ``usage`` object, if present."""
+    if usage is None:
+        return
+    if usage.prompt_tokens:
+        PROMPT_TOKENS.labels(model).observe(usage.prompt_tokens)
+    if usage.completion_tokens:
+        COMPLETION_TOKENS.labels(model).observe(usage.completion_tokens)
+
+def record_tool_call(tool: str, status: str, seconds: float) -> None:
+    """Record one executed tool call with its logging status."""
+    TOOL_SECONDS.labels(tool).observe(seconds)
+    if status != "ok":
+        TOOL_ERRORS.labels(tool, status).inc()
+
+def start_metrics_server(port: int, host: str = "127.0.0.1",
+                         registry: Optional[MetricsRegistry] = None) -> "ThreadingHTTPServer":
+    """
+    Serve ``/metrics`` in a background thread.
+
+    Returns the server; call shutdown() on it to stop. Pass port 0 to pick
+    a free port (see server.server_address).
+    """
+    # Imported here: most runs never enable the endpoint
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    served = registry or REGISTRY
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = served.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            # Scrapes would otherwise print a line to stderr every few seconds
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
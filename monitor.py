@@ -0,0 +1,549 @@
+"""
+Monitoring daemon: probe targets on a schedule and ask the agent only when something changes.
+
+Targets are probed with ping, DNS and TCP connect checks directly, without
+the LLM. Each probe keeps a rolling baseline (EWMA latency and loss); when
+a target goes down, drifts outside its baseline or recovers, the change is
+written to the alert log, and for down/degraded targets the Agent gets one
+request carrying the evidence already collected.
+
+Usage:
+    python monitor.py targets.txt
+    python monitor.py targets.txt --no-llm     # alerts only, no agent calls
+
+Target file, one target per line:
+    # host          probes               interval
+    example.com     ping dns tcp:443     30s
+    10.0.0.1        ping
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Callable, Deque, Tuple
+
+from config import Config
+from metrics import (
+    MONITOR_PROBE_SECONDS, MONITOR_PROBE_FAILURES, MONITOR_STATE_CHANGES, MONITOR_ESCALATIONS,
+    start_metrics_server
+)
+from history import get_history
+from resolver import DNSError, Resolver
+from results import ToolResult, PingResult, serialize
+from tools import Tool, PingTool, TracerouteTool
+
+# Target states, from best to worst
+UP, DEGRADED, DOWN = "up", "degraded", "down"
+SEVERITY = {None: -1, UP: 0, DEGRADED: 1, DOWN: 2}
+
+STATE_ICONS = {UP: "✅", DEGRADED: "⚠️", DOWN: "❌"}
+
+class Target:
+    """A host and the probes to run against it."""
+
+    __slots__ = ("host", "probes", "interval")
+
+    def __init__(self, host: str, probes: List[str], interval: float):
+        self.host = host
+        # "ping", "dns" or "tcp:<port>"
+        self.probes = probes
+        self.interval = interval
+
+def parse_targets(text: str, default_interval: float) -> List[Target]:
+    """Parse a target list: ``host [ping] [dns] [tcp:PORT ...] [INTERVALs]`` per line."""
+    targets = []
+    for number, line in enumerate(text.splitlines(), 1):
+        fields = line.split("#", 1)[0].split()
+        if not fields:
+            continue
+        host, probes, interval = fields[0], [], default_interval
+        for field in fields[1:]:
+            name = field.lower()
+            if name in ("ping", "dns"):
+                probes.append(name)
+            elif name.startswith("tcp:") and name[4:].isdigit() and 0 < int(name[4:]) < 65536:
+                probes.append(name)
+            elif name.endswith("s") and name[:-1].replace(".", "", 1).isdigit() and float(name[:-1]) > 0:
+                interval = float(name[:-1])
+            else:
+                raise ValueError(f"line {number}: unknown probe or interval '{field}'")
+        targets.append(Target(host, list(dict.fromkeys(probes)) or ["ping"], interval))
+    return targets
+
+def load_targets(path: str, default_interval: float) -> List[Target]:
+    with open(path, encoding="utf-8") as f:
+        return parse_targets(f.read(), default_interval)
+
+class Sample:
+    """Outcome of one probe run."""
+
+    __slots__ = ("at", "ok", "latency", "loss", "detail")
+
+    def __init__(self, ok: bool, latency: Optional[float] = None, loss: float = 0.0,
+                 detail: Optional[str] = None):
+        self.at = time.time()
+        self.ok = ok
+        # Milliseconds; None when the probe got no answer
+        self.latency = latency
+        # Percent of the probe's packets that went unanswered
+        self.loss = loss
+        # Serialized tool result or error message
+        self.detail = detail
+
+    def to_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {
+            "at": datetime.fromtimestamp(self.at, timezone.utc).isoformat(timespec="seconds"),
+            "ok": self.ok
+        }
+        if self.latency is not None:
+            data["ms"] = round(self.latency, 2)
+        if self.loss:
+            data["loss_pct"] = round(self.loss, 1)
+        if self.detail:
+            data["detail"] = self.detail
+        return data
+
+class Baseline:
+    """
+    Exponentially weighted mean and variance of a probe's latency, plus
+    its loss rate.
+
+    The first ``warmup`` samples only build the baseline. Anomalous samples
+    move the mean at a quarter of the normal weight and leave the variance
+    alone, so a spike neither widens the threshold it just crossed nor
+    stops a lasting shift from becoming the new normal after a while.
+    """
+
+    __slots__ = ("alpha", "warmup", "deviations", "mean", "variance", "loss", "samples")
+
+    def __init__(self, alpha: float = 0.1, warmup: int = 5, deviations: float = 3.0):
+        self.alpha = alpha
+        self.warmup = warmup
+        self.deviations = deviations
+        self.mean: Optional[float] = None
+        self.variance = 0.0
+        self.loss = 0.0
+        self.samples = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.samples >= self.warmup
+
+    @property
+    def stddev(self) -> float:
+        return math.sqrt(self.variance)
+
+    def threshold(self) -> Optional[float]:
+        """Latency above which a sample is anomalous, in milliseconds."""
+        if self.mean is None:
+            return None
+        # Floors keep very stable, very fast targets from alerting on jitter
+        return self.mean + max(self.deviations * self.stddev, 0.5 * self.mean, 5.0)
+
+    def check(self, sample: Sample) -> Optional[str]:
+        """Why the sample is outside the baseline, or None if it is within it."""
+        if not self.ready:
+            return None
+        threshold = self.threshold()
+        if sample.latency is not None and threshold is not None and sample.latency > threshold:
+            return f"latency {sample.latency:.1f}ms above baseline {self.mean:.1f}ms (threshold {threshold:.1f}ms)"
+        if sample.loss > max(self.loss + 20.0, 2 * self.loss):
+            return f"loss {sample.loss:.0f}% above baseline {self.loss:.0f}%"
+        return None
+
+    def update(self, sample: Sample, anomalous: bool = False) -> None:
+        alpha = self.alpha / 4 if anomalous else self.alpha
+        self.samples += 1
+        self.loss = sample.loss if self.samples == 1 else self.loss + alpha * (sample.loss - self.loss)
+        if sample.latency is None:
+            return
+        if self.mean is None:
+            self.mean = sample.latency
+            return
+        delta = sample.latency - self.mean
+        self.mean += alpha * delta
+        if not anomalous:
+            self.variance = (1 - alpha) * (self.variance + alpha * delta * delta)
+
+    def to_dict(self) -> Dict[str, Any]:
+        threshold = self.threshold()
+        return {
+            "samples": self.samples,
+            "mean_ms": round(self.mean, 2) if self.mean is not None else None,
+            "stddev_ms": round(self.stddev, 2),
+            "threshold_ms": round(threshold, 2) if threshold is not None else None,
+            "loss_pct": round(self.loss, 1)
+        }
+
+class ProbeState:
+    """Baseline, recent history and consecutive-problem count of one probe on one target."""
+
+    __slots__ = ("name", "baseline", "recent", "failures", "bad", "problem")
+
+    def __init__(self, name: str, baseline: Baseline, history: int = 10):
+        self.name = name
+        self.baseline = baseline
+        self.recent: Deque[Sample] = deque(maxlen=history)
+        # Consecutive failed samples, and consecutive failed or anomalous ones
+        self.failures = 0
+        self.bad = 0
+        # Latest failure or baseline deviation, cleared by a normal sample
+        self.problem: Optional[str] = None
+
+    def record(self, sample: Sample) -> None:
+        self.recent.append(sample)
+        if not sample.ok:
+            self.failures += 1
+            self.bad += 1
+            self.problem = sample.detail or "probe failed"
+            return
+        self.failures = 0
+        deviation = self.baseline.check(sample)
+        if deviation:
+            self.bad += 1
+            self.problem = deviation
+        else:
+            self.bad = 0
+            self.problem = None
+        self.baseline.update(sample, anomalous=deviation is not None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "baseline": self.baseline.to_dict(),
+            "problem": self.problem,
+            "recent": [sample.to_dict() for sample in self.recent]
+        }
+
+class TargetState:
+    """Everything the monitor knows about one target."""
+
+    __slots__ = ("target", "probes", "state", "since", "last_escalated", "escalated_state")
+
+    def __init__(self, target: Target, probes: Dict[str, ProbeState]):
+        self.target = target
+        self.probes = probes
+        # None until the first round of probes has finished
+        self.state: Optional[str] = None
+        self.since = time.time()
+        self.last_escalated = 0.0
+        self.escalated_state: Optional[str] = None
+
+    def evaluate(self, required: int) -> Tuple[str, List[str]]:
+        """
+        The target's state and the reasons for it.
+
+        A target is down when every probe has failed ``required`` times in a
+        row, degraded when any probe has failed or been outside its baseline
+        that often, and up otherwise.
+        """
+        reasons = []
+        failing = 0
+        degraded = False
+        for name, probe in self.probes.items():
+            if probe.failures >= required:
+                failing += 1
+                reasons.append(f"{name}: {probe.problem}")
+            elif probe.bad >= required:
+                degraded = True
+                reasons.append(f"{name}: {probe.problem}")
+        if failing == len(self.probes):
+            return DOWN, reasons
+        if failing or degraded:
+            return DEGRADED, reasons
+        return UP, reasons
+
+class Monitor:
+    """
+    Probe targets on their own schedules and escalate state changes.
+
+    Probes run on one event loop; each target is probed in its own task,
+    with its probes concurrent. Escalations go through a queue to a single
+    worker, so at most one agent turn runs at a time and probing never
+    waits for the LLM.
+    """
+
+    def __init__(self, targets: List[Target], escalate: Optional[Callable[[Dict[str, Any]], str]] = None,
+                 ping_tool: Optional[Tool] = None, traceroute_tool: Optional[Tool] = None,
+                 resolver: Optional[Resolver] = None, alert_log: Optional[str] = None,
+                 cooldown: Optional[float] = None, required: Optional[int] = None,
+                 deviations: Optional[float] = None, ping_count: int = 3, timeout: float = 2.0):
+        """
+        Args:
+            targets: Targets to probe
+            escalate: Called in a worker thread with the evidence bundle, returns a diagnosis;
+                None records alerts without asking anyone
+            ping_tool, traceroute_tool: Tools used for probes and evidence (default: the real ones)
+            resolver: Resolver for DNS probes; must not cache, so every probe really queries
+            alert_log: JSON-lines file for state changes (default: Config.MONITOR_ALERT_LOG)
+            cooldown: Seconds between escalations of one target in the same state
+            required: Consecutive failed or anomalous probes before the state changes
+            deviations: Standard deviations above the mean that count as anomalous
+        """
+        self.targets = targets
+        self.escalate = escalate
+        self.ping_tool = ping_tool or PingTool()
+        self.traceroute_tool = traceroute_tool or TracerouteTool()
+        if resolver is None:
+            nameservers = [s.strip() for s in Config.DNS_NAMESERVERS.split(",") if s.strip()] or None
+            resolver = Resolver(nameservers, timeout=Config.DNS_TIMEOUT, cache_size=0)
+        self.resolver = resolver
+        self.alert_log = Config.MONITOR_ALERT_LOG if alert_log is None else alert_log
+        self.cooldown = Config.MONITOR_COOLDOWN if cooldown is None else cooldown
+        self.required = max(1, Config.MONITOR_FAILURES if required is None else required)
+        deviations = Config.MONITOR_DEVIATIONS if deviations is None else deviations
+        self.ping_count = ping_count
+        self.timeout = timeout
+
+        self.states = {
+            target.host: TargetState(target, {
+                probe: ProbeState(probe, Baseline(deviations=deviations)) for probe in target.probes
+            })
+            for target in targets
+        }
+        self.alerts: List[Dict[str, Any]] = []
+        self.escalations = 0
+        self._queue: Optional[asyncio.Queue] = None
+
+    async def probe(self, host: str, probe: str) -> Sample:
+        """Run one probe and time it."""
+        start = time.perf_counter()
+        try:
+            if probe == "ping":
+                sample = await self._ping(host)
+            elif probe == "dns":
+                sample = await self._dns(host)
+            else:
+                sample = await self._tcp(host, int(probe.split(":", 1)[1]))
+        except Exception as e:
+            sample = Sample(False, detail=f"{type(e).__name__}: {e}")
+        get_history().record(host, probe, sample.latency, sample.loss, sample.at)
+        kind = probe.split(":", 1)[0]
+        MONITOR_PROBE_SECONDS.labels(kind).observe(time.perf_counter() - start)
+        if not sample.ok:
+            MONITOR_PROBE_FAILURES.labels(kind).inc()
+        return sample
+
+    async def _ping(self, host: str) -> Sample:
+        result = await self.ping_tool.execute_async(
+            {"host": host, "count": self.ping_count, "timeout": self.timeout}
+        )
+        if not isinstance(result, PingResult):
+            return Sample(False, loss=100.0, detail=serialize(result))
+        if not result.reachable:
+            return Sample(False, loss=result.loss, detail=f"no replies to {result.sent} pings")
+        return Sample(True, result.rtt_avg, result.loss)
+
+    async def _dns(self, host: str) -> Sample:
+        start = time.perf_counter()
+        try:
+            answer = await self.resolver.resolve(host, "A")
+        except DNSError as e:
+            return Sample(False, detail=f"DNS lookup failed: {e}")
+        latency = (time.perf_counter() - start) * 1000
+        if answer.rcode != "NOERROR" or not answer.records:
+            return Sample(False, latency, detail=f"DNS answer {answer.rcode} with {len(answer.records)} records")
+        return Sample(True, latency)
+
+    async def _tcp(self, host: str, port: int) -> Sample:
+        start = time.perf_counter()
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), self.timeout)
+        except asyncio.TimeoutError:
+            return Sample(False, loss=100.0, detail=f"connect to port {port} timed out after {self.timeout}s")
+        except OSError as e:
+            return Sample(False, loss=100.0, detail=f"connect to port {port} failed: {e.strerror or e}")
+        latency = (time.perf_counter() - start) * 1000
+        writer.close()
+        return Sample(True, latency)
+
+    async def check(self, host: str) -> Optional[Dict[str, Any]]:
+        """Probe one target once; return the alert if its state changed or needs escalating."""
+        target_state = self.states[host]
+        probes = list(target_state.probes)
+        samples = await asyncio.gather(*(self.probe(host, probe) for probe in probes))
+        for probe, sample in zip(probes, samples):
+            target_state.probes[probe].record(sample)
+        return self._transition(target_state)
+
+    def _transition(self, target_state: TargetState) -> Optional[Dict[str, Any]]:
+        state, reasons = target_state.evaluate(self.required)
+        previous = target_state.state
+        now = time.time()
+
+        if state != previous:
+            target_state.state = state
+            target_state.since = now
+            if previous is None and state == UP:
+                return None
+            MONITOR_STATE_CHANGES.labels(state).inc()
+        elif state == UP:
+            return None
+
+        # Escalate on a change to a worse state, or again after the cooldown if the problem persists
+        escalate = state != UP and (
+            SEVERITY[state] > SEVERITY[target_state.escalated_state]
+            or now - target_state.last_escalated >= self.cooldown
+        )
+        if state == previous and not escalate:
+            return None
+        if escalate:
+            target_state.last_escalated = now
+            target_state.escalated_state = state
+        elif state == UP:
+            target_state.escalated_state = None
+
+        return {
+            "time": datetime.fromtimestamp(now, timezone.utc).isoformat(timespec="seconds"),
+            "target": target_state.target.host,
+            "from": previous,
+            "to": state,
+            "reasons": reasons,
+            "escalate": escalate
+        }
+
+    def evidence(self, host: str, alert: Dict[str, Any], trace: Optional[ToolResult] = None) -> Dict[str, Any]:
+        """The bundle handed to the agent: alert, per-probe baselines and recent samples."""
+        target_state = self.states[host]
+        bundle = {
+            "target": host,
+            "state": alert["to"],
+            "previous_state": alert["from"],
+            "reasons": alert["reasons"],
+            "probe_interval_s": target_state.target.interval,
+            "probes": {name: probe.to_dict() for name, probe in target_state.probes.items()}
+        }
+        if trace is not None:
+            bundle["traceroute"] = json.loads(serialize(trace)) if trace.ok else serialize(trace)
+        return bundle
+
+    async def handle(self, alert: Dict[str, Any]) -> None:
+        """Report an alert; queue it for the agent if it needs escalating."""
+        icon = STATE_ICONS.get(alert["to"], "🔔")
+        print(f"{icon} {alert['target']}: {alert['from'] or 'new'} → {alert['to']}"
+              + (f" ({'; '.join(alert['reasons'])})" if alert["reasons"] else ""))
+
+        if alert["escalate"]:
+            try:
+                trace = await self.traceroute_tool.execute_async({"host": alert["target"], "max_hops": 20})
+            except Exception:
+                trace = None
+            alert["evidence"] = self.evidence(alert["target"], alert, trace)
+            if self.escalate is not None and self._queue is not None:
+                self._queue.put_nowait(alert)
+                return
+        self._write_alert(alert)
+
+    def _write_alert(self, alert: Dict[str, Any]) -> None:
+        self.alerts.append(alert)
+        if not self.alert_log:
+            return
+        with open(self.alert_log, "a", encoding="utf-8") as f:
+            f.write(json.dumps(alert, ensure_ascii=False, default=str) + "\n")
+
+    async def _escalation_worker(self) -> None:
+        while True:
+            alert = await self._queue.get()
+            try:
+                MONITOR_ESCALATIONS.inc()
+                self.escalations += 1
+                print(f"🤖 Asking the agent about {alert['target']}...")
+                alert["diagnosis"] = await asyncio.to_thread(self.escalate, alert["evidence"])
+                print(f"🩺 {alert['target']}: {alert['diagnosis']}")
+            except Exception as e:
+                alert["diagnosis"] = f"Error: {e}"
+            finally:
+                self._write_alert(alert)
+                self._queue.task_done()
+
+    async def _watch(self, target: Target) -> None:
+        loop = asyncio.get_running_loop()
+        # Spread the first round over one interval so targets are not probed in bursts
+        next_run = loop.time() + random.uniform(0, min(target.interval, 5.0))
+        while True:
+            await asyncio.sleep(max(0.0, next_run - loop.time()))
+            next_run += target.interval
+            alert = await self.check(target.host)
+            if alert is not None:
+                await self.handle(alert)
+
+    async def run(self, duration: Optional[float] = None) -> None:
+        """Probe until cancelled, or for ``duration`` seconds; pending escalations finish first."""
+        self._queue = asyncio.Queue()
+        worker = asyncio.create_task(self._escalation_worker())
+        watchers = [asyncio.create_task(self._watch(target)) for target in self.targets]
+        try:
+            await asyncio.wait(watchers, timeout=duration)
+        finally:
+            for task in watchers:
+                task.cancel()
+            await asyncio.gather(*watchers, return_exceptions=True)
+            if duration is not None:
+                await self._queue.join()
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+
+def escalation_prompt(evidence: Dict[str, Any]) -> str:
+    """The message sent to the agent for one escalation."""
+    return (
+        f"Monitoring alert: {evidence['target']} is {evidence['state']} "
+        f"(was {evidence['previous_state'] or 'unknown'}). "
+        "The evidence below was collected by scheduled probes; baselines are EWMA over recent samples. "
+        "Diagnose the likely cause and suggest next steps. Only run more tools if the evidence is not enough.\n"
+        f"Evidence: {json.dumps(evidence, separators=(',', ':'), ensure_ascii=False)}"
+    )
+
+def agent_escalation(model: Optional[str] = None) -> Callable[[Dict[str, Any]], str]:
+    """An escalate callback that asks a fresh-context Agent, created on first use."""
+    agent = None
+
+    def escalate(evidence: Dict[str, Any]) -> str:
+        nonlocal agent
+        if agent is None:
+            from agent import Agent
+            agent = Agent(model=model, stream=False)
+        # Each alert is diagnosed on its own evidence
+        agent.reset_context()
+        return agent.process(escalation_prompt(evidence))
+
+    return escalate
+
+def main():
+    parser = argparse.ArgumentParser(description="Probe targets continuously and escalate anomalies to the agent")
+    parser.add_argument("targets", help="Target list file")
+    parser.add_argument("--interval", type=float, default=Config.MONITOR_INTERVAL,
+                        help="Default seconds between probes of a target")
+    parser.add_argument("--model", help="Model for escalations (default: OPENAI_MODEL)")
+    parser.add_argument("--no-llm", action="store_true", help="Record alerts without asking the agent")
+    args = parser.parse_args()
+
+    try:
+        targets = load_targets(args.targets, args.interval)
+    except (OSError, ValueError) as e:
+        print(f"❌ Error: {e}")
+        return
+    if not targets:
+        print("❌ Error: no targets in " + args.targets)
+        return
+    if not args.no_llm and not Config.validate():
+        return
+
+    monitor = Monitor(targets, escalate=None if args.no_llm else agent_escalation(args.model))
+    if Config.METRICS_PORT:
+        start_metrics_server(Config.METRICS_PORT, Config.METRICS_HOST)
+        print(f"📈 Metrics at http://{Config.METRICS_HOST}:{Config.METRICS_PORT}/metrics")
+
+    print(f"👀 Monitoring {len(targets)} targets; alerts go to {monitor.alert_log or 'the console only'}")
+    for target in targets:
+        print(f"  📍 {target.host}: {', '.join(target.probes)} every {target.interval:g}s")
+
+    try:
+        asyncio.run(monitor.run())
+    except KeyboardInterrupt:
+        print(f"\n👋 Stopped after {len(monitor.alerts)} alerts and {monitor.escalations} escalations")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Progress of running tools, for the spinner and streamed events.
+
+Tools call ``report(text)`` whenever they learn something worth showing,
+e.g. a ping reply or a traceroute hop. The agent runs each tool call
+inside ``reporting(callback)``; the callback lives in a context variable,
+so it follows the call into worker threads and asyncio tasks. Outside a
+reporting scope ``report`` does nothing.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+# Reports closer together than this are dropped, except the first
+MIN_INTERVAL = 0.1
+
+class ProgressReporter:
+    """Passes progress text to a callback, at most every ``interval`` seconds."""
+
+    __slots__ = ("callback", "interval", "_last", "_lock")
+
+    def __init__(self, callback: Callable[[str], None], interval: float = MIN_INTERVAL):
+        self.callback = callback
+        self.interval = interval
+        self._last = 0.0
+        self._lock = threading.Lock()
+
+    def report(self, text: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last < self.interval:
+                return
+            self._last = now
+        self.callback(text)
+
+_current: contextvars.ContextVar[Optional[ProgressReporter]] = contextvars.ContextVar("progress", default=None)
+
+def report(text: str) -> None:
+    """Show ``text`` as the progress of the running tool call, if anyone is listening."""
+    reporter = _current.get()
+    if reporter is not None:
+        reporter.report(text)
+
+@contextmanager
+def reporting(callback: Optional[Callable[[str], None]]) -> Iterator[None]:
+    """Send the progress reported inside the block to ``callback``; None keeps the current listener."""
+    if callback is None:
+        yield
+        return
+    token = _current.set(ProgressReporter(callback))
+    try:
+        yield
+    finally:
+        _current.reset(token)
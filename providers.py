@@ -0,0 +1,496 @@
+"""
+Provider pool: send chat completions to the fastest healthy endpoint.
+
+The pool holds the configured OPENAI_BASE_URL and any LLM_FALLBACKS, each
+an OpenAI-compatible endpoint with its own client. Every request goes to
+the endpoint with the lowest recent latency, weighted by its recent error
+rate. Rate limits, server errors and connection failures fail over to
+the next endpoint, or are retried with jittered exponential backoff once
+every endpoint has been tried. An endpoint that fails several times in a
+row is skipped for LLM_COOLDOWN seconds.
+
+With LLM_HEDGE on, a request still unanswered after the endpoint's p95
+latency is sent again to the runner-up, and the first answer wins. This
+cuts the tail latency caused by a slow provider, at the cost of
+occasionally paying for two requests.
+
+Inside a turn, every attempt gets what is left of the turn's deadline as
+its timeout, and no retry is started (or waited for) that cannot finish
+in time.
+
+The openai SDK (and its httpx/pydantic stack) is the slowest import of
+the agent, so it is only imported when the first endpoint client is
+built, i.e. on the first LLM request.
+"""
+import asyncio
+import email.utils
+import math
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+from config import Config
+from deadline import DeadlineExceeded, remaining
+from metrics import LLM_PROVIDER_ATTEMPTS, LLM_PROVIDER_SECONDS, LLM_HEDGES
+
+if TYPE_CHECKING:
+    import httpx
+    from openai import OpenAI, AsyncOpenAI
+
+# Share of requests sent to the runner-up so its latency estimate stays current
+EXPLORE = 0.05
+# Failures in a row that take an endpoint out of rotation for the cooldown
+TRIP_FAILURES = 3
+# Latency samples kept per endpoint, and how many are needed before hedging
+LATENCY_WINDOW = 64
+MIN_HEDGE_SAMPLES = 10
+# Longest wait between retries, including a server's Retry-After
+MAX_BACKOFF = 30.0
+
+def classify_error(error: BaseException) -> str:
+    """
+    How a failed request should be handled.
+
+    Returns:
+        "retry" when the endpoint is overloaded or unreachable, "failover"
+        when only this endpoint rejects it (a wrong key or unknown model),
+        and "fatal" when the request itself is bad and no endpoint will take it
+    """
+    openai = sys.modules.get("openai")
+    if openai is None:
+        # No client was ever built, so this cannot be an API error
+        return "fatal"
+    if isinstance(error, openai.APIConnectionError):
+        return "retry"
+    if isinstance(error, openai.APIStatusError):
+        status = error.status_code
+        if status in (408, 409, 429) or status >= 500:
+            return "retry"
+        if status in (400, 413, 422):
+            return "fatal"
+        return "failover"
+    return "fatal"
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds from the Retry-After header of an error response, if any."""
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def parse_fallbacks(spec: str) -> List["Endpoint"]:
+    """
+    Parse LLM_FALLBACKS: comma-separated ``base_url [model] [API_KEY_VARIABLE]``.
+
+    Without a model the agent's model is used. Without a key variable no
+    real key is sent (the placeholder "none", for local servers); the
+    primary OPENAI_API_KEY is never sent to a fallback unless it is named.
+    An entry whose key variable is unset or empty is left out with a warning.
+
+    Raises:
+        ValueError: For a malformed entry
+    """
+    endpoints = []
+    for entry in spec.split(","):
+        fields = entry.split()
+        if not fields:
+            continue
+        if len(fields) > 3:
+            raise ValueError(f"LLM_FALLBACKS entry {entry.strip()!r}: expected base_url [model] [API_KEY_VARIABLE]")
+        model = fields[1] if len(fields) > 1 else None
+        api_key = "none"
+        if len(fields) > 2:
+            api_key = os.getenv(fields[2], "")
+            if not api_key:
+                print(f"⚠️  LLM fallback {fields[0]} skipped: {fields[2]} is not set")
+                continue
+        endpoints.append(Endpoint(fields[0], api_key, model))
+    return endpoints
+
+def _limits() -> "httpx.Limits":
+    try:
+        import httpx
+    except ImportError:
+        # openai releases built on httpx2 ship it instead of httpx
+        import httpx2 as httpx
+    # Idle connections survive the pause between turns, so a turn does not
+    # start with a new TCP and TLS handshake
+    return httpx.Limits(max_connections=Config.LLM_MAX_CONNECTIONS,
+                        max_keepalive_connections=Config.LLM_MAX_CONNECTIONS,
+                        keepalive_expiry=Config.LLM_KEEPALIVE)
+
+class LatencyStats:
+    """EWMA and recent samples of one endpoint's response time."""
+
+    __slots__ = ("ewma", "samples")
+
+    def __init__(self):
+        self.ewma: Optional[float] = None
+        self.samples: deque = deque(maxlen=LATENCY_WINDOW)
+
+    def observe(self, seconds: float) -> None:
+        self.ewma = seconds if self.ewma is None else self.ewma + 0.2 * (seconds - self.ewma)
+        self.samples.append(seconds)
+
+    def p95(self) -> Optional[float]:
+        if len(self.samples) < MIN_HEDGE_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+class Endpoint:
+    """
+    One OpenAI-compatible endpoint and its health.
+
+    Streamed and complete responses are timed separately: for a stream the
+    client returns once the response headers arrive, long before the
+    answer is complete.
+    """
+
+    def __init__(self, base_url: str, api_key: str, model: Optional[str] = None, name: Optional[str] = None):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.name = name or urlparse(base_url).netloc or base_url
+        self.latency = {False: LatencyStats(), True: LatencyStats()}
+        self.error_rate = 0.0
+        self.failures = 0
+        self.down_until = 0.0
+        self._client: Optional["OpenAI"] = None
+        self._async_client: Optional["AsyncOpenAI"] = None
+
+    @property
+    def client(self) -> "OpenAI":
+        if self._client is None:
+            from openai import OpenAI, DefaultHttpxClient
+            # Retries are the pool's job, so it can fail over instead
+            self._client = OpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0,
+                                  http_client=DefaultHttpxClient(limits=_limits()))
+        return self._client
+
+    @property
+    def async_client(self) -> "AsyncOpenAI":
+        if self._async_client is None:
+            from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+            self._async_client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0,
+                                             http_client=DefaultAsyncHttpxClient(limits=_limits()))
+        return self._async_client
+
+    def score(self, stream: bool) -> float:
+        """Expected response time, inflated by the recent error rate; unmeasured endpoints rank last."""
+        ewma = self.latency[stream].ewma
+        return float("inf") if ewma is None else ewma * (1 + 4 * self.error_rate)
+
+    def succeeded(self, seconds: float, stream: bool) -> None:
+        self.latency[stream].observe(seconds)
+        self.error_rate *= 0.8
+        self.failures = 0
+
+    def abandoned(self, seconds: float, stream: bool) -> None:
+        # A request cancelled after ``seconds`` took at least that long, which
+        # only tells something when it is more than the estimate
+        stats = self.latency[stream]
+        if stats.ewma is None or seconds > stats.ewma:
+            stats.observe(seconds)
+
+    def failed(self, cooldown: float) -> None:
+        self.error_rate = self.error_rate * 0.8 + 0.2
+        self.failures += 1
+        if self.failures >= TRIP_FAILURES:
+            self.down_until = time.monotonic() + cooldown
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "model": self.model,
+            "latency_s": {("stream" if stream else "complete"): stats.ewma
+                          for stream, stats in self.latency.items() if stats.ewma is not None},
+            "error_rate": round(self.error_rate, 3),
+            "cooling_down": time.monotonic() < self.down_until
+        }
+
+class ProviderPool:
+    """
+    Chat completions across several endpoints with routing, failover,
+    retries and optional hedging.
+
+    ``create`` and ``acreate`` take the arguments of
+    ``client.chat.completions.create``; an endpoint configured with its own
+    model replaces ``model``.
+    """
+
+    def __init__(self, endpoints: List[Endpoint], retries: int = 2, backoff: float = 0.5,
+                 cooldown: float = 30.0, hedge: bool = False):
+        if not endpoints:
+            raise ValueError("a provider pool needs at least one endpoint")
+        self.endpoints = endpoints
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.cooldown = cooldown
+        self.hedge = hedge
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @classmethod
+    def from_config(cls) -> "ProviderPool":
+        endpoints = [Endpoint(Config.OPENAI_BASE_URL, Config.OPENAI_API_KEY)]
+        endpoints.extend(parse_fallbacks(Config.LLM_FALLBACKS))
+        return cls(endpoints, Config.LLM_RETRIES, Config.LLM_BACKOFF, Config.LLM_COOLDOWN, Config.LLM_HEDGE)
+
+    @property
+    def attempts(self) -> int:
+        """Requests one call may make: every endpoint once, and at least 1 + retries."""
+        return max(self.retries + 1, len(self.endpoints))
+
+    def ranked(self, stream: bool, tried: Optional[Dict[Endpoint, int]] = None) -> List[Endpoint]:
+        """
+        Endpoints in the order they should be tried.
+
+        Endpoints in their cooldown come last, soonest back first. Among the
+        rest, the ones this call has tried fewer times come first, then the
+        lowest score, then configuration order.
+        """
+        tried = tried or {}
+        now = time.monotonic()
+        order = {endpoint: index for index, endpoint in enumerate(self.endpoints)}
+        with self._lock:
+            return sorted(self.endpoints, key=lambda e: (
+                e.down_until > now, e.down_until if e.down_until > now else 0.0,
+                tried.get(e, 0), e.score(stream), order[e]
+            ))
+
+    def _plan(self, stream: bool, tried: Dict[Endpoint, int], excluded: Set[Endpoint],
+              attempt: int, error: Optional[BaseException]) -> Tuple[Endpoint, Endpoint, float]:
+        """The endpoint for the next attempt, its hedging backup and the wait before sending."""
+        candidates = [e for e in self.ranked(stream, tried) if e not in excluded]
+        if attempt == 0 and len(candidates) > 1 and random.random() < EXPLORE:
+            candidates[0], candidates[1] = candidates[1], candidates[0]
+        endpoint = candidates[0]
+        backup = candidates[1] if len(candidates) > 1 else endpoint
+
+        delay = 0.0
+        count = tried.get(endpoint, 0)
+        if count:
+            # Every endpoint has been tried; back off with full jitter before trying again
+            delay = random.uniform(0, min(MAX_BACKOFF, self.backoff * 2 ** (count - 1)))
+            server_wait = retry_after(error) if error is not None else None
+            if server_wait is not None:
+                delay = max(delay, min(server_wait, MAX_BACKOFF))
+        tried[endpoint] = count + 1
+        return endpoint, backup, delay
+
+    def _hedge_delay(self, endpoint: Endpoint, stream: bool) -> Optional[float]:
+        if not self.hedge:
+            return None
+        with self._lock:
+            return endpoint.latency[stream].p95()
+
+    def _record(self, endpoint: Endpoint, stream: bool, seconds: float, error: Optional[BaseException]) -> None:
+        LLM_PROVIDER_SECONDS.labels(endpoint.name).observe(seconds)
+        if error is None:
+            LLM_PROVIDER_ATTEMPTS.labels(endpoint.name, "ok").inc()
+            with self._lock:
+                endpoint.succeeded(seconds, stream)
+            return
+        kind = classify_error(error)
+        LLM_PROVIDER_ATTEMPTS.labels(endpoint.name, kind).inc()
+        if kind != "fatal":
+            with self._lock:
+                endpoint.failed(self.cooldown)
+
+    def _handle_error(self, error: BaseException, endpoint: Endpoint, excluded: Set[Endpoint]) -> None:
+        """Re-raise errors no other attempt can fix; remember endpoints that reject the request."""
+        kind = classify_error(error)
+        if kind == "fatal":
+            raise error
+        if kind == "failover":
+            excluded.add(endpoint)
+            if len(excluded) == len(self.endpoints):
+                raise error
+
+    @staticmethod
+    def _within_deadline(kwargs: Dict[str, Any], wait_for: float, error: Optional[BaseException]) -> Dict[str, Any]:
+        """The request arguments with the time left in the turn, after ``wait_for``, as timeout."""
+        left = remaining()
+        if left is None or math.isinf(left):
+            return kwargs
+        left -= wait_for
+        if left <= 0:
+            raise DeadlineExceeded("no time left in this turn for the LLM request") from error
+        return dict(kwargs, timeout=min(left, kwargs.get("timeout") or left))
+
+    # Synchronous requests (Agent)
+
+    def _call(self, endpoint: Endpoint, kwargs: Dict[str, Any]):
+        stream = bool(kwargs.get("stream"))
+        if endpoint.model:
+            kwargs = dict(kwargs, model=endpoint.model)
+        start = time.perf_counter()
+        try:
+            response = endpoint.client.chat.completions.create(**kwargs)
+        except Exception as e:
+            self._record(endpoint, stream, time.perf_counter() - start, e)
+            raise
+        self._record(endpoint, stream, time.perf_counter() - start, None)
+        return response
+
+    @staticmethod
+    def _discard(future: Future) -> None:
+        # The losing request of a hedge; close its stream so the connection is freed
+        if not future.cancelled() and future.exception() is None:
+            close = getattr(future.result(), "close", None)
+            if close is not None:
+                close()
+
+    def _hedged(self, endpoint: Endpoint, backup: Endpoint, delay: float, kwargs: Dict[str, Any]):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="llm-hedge")
+        primary = self._executor.submit(self._call, endpoint, kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        hedge = self._executor.submit(self._call, backup, kwargs)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    LLM_HEDGES.labels("hedge" if future is hedge else "primary").inc()
+                    for loser in pending | (done - {future}):
+                        loser.add_done_callback(self._discard)
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def create(self, **kwargs):
+        """Send one chat completion request, routed, retried and hedged as configured."""
+        stream = bool(kwargs.get("stream"))
+        tried: Dict[Endpoint, int] = {}
+        excluded: Set[Endpoint] = set()
+        error: Optional[BaseException] = None
+        for attempt in range(self.attempts):
+            endpoint, backup, wait_for = self._plan(stream, tried, excluded, attempt, error)
+            request = self._within_deadline(kwargs, wait_for, error)
+            if wait_for:
+                time.sleep(wait_for)
+            hedge_delay = self._hedge_delay(endpoint, stream)
+            try:
+                if hedge_delay is None:
+                    return self._call(endpoint, request)
+                return self._hedged(endpoint, backup, hedge_delay, request)
+            except Exception as e:
+                self._handle_error(e, endpoint, excluded)
+                error = e
+        raise error
+
+    # Asynchronous requests (AsyncAgent)
+
+    async def _acall(self, endpoint: Endpoint, kwargs: Dict[str, Any]):
+        stream = bool(kwargs.get("stream"))
+        if endpoint.model:
+            kwargs = dict(kwargs, model=endpoint.model)
+        start = time.perf_counter()
+        try:
+            response = await endpoint.async_client.chat.completions.create(**kwargs)
+        except asyncio.CancelledError:
+            # Usually the slower request of a hedge
+            with self._lock:
+                endpoint.abandoned(time.perf_counter() - start, stream)
+            raise
+        except Exception as e:
+            self._record(endpoint, stream, time.perf_counter() - start, e)
+            raise
+        self._record(endpoint, stream, time.perf_counter() - start, None)
+        return response
+
+    @staticmethod
+    async def _adiscard(task: "asyncio.Task") -> None:
+        if not task.done():
+            task.cancel()
+            return
+        if not task.cancelled() and task.exception() is None:
+            close = getattr(task.result(), "close", None)
+            if close is not None:
+                await close()
+
+    async def _ahedged(self, endpoint: Endpoint, backup: Endpoint, delay: float, kwargs: Dict[str, Any]):
+        primary = asyncio.ensure_future(self._acall(endpoint, kwargs))
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                tasks.clear()
+                return primary.result()
+
+            hedge = asyncio.ensure_future(self._acall(backup, kwargs))
+            tasks.add(hedge)
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        LLM_HEDGES.labels("hedge" if task is hedge else "primary").inc()
+                        tasks.discard(task)
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            # The loser, or both requests if the caller gave up
+            for task in tasks:
+                await self._adiscard(task)
+
+    async def acreate(self, **kwargs):
+        """Async version of ``create``."""
+        stream = bool(kwargs.get("stream"))
+        tried: Dict[Endpoint, int] = {}
+        excluded: Set[Endpoint] = set()
+        error: Optional[BaseException] = None
+        for attempt in range(self.attempts):
+            endpoint, backup, wait_for = self._plan(stream, tried, excluded, attempt, error)
+            request = self._within_deadline(kwargs, wait_for, error)
+            if wait_for:
+                await asyncio.sleep(wait_for)
+            hedge_delay = self._hedge_delay(endpoint, stream)
+            try:
+                if hedge_delay is None:
+                    return await self._acall(endpoint, request)
+                return await self._ahedged(endpoint, backup, hedge_delay, request)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._handle_error(e, endpoint, excluded)
+                error = e
+        raise error
+
+    def describe(self) -> List[Dict[str, Any]]:
+        """Health and latency of each endpoint, best first."""
+        return [endpoint.describe() for endpoint in self.ranked(False)]
+
+    def close(self) -> None:
+        for endpoint in self.endpoints:
+            if endpoint._client is not None:
+                endpoint._client.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    async def aclose(self) -> None:
+        for endpoint in self.endpoints:
+            if endpoint._async_client is not None:
+                await endpoint._async_client.close()
@@ -0,0 +1,376 @@
+import asyncio
+import random
+import socket
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from config import Config
+from deadline import budget, expired
+
+RECORD_TYPES = {
+    "A": 1,
+    "NS": 2,
+    "CNAME": 5,
+    "SOA": 6,
+    "MX": 15,
+    "TXT": 16,
+    "AAAA": 28
+}
+RECORD_NAMES = {value: name for name, value in RECORD_TYPES.items()}
+
+RCODES = {
+    0: "NOERROR",
+    1: "FORMERR",
+    2: "SERVFAIL",
+    3: "NXDOMAIN",
+    4: "NOTIMP",
+    5: "REFUSED"
+}
+
+# Negative answers without an SOA record are cached for this long
+DEFAULT_NEGATIVE_TTL = 60
+# Upper bound for any cached answer, whatever the record TTL says
+MAX_CACHE_TTL = 86400
+
+class DNSError(Exception):
+    """Raised when no nameserver gives a usable answer."""
+    pass
+
+class DNSRecord:
+    """One resource record from the answer or authority section."""
+
+    def __init__(self, name: str, rtype: int, ttl: int, value: str):
+        self.name = name
+        self.rtype = rtype
+        self.ttl = ttl
+        self.value = value
+
+    @property
+    def type_name(self) -> str:
+        return RECORD_NAMES.get(self.rtype, str(self.rtype))
+
+class DNSResponse:
+    """A parsed DNS response message."""
+
+    def __init__(self, qid: int, rcode: int, truncated: bool,
+                 answers: List[DNSRecord], authority: List[DNSRecord],
+                 soa_minimum: Optional[int] = None):
+        self.qid = qid
+        self.rcode = rcode
+        self.truncated = truncated
+        self.answers = answers
+        self.authority = authority
+        self.soa_minimum = soa_minimum
+
+    @property
+    def rcode_name(self) -> str:
+        return RCODES.get(self.rcode, str(self.rcode))
+
+class DNSResult:
+    """The answer to one lookup as served to callers, possibly from cache."""
+
+    def __init__(self, name: str, record_type: str, rcode: str, records: List[DNSRecord],
+                 ttl: int, server: str, elapsed: float, cached: bool = False):
+        self.name = name
+        self.record_type = record_type
+        self.rcode = rcode
+        self.records = records
+        self.ttl = ttl
+        self.server = server
+        self.elapsed = elapsed
+        self.cached = cached
+
+def build_query(name: str, rtype: int, qid: int) -> bytes:
+    """Build a recursive query for one name and record type."""
+    header = struct.pack("!HHHHHH", qid, 0x0100, 1, 0, 0, 0)
+    question = b""
+    for label in name.rstrip(".").split("."):
+        if label:
+            try:
+                encoded = label.encode("idna")
+            except UnicodeError:
+                raise DNSError(f"invalid label {label!r} in {name}")
+            if len(encoded) > 63:
+                raise DNSError(f"label too long in {name}")
+            question += bytes([len(encoded)]) + encoded
+    return header + question + b"\0" + struct.pack("!HH", rtype, 1)
+
+def _read_name(data: bytes, offset: int) -> Tuple[str, int]:
+    """Read a possibly compressed domain name and return it with the next offset."""
+    labels = []
+    end = None
+    jumps = 0
+    while True:
+        if offset >= len(data):
+            raise DNSError("truncated name")
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            if jumps > 32:
+                raise DNSError("compression loop")
+            pointer = struct.unpack("!H", data[offset:offset + 2])[0] & 0x3FFF
+            if end is None:
+                end = offset + 2
+            offset = pointer
+            jumps += 1
+            continue
+        if length == 0:
+            offset += 1
+            break
+        labels.append(data[offset + 1:offset + 1 + length].decode("ascii", errors="replace"))
+        offset += 1 + length
+    return ".".join(labels), end if end is not None else offset
+
+def _read_record(data: bytes, offset: int) -> Tuple[DNSRecord, int, Optional[int]]:
+    """Read one resource record; also returns the SOA minimum for SOA records."""
+    name, offset = _read_name(data, offset)
+    rtype, _, ttl, length = struct.unpack("!HHIH", data[offset:offset + 10])
+    offset += 10
+    rdata_start = offset
+    rdata = data[offset:offset + length]
+    soa_minimum = None
+
+    if rtype == RECORD_TYPES["A"] and length == 4:
+        value = socket.inet_ntop(socket.AF_INET, rdata)
+    elif rtype == RECORD_TYPES["AAAA"] and length == 16:
+        value = socket.inet_ntop(socket.AF_INET6, rdata)
+    elif rtype in (RECORD_TYPES["CNAME"], RECORD_TYPES["NS"]):
+        value = _read_name(data, rdata_start)[0]
+    elif rtype == RECORD_TYPES["MX"]:
+        preference = struct.unpack("!H", rdata[:2])[0]
+        value = f"{preference} {_read_name(data, rdata_start + 2)[0]}"
+    elif rtype == RECORD_TYPES["TXT"]:
+        parts = []
+        position = 0
+        while position < len(rdata):
+            size = rdata[position]
+            parts.append(rdata[position + 1:position + 1 + size].decode("utf-8", errors="replace"))
+            position += 1 + size
+        value = "".join(parts)
+    elif rtype == RECORD_TYPES["SOA"]:
+        mname, position = _read_name(data, rdata_start)
+        rname, position = _read_name(data, position)
+        serial, _, _, _, soa_minimum = struct.unpack("!IIIII", data[position:position + 20])
+        value = f"{mname} {rname} {serial}"
+    else:
+        value = rdata.hex()
+
+    return DNSRecord(name, rtype, ttl, value), rdata_start + length, soa_minimum
+
+def parse_response(data: bytes) -> DNSResponse:
+    """Parse a DNS response message."""
+    if len(data) < 12:
+        raise DNSError("response too short")
+    qid, flags, qdcount, ancount, nscount, _ = struct.unpack("!HHHHHH", data[:12])
+    offset = 12
+    for _ in range(qdcount):
+        _, offset = _read_name(data, offset)
+        offset += 4
+
+    truncated = bool(flags & 0x0200)
+    answers: List[DNSRecord] = []
+    authority: List[DNSRecord] = []
+    soa_minimum = None
+    try:
+        for _ in range(ancount):
+            record, offset, _ = _read_record(data, offset)
+            answers.append(record)
+        for _ in range(nscount):
+            record, offset, minimum = _read_record(data, offset)
+            authority.append(record)
+            if minimum is not None:
+                # RFC 2308: negative TTL is the lesser of the SOA TTL and its minimum field
+                soa_minimum = min(record.ttl, minimum)
+    except (struct.error, IndexError):
+        if not truncated:
+            raise DNSError("malformed response")
+
+    return DNSResponse(qid, flags & 0x000F, truncated, answers, authority, soa_minimum)
+
+def system_nameservers(path: str = "/etc/resolv.conf") -> List[str]:
+    """Read nameserver addresses from resolv.conf."""
+    servers = []
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0] == "nameserver":
+                    servers.append(parts[1])
+    except OSError:
+        pass
+    return servers
+
+class _UDPQuery(asyncio.DatagramProtocol):
+    """Waits for the datagram that answers one query id."""
+
+    def __init__(self, qid: int, future: asyncio.Future):
+        self.qid = qid
+        self.future = future
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        if len(data) >= 2 and struct.unpack("!H", data[:2])[0] == self.qid and not self.future.done():
+            self.future.set_result(data)
+
+    def error_received(self, exc: Exception) -> None:
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+class Resolver:
+    """
+    Asynchronous stub resolver with a TTL-aware cache.
+
+    Queries go to the configured nameservers over UDP and are retried over
+    TCP when the answer is truncated. Answers are cached for the smallest
+    TTL among their records; NXDOMAIN and empty answers are cached for the
+    SOA negative TTL (RFC 2308). The cache holds at most ``cache_size``
+    entries and evicts the least recently used. One resolver is shared by
+    tools running their own event loops in different threads, so the cache
+    is guarded by a lock.
+    """
+
+    def __init__(self, nameservers: Optional[List[str]] = None, timeout: float = 2.0,
+                 port: int = 53, cache_size: int = 1024):
+        self.nameservers = nameservers if nameservers is not None else system_nameservers()
+        self.timeout = timeout
+        self.port = port
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[float, DNSResult]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def cached(self, name: str, record_type: str = "A") -> Optional[DNSResult]:
+        """Return a fresh cached answer without doing any I/O."""
+        key = (name.rstrip(".").lower(), record_type.upper())
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            expires_at, result = entry
+            remaining = expires_at - time.monotonic()
+            if remaining <= 0:
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+        return DNSResult(result.name, result.record_type, result.rcode, result.records,
+                         int(remaining), result.server, 0.0, cached=True)
+
+    def clear_cache(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    async def resolve(self, name: str, record_type: str = "A") -> DNSResult:
+        """
+        Resolve a name, serving from cache while the answer is fresh.
+
+        Servers are tried in order, each for at most the resolver's timeout
+        cut down to what is left of the turn.
+
+        Raises:
+            DNSError: For an invalid name, or when no server gave an answer
+        """
+        record_type = record_type.upper()
+        if record_type not in RECORD_TYPES:
+            raise DNSError(f"unsupported record type {record_type}")
+
+        cached = self.cached(name, record_type)
+        if cached is not None:
+            return cached
+
+        if not self.nameservers:
+            raise DNSError("no nameservers configured")
+
+        start_time = time.perf_counter()
+        errors = []
+        for server in self.nameservers:
+            if expired():
+                errors.append("turn deadline reached")
+                break
+            try:
+                response = await self._query(server, name, RECORD_TYPES[record_type])
+            except (OSError, asyncio.TimeoutError, DNSError) as e:
+                errors.append(f"{server}: {str(e) or type(e).__name__}")
+                continue
+
+            # SERVFAIL and REFUSED are server problems, try the next one
+            if response.rcode not in (0, 3):
+                errors.append(f"{server}: {response.rcode_name}")
+                continue
+
+            result = DNSResult(
+                name, record_type, response.rcode_name, response.answers,
+                self._ttl(response, record_type), server, time.perf_counter() - start_time
+            )
+            self._store(name, record_type, result)
+            return result
+
+        raise DNSError("; ".join(errors))
+
+    def _ttl(self, response: DNSResponse, record_type: str) -> int:
+        """How long an answer may be cached."""
+        wanted = [r for r in response.answers if r.type_name in (record_type, "CNAME")]
+        if response.rcode == 0 and wanted:
+            return min(min(r.ttl for r in wanted), MAX_CACHE_TTL)
+        if response.soa_minimum is not None:
+            return min(response.soa_minimum, MAX_CACHE_TTL)
+        return DEFAULT_NEGATIVE_TTL
+
+    def _store(self, name: str, record_type: str, result: DNSResult) -> None:
+        if result.ttl <= 0:
+            return
+        key = (name.rstrip(".").lower(), record_type)
+        with self._lock:
+            self._cache[key] = (time.monotonic() + result.ttl, result)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    async def _query(self, server: str, name: str, rtype: int) -> DNSResponse:
+        """Query one server over UDP, retrying over TCP on truncation."""
+        qid = random.randint(0, 0xFFFF)
+        query = build_query(name, rtype, qid)
+        response = await self._query_udp(server, query, qid)
+        if response.truncated:
+            response = await self._query_tcp(server, query, qid)
+        return response
+
+    async def _query_udp(self, server: str, query: bytes, qid: int) -> DNSResponse:
+        timeout = budget(self.timeout)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: _UDPQuery(qid, future),
+            remote_addr=(server, self.port)
+        )
+        try:
+            transport.sendto(query)
+            data = await asyncio.wait_for(future, timeout)
+        finally:
+            transport.close()
+        return parse_response(data)
+
+    async def _query_tcp(self, server: str, query: bytes, qid: int) -> DNSResponse:
+        timeout = budget(self.timeout)
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(server, self.port), timeout)
+        try:
+            writer.write(struct.pack("!H", len(query)) + query)
+            await writer.drain()
+            length = struct.unpack("!H", await asyncio.wait_for(reader.readexactly(2), timeout))[0]
+            data = await asyncio.wait_for(reader.readexactly(length), timeout)
+        except asyncio.IncompleteReadError:
+            raise DNSError("connection closed before the whole response arrived")
+        finally:
+            writer.close()
+        response = parse_response(data)
+        if response.qid != qid:
+            raise DNSError("mismatched response id")
+        return response
+
+_default_resolver: Optional[Resolver] = None
+
+def get_resolver() -> Resolver:
+    """Return the process-wide resolver, so every tool shares one cache."""
+    global _default_resolver
+    if _default_resolver is None:
+        nameservers = [s.strip() for s in Config.DNS_NAMESERVERS.split(",") if s.strip()] or None
+        _default_resolver = Resolver(nameservers, timeout=Config.DNS_TIMEOUT)
+    return _default_resolver
@@ -0,0 +1,234 @@
+"""
+Persistent cache of LLM completions.
+
+A completion is stored under a hash of the model, the tool schema and the
+normalized messages it answered, tool results included. When a
+conversation reaches exactly the same state again, the stored completion
+is replayed instead of waiting for the provider. Replayed tool calls are
+still executed, so an answer is only replayed when the tool results it
+was based on are the same.
+
+Entries live in a SQLite file and are evicted least recently used first
+once their total size exceeds the configured budget.
+"""
+import atexit
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import List, Dict, Any, Optional
+
+from config import Config
+from metrics import LLM_CACHE_LOOKUPS, LLM_CACHE_SAVED_SECONDS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    content TEXT NOT NULL,
+    tool_calls TEXT NOT NULL,
+    latency REAL NOT NULL,
+    tokens INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+"""
+
+def _normalize_text(text: Any) -> str:
+    # Whitespace differences do not change the question or a tool result
+    return " ".join(text.split()) if isinstance(text, str) else ""
+
+def _normalize_arguments(arguments: str) -> str:
+    try:
+        return json.dumps(json.loads(arguments), sort_keys=True, separators=(",", ":"))
+    except (TypeError, ValueError):
+        return _normalize_text(arguments)
+
+def _normalize_tool_result(content: Any) -> str:
+    # A result served from the tool cache carries its age ("cached_s"),
+    # which says nothing about the network
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        return _normalize_text(content)
+    if isinstance(data, dict):
+        data.pop("cached_s", None)
+    return json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+def normalize_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    The parts of a message history that decide the next completion.
+
+    Tool call ids are random per response, so they are replaced by their
+    position; argument JSON is re-encoded with sorted keys, and tool
+    results lose the age the tool cache adds to them.
+    """
+    ids: Dict[str, str] = {}
+
+    def position(call_id: str) -> str:
+        return ids.setdefault(call_id, f"call_{len(ids)}")
+
+    normalized = []
+    for message in messages:
+        role = message.get("role")
+        content = message.get("content")
+        entry = {"role": role, "content": _normalize_tool_result(content) if role == "tool" else _normalize_text(content)}
+        if message.get("tool_calls"):
+            entry["tool_calls"] = [
+                [position(call["id"]), call["function"]["name"], _normalize_arguments(call["function"]["arguments"])]
+                for call in message["tool_calls"]
+            ]
+        if message.get("tool_call_id"):
+            entry["tool_call_id"] = position(message["tool_call_id"])
+        normalized.append(entry)
+    return normalized
+
+class CachedCompletion:
+    """A stored completion, with fresh tool call ids for replay."""
+
+    __slots__ = ("content", "tool_calls", "latency", "tokens")
+
+    def __init__(self, content: str, tool_calls: List[Dict[str, Any]], latency: float, tokens: int):
+        self.content = content
+        self.tool_calls = tool_calls
+        self.latency = latency
+        self.tokens = tokens
+
+class ResponseCache:
+    """
+    SQLite-backed completion cache, bounded by the size of what it stores.
+
+    Safe to share between threads; each call takes well under a
+    millisecond, so AsyncAgent calls it directly from the event loop.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 64 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # WAL commits without an fsync per write; a crash loses at most the last few entries
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self.bytes = self._db.execute("SELECT COALESCE(SUM(bytes), 0) FROM responses").fetchone()[0]
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.saved_seconds = 0.0
+        self.saved_tokens = 0
+
+    @staticmethod
+    def key(model: str, tools: str, messages: List[Dict[str, Any]]) -> str:
+        """Cache key of a request; ``tools`` is the fingerprint of the tool schema (ToolRegistry.fingerprint)."""
+        state = {"model": model, "tools": tools, "messages": normalize_messages(messages)}
+        encoded = json.dumps(state, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[CachedCompletion]:
+        """The completion stored under ``key``, counted as a hit, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT content, tool_calls, latency, tokens FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                LLM_CACHE_LOOKUPS.labels("miss").inc()
+                return None
+            self._db.execute("UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+            self.hits += 1
+            self.saved_seconds += row[2]
+            self.saved_tokens += row[3]
+        LLM_CACHE_LOOKUPS.labels("hit").inc()
+        LLM_CACHE_SAVED_SECONDS.inc(row[2])
+
+        tool_calls = json.loads(row[1])
+        for call in tool_calls:
+            call["id"] = f"call_{uuid.uuid4().hex[:24]}"
+        return CachedCompletion(row[0], tool_calls, row[2], row[3])
+
+    def put(self, key: str, model: str, content: str, tool_calls: List[Dict[str, Any]],
+            latency: float, tokens: int = 0) -> None:
+        """Store a completion that took ``latency`` seconds and ``tokens`` tokens to produce."""
+        encoded_calls = json.dumps(tool_calls, ensure_ascii=False)
+        size = len(content.encode("utf-8")) + len(encoded_calls.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            old = self._db.execute("SELECT bytes FROM responses WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, content, tool_calls, latency, tokens, bytes, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, model, content, encoded_calls, latency, tokens, size, now, now)
+            )
+            self.bytes += size - (old[0] if old else 0)
+            self.stores += 1
+            if self.bytes > self.max_bytes:
+                self._evict(self.bytes - self.max_bytes)
+
+    def _evict(self, excess: int) -> None:
+        freed = 0
+        victims = []
+        cursor = self._db.execute("SELECT key, bytes FROM responses ORDER BY last_used")
+        for key, size in cursor:
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        cursor.close()
+        self._db.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self.bytes -= freed
+        self.evictions += len(victims)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "saved_seconds": self.saved_seconds,
+                "saved_tokens": self.saved_tokens
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self.bytes = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+_cache: Optional[ResponseCache] = None
+_cache_failed = False
+_cache_lock = threading.Lock()
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Return the process-wide response cache, or None when LLM_CACHE_FILE is not set."""
+    global _cache, _cache_failed
+    if _cache is None and Config.LLM_CACHE_FILE and not _cache_failed:
+        with _cache_lock:
+            if _cache is None and not _cache_failed:
+                try:
+                    cache = ResponseCache(Config.LLM_CACHE_FILE, Config.LLM_CACHE_MAX_BYTES)
+                except sqlite3.Error as e:
+                    print(f"⚠️  LLM response cache disabled: {e}")
+                    _cache_failed = True
+                    return None
+                atexit.register(cache.close)
+                _cache = cache
+    return _cache
@@ -0,0 +1,502 @@
+import json
+import math
+import time
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Optional, Sequence, Tuple, Union
+
+# Hosts listed individually in a result before the rest are counted
+MAX_LISTED = 20
+
+def _ms(value: Optional[float]) -> Optional[float]:
+    """Round a millisecond value for the LLM form; two decimals is plenty."""
+    return None if value is None else round(value, 2)
+
+def _limited(items: Sequence[Any]) -> List[Any]:
+    """At most MAX_LISTED items."""
+    return list(items[:MAX_LISTED])
+
+def _more(items: Sequence[Any]) -> str:
+    return f" ... and {len(items) - MAX_LISTED} more" if len(items) > MAX_LISTED else ""
+
+class ToolResult(ABC):
+    """
+    Base class of structured tool results.
+
+    Subclasses keep their data in ``__slots__`` and implement to_dict()
+    for the model and render() for people; serialize() picks between
+    the two. ``cached_age`` is set on results served from the tool cache,
+    ``partial`` (why the probe stopped early) on results cut short by the
+    turn's deadline.
+    """
+
+    __slots__ = ("cached_age", "partial")
+
+    def __init__(self):
+        self.cached_age: Optional[float] = None
+        self.partial: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        """Whether the tool ran successfully (the probe itself may still have failed)."""
+        return True
+
+    @abstractmethod
+    def to_dict(self) -> Dict[str, Any]:
+        """Compact fields for the LLM, in a stable order."""
+        pass
+
+    @abstractmethod
+    def render(self) -> str:
+        """Readable multi-line text for the console and logs."""
+        pass
+
+    def __str__(self) -> str:
+        return serialize(self, human=True)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({serialize(self)})"
+
+class ErrorResult(ToolResult):
+    """A tool call that could not be carried out."""
+
+    __slots__ = ("message",)
+
+    def __init__(self, message: str):
+        super().__init__()
+        self.message = message
+
+    @property
+    def ok(self) -> bool:
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"error": self.message}
+
+    def render(self) -> str:
+        return self.message
+
+class PingResult(ToolResult):
+    """Loss and round-trip statistics for one pinged host."""
+
+    __slots__ = ("host", "address", "sent", "received", "rtt_min", "rtt_avg", "rtt_max", "rtt_mdev", "replies")
+
+    def __init__(self, host: str, address: Optional[str], sent: int, received: int,
+                 rtt: Optional[Tuple[float, float, float, Optional[float]]] = None,
+                 replies: Optional[List[Optional[float]]] = None):
+        super().__init__()
+        self.host = host
+        self.address = address
+        self.sent = sent
+        self.received = received
+        self.rtt_min, self.rtt_avg, self.rtt_max, self.rtt_mdev = rtt or (None, None, None, None)
+        # One entry per probe in milliseconds, None when lost; may be empty if only totals are known
+        self.replies = replies or []
+
+    @classmethod
+    def from_replies(cls, host: str, address: Optional[str], replies: List[Optional[float]],
+                     sent: Optional[int] = None) -> "PingResult":
+        """Build a result from per-probe reply times, computing min/avg/max/mdev."""
+        received = [rtt for rtt in replies if rtt is not None]
+        rtt = None
+        if received:
+            avg = sum(received) / len(received)
+            mdev = math.sqrt(max(0.0, sum(r * r for r in received) / len(received) - avg * avg))
+            rtt = (min(received), avg, max(received), mdev)
+        return cls(host, address, len(replies) if sent is None else sent, len(received), rtt, replies)
+
+    @property
+    def loss(self) -> float:
+        """Packet loss in percent."""
+        return 100.0 * (self.sent - self.received) / self.sent if self.sent else 100.0
+
+    @property
+    def reachable(self) -> bool:
+        return self.received > 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {"host": self.host}
+        if self.address and self.address != self.host:
+            data["addr"] = self.address
+        data.update(sent=self.sent, recv=self.received, loss_pct=round(self.loss, 1))
+        if self.rtt_avg is not None:
+            data["rtt_ms"] = {
+                key: _ms(value) for key, value in
+                (("min", self.rtt_min), ("avg", self.rtt_avg), ("max", self.rtt_max), ("mdev", self.rtt_mdev))
+                if value is not None
+            }
+        if self.replies and len(self.replies) > 1:
+            data["replies_ms"] = [_ms(rtt) for rtt in self.replies]
+        return data
+
+    def render(self) -> str:
+        packets = f"{self.sent} packets transmitted, {self.received} received, {self.loss:.0f}% packet loss"
+        if not self.reachable:
+            return f"Ping failed for {self.host}: {packets}"
+
+        stats = [self.rtt_min, self.rtt_avg, self.rtt_max] + ([self.rtt_mdev] if self.rtt_mdev is not None else [])
+        names = "min/avg/max" + ("/mdev" if self.rtt_mdev is not None else "")
+        text = f"✅ {self.host} is reachable - {packets}, rtt {names} = {'/'.join(f'{v:.3f}' for v in stats)} ms"
+        if self.replies:
+            text += ", replies: " + ", ".join(f"{rtt:.3f}" if rtt is not None else "lost" for rtt in self.replies) + " ms"
+        return text
+
+class TraceHop:
+    """One TTL of a traceroute."""
+
+    __slots__ = ("ttl", "addresses", "rtt_min", "rtt_avg", "loss", "unreachable")
+
+    def __init__(self, ttl: int, addresses: List[str], rtts: List[float], sent: int, unreachable: bool = False):
+        self.ttl = ttl
+        self.addresses = addresses
+        self.rtt_min = min(rtts) if rtts else None
+        self.rtt_avg = sum(rtts) / len(rtts) if rtts else None
+        self.loss = 100.0 * (sent - len(rtts)) / sent if sent else 100.0
+        self.unreachable = unreachable
+
+    @property
+    def silent(self) -> bool:
+        return self.rtt_avg is None
+
+    def to_row(self) -> List[Any]:
+        """One row of the LLM hop table, in TracerouteResult.COLUMNS order."""
+        if self.silent:
+            return [self.ttl, None]
+        row = [self.ttl, ",".join(self.addresses) or None, _ms(self.rtt_min), _ms(self.rtt_avg), round(self.loss)]
+        if self.unreachable:
+            row.append("unreachable")
+        return row
+
+    def render(self) -> str:
+        if self.silent:
+            return f"{self.ttl} * - 100%"
+        flag = " unreachable" if self.unreachable else ""
+        return f"{self.ttl} {','.join(self.addresses) or '?'} {self.rtt_min:.1f}/{self.rtt_avg:.1f} {self.loss:.0f}%{flag}"
+
+class TracerouteResult(ToolResult):
+    """Hop table of a traceroute; silent hops after the last answer are collapsed."""
+
+    # Hops go to the model as rows rather than objects, so keys are not repeated per hop
+    COLUMNS = "hop,addr,rtt_min_ms,rtt_avg_ms,loss_pct"
+
+    __slots__ = ("host", "address", "reached", "elapsed", "hops")
+
+    def __init__(self, host: str, address: Optional[str], reached: bool, hops: List[TraceHop],
+                 elapsed: Optional[float] = None):
+        super().__init__()
+        self.host = host
+        self.address = address
+        self.reached = reached
+        self.elapsed = elapsed
+        self.hops = hops
+
+    def _split(self) -> Tuple[List[TraceHop], List[TraceHop]]:
+        """Hops up to the last one that answered, and the silent tail after it."""
+        end = len(self.hops)
+        if not self.reached:
+            while end and self.hops[end - 1].silent:
+                end -= 1
+        return self.hops[:end], self.hops[end:]
+
+    def to_dict(self) -> Dict[str, Any]:
+        shown, silent = self._split()
+        data: Dict[str, Any] = {"host": self.host}
+        if self.address and self.address != self.host:
+            data["addr"] = self.address
+        data["reached"] = self.reached
+        data["columns"] = self.COLUMNS
+        data["hops"] = [hop.to_row() for hop in shown]
+        if silent:
+            data["no_reply_hops"] = f"{silent[0].ttl}-{silent[-1].ttl}"
+        return data
+
+    def render(self) -> str:
+        shown, silent = self._split()
+        status = "reached" if self.reached else "not reached"
+        address = f" ({self.address})" if self.address and self.address != self.host else ""
+        took = f", {self.elapsed:.1f}s" if self.elapsed is not None else ""
+        lines = [f"Traceroute to {self.host}{address}: {status} in {len(self.hops)} hops{took}",
+                 "hop address rtt_min/avg_ms loss"]
+        lines.extend(hop.render() for hop in shown)
+        if silent:
+            lines.append(f"{silent[0].ttl}-{silent[-1].ttl} * - 100%")
+        return "\n".join(lines)
+
+class DNSLookupResult(ToolResult):
+    """Answer to one DNS query."""
+
+    __slots__ = ("name", "record_type", "status", "values", "aliases", "ttl", "source", "elapsed")
+
+    def __init__(self, name: str, record_type: str, status: str, values: List[str],
+                 aliases: Optional[List[str]] = None, ttl: Optional[int] = None, source: Optional[str] = None,
+                 elapsed: Optional[float] = None):
+        super().__init__()
+        self.name = name
+        self.record_type = record_type
+        # NOERROR, NXDOMAIN, SERVFAIL, ...
+        self.status = status
+        self.values = values
+        # CNAME chain followed to reach the values
+        self.aliases = aliases or []
+        self.ttl = ttl
+        # Where the answer came from, e.g. "cached" or "3.1ms via 1.1.1.1"
+        self.source = source
+        # Milliseconds a nameserver took to answer; None for cached or command output answers
+        self.elapsed = elapsed
+
+    def to_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {"name": self.name, "type": self.record_type, "status": self.status}
+        if self.values:
+            data["values"] = self.values
+        if self.aliases:
+            data["cname"] = self.aliases
+        if self.ttl is not None:
+            data["ttl"] = self.ttl
+        return data
+
+    def render(self) -> str:
+        source = f", {self.source}" if self.source else ""
+        if self.status == "NXDOMAIN":
+            return f"DNS lookup failed for {self.name}: NXDOMAIN (domain does not exist{source})"
+        if not self.values:
+            return f"No {self.record_type} records for {self.name} ({self.status}{source})"
+        alias = f" via CNAME {' → '.join(self.aliases)}" if self.aliases else ""
+        ttl = f"TTL {self.ttl}s" if self.ttl is not None else "TTL unknown"
+        return f"✅ {self.name} {self.record_type}{alias}: {', '.join(self.values)} ({ttl}{source})"
+
+class NetworkInfoResult(ToolResult):
+    """Local host name and addresses."""
+
+    __slots__ = ("hostname", "local_ip", "public_ip", "addresses")
+
+    def __init__(self, hostname: str, local_ip: Optional[str], public_ip: Optional[str], addresses: List[str]):
+        super().__init__()
+        self.hostname = hostname
+        self.local_ip = local_ip
+        self.public_ip = public_ip
+        # Addresses found on the local interfaces
+        self.addresses = addresses
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "hostname": self.hostname,
+            "local_ip": self.local_ip,
+            "public_ip": self.public_ip,
+            "addresses": self.addresses
+        }
+
+    def render(self) -> str:
+        lines = [
+            f"Local hostname: {self.hostname}",
+            f"Local IP: {self.local_ip or 'Could not determine'}",
+            f"Public IP: {self.public_ip or 'Could not determine'}"
+        ]
+        if self.addresses:
+            lines.append("\nNetwork interfaces:")
+            lines.extend(f"  {address}" for address in self.addresses)
+        return "\n".join(lines)
+
+class SweepResult(ToolResult):
+    """Summary of a ping sweep: counts, latency percentiles and the hosts worth a look."""
+
+    __slots__ = ("scope", "targets", "elapsed", "up", "rtt_percentiles", "slow", "lossy", "down", "unresolved")
+
+    def __init__(self, scope: str, targets: int, elapsed: float, up: int,
+                 rtt_percentiles: Optional[Dict[str, float]], slow: List[Tuple[str, float]],
+                 lossy: List[Tuple[str, float]], down: List[str], unresolved: List[str]):
+        super().__init__()
+        self.scope = scope
+        self.targets = targets
+        self.elapsed = elapsed
+        self.up = up
+        # p50/p90/p99/max of the per-host average RTT in milliseconds
+        self.rtt_percentiles = rtt_percentiles
+        # (host, avg rtt ms) and (host, loss %), worst first
+        self.slow = slow
+        self.lossy = lossy
+        self.down = down
+        self.unresolved = unresolved
+
+    def to_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {
+            "scope": self.scope,
+            "targets": self.targets,
+            "up": self.up,
+            "down": len(self.down)
+        }
+        if self.unresolved:
+            data["unresolved"] = len(self.unresolved)
+        if self.rtt_percentiles:
+            data["avg_rtt_ms"] = {key: _ms(value) for key, value in self.rtt_percentiles.items()}
+        for key, items in (("slow_ms", self.slow), ("lossy_pct", self.lossy)):
+            if items:
+                data[key] = {host: round(value, 1) for host, value in _limited(items)}
+        for key, hosts in (("down_hosts", self.down), ("unresolved_hosts", self.unresolved)):
+            if hosts:
+                data[key] = _limited(hosts)
+        listed = [items for items in (self.slow, self.lossy, self.down, self.unresolved) if len(items) > MAX_LISTED]
+        if listed:
+            data["truncated"] = True
+        return data
+
+    def render(self) -> str:
+        lines = [
+            f"Ping sweep of {self.targets} targets ({self.scope}) in {self.elapsed:.1f}s: "
+            f"{self.up} up, {len(self.down)} down" + (f", {len(self.unresolved)} unresolved" if self.unresolved else "")
+        ]
+        if self.rtt_percentiles:
+            lines.append("Avg RTT ms: " + ", ".join(f"{key} {value:.2f}" for key, value in self.rtt_percentiles.items()))
+        if self.slow:
+            lines.append("Slow: " + ", ".join(f"{host} {rtt:.1f}ms" for host, rtt in _limited(self.slow)) + _more(self.slow))
+        if self.lossy:
+            lines.append("Lossy: " + ", ".join(f"{host} {loss:.0f}%" for host, loss in _limited(self.lossy)) + _more(self.lossy))
+        if self.down:
+            lines.append("Down: " + ", ".join(_limited(self.down)) + _more(self.down))
+        if self.unresolved:
+            lines.append("Unresolved: " + ", ".join(_limited(self.unresolved)) + _more(self.unresolved))
+        return "\n".join(lines)
+
+class TcpConnectResult(ToolResult):
+    """Summary of a TCP connect scan: endpoint counts per state, connect time percentiles and the endpoints worth a look."""
+
+    __slots__ = ("endpoints", "elapsed", "connect_percentiles", "open", "refused", "filtered", "unreachable",
+                 "failed", "unresolved")
+
+    def __init__(self, endpoints: int, elapsed: float, connect_percentiles: Optional[Dict[str, float]],
+                 open_endpoints: List[Tuple[str, float, float, float]], refused: List[str], filtered: List[str],
+                 unreachable: List[str], failed: List[Tuple[str, str]], unresolved: List[str]):
+        super().__init__()
+        self.endpoints = endpoints
+        self.elapsed = elapsed
+        # p50/p90/p99/max of the per-endpoint median connect time in milliseconds
+        self.connect_percentiles = connect_percentiles
+        # (endpoint, median ms, max ms, loss %), slowest first
+        self.open = open_endpoints
+        self.refused = refused
+        self.filtered = filtered
+        self.unreachable = unreachable
+        # (endpoint, error message)
+        self.failed = failed
+        self.unresolved = unresolved
+
+    def to_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {"endpoints": self.endpoints, "open": len(self.open)}
+        for key, items in (("refused", self.refused), ("filtered", self.filtered), ("unreachable", self.unreachable),
+                           ("failed", self.failed), ("unresolved", self.unresolved)):
+            if items:
+                data[key] = len(items)
+        if self.connect_percentiles:
+            data["connect_ms"] = {key: _ms(value) for key, value in self.connect_percentiles.items()}
+        if self.open:
+            slowest = data["slowest_open_ms"] = {}
+            for endpoint, median, maximum, loss in _limited(self.open):
+                slowest[endpoint] = {"median": _ms(median), "max": _ms(maximum)}
+                if loss:
+                    slowest[endpoint]["loss_pct"] = round(loss, 1)
+        for key, items in (("refused_endpoints", self.refused), ("filtered_endpoints", self.filtered),
+                           ("unreachable_endpoints", self.unreachable), ("unresolved_endpoints", self.unresolved)):
+            if items:
+                data[key] = _limited(items)
+        if self.failed:
+            data["errors"] = dict(_limited(self.failed))
+        listed = (self.open, self.refused, self.filtered, self.unreachable, self.failed, self.unresolved)
+        if any(len(items) > MAX_LISTED for items in listed):
+            data["truncated"] = True
+        return data
+
+    def render(self) -> str:
+        counts = [f"{len(self.open)} open"] + [f"{len(items)} {name}" for name, items in (
+            ("refused", self.refused), ("filtered", self.filtered), ("unreachable", self.unreachable),
+            ("failed", self.failed), ("unresolved", self.unresolved)) if items]
+        lines = [f"TCP connect to {self.endpoints} endpoints in {self.elapsed:.1f}s: " + ", ".join(counts)]
+        if self.connect_percentiles:
+            lines.append("Connect ms: " + ", ".join(f"{key} {value:.2f}" for key, value in self.connect_percentiles.items()))
+        if self.open:
+            lines.append("Slowest open: " + ", ".join(
+                f"{endpoint} {median:.1f}ms" + (f" ({loss:.0f}% failed)" if loss else "")
+                for endpoint, median, _, loss in _limited(self.open)) + _more(self.open))
+        for name, items in (("Refused", self.refused), ("Filtered", self.filtered),
+                            ("Unreachable", self.unreachable), ("Unresolved", self.unresolved)):
+            if items:
+                lines.append(f"{name}: " + ", ".join(_limited(items)) + _more(items))
+        if self.failed:
+            lines.append("Failed: " + ", ".join(f"{endpoint} ({error})" for endpoint, error in _limited(self.failed))
+                         + _more(self.failed))
+        return "\n".join(lines)
+
+class ProbeHistoryResult(ToolResult):
+    """Recorded latency and loss statistics of one target over a time window."""
+
+    __slots__ = ("target", "window", "series")
+
+    def __init__(self, target: str, window: float, series: Dict[str, Dict[str, Any]]):
+        super().__init__()
+        self.target = target
+        # Seconds of history covered
+        self.window = window
+        # Probe name (ping, dns, tcp:443) to the statistics from history.summarize()
+        self.series = series
+
+    def to_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {"target": self.target, "window_min": round(self.window / 60)}
+        probes = {}
+        for probe, stats in self.series.items():
+            entry: Dict[str, Any] = {"n": stats["samples"]}
+            if stats["samples"]:
+                entry["age_s"] = round(time.time() - stats["last"])
+                entry["loss_pct"] = round(stats["loss_pct"], 1)
+            if "rtt_ms" in stats:
+                entry["rtt_ms"] = {key: _ms(value) for key, value in stats["rtt_ms"].items()}
+                entry["last_ms"] = _ms(stats["last_rtt_ms"])
+            if "jitter_ms" in stats:
+                entry["jitter_ms"] = _ms(stats["jitter_ms"])
+            if "trend_ms_per_hour" in stats:
+                entry["trend_ms_per_h"] = _ms(stats["trend_ms_per_hour"])
+            probes[probe] = entry
+        data["probes"] = probes
+        return data
+
+    def render(self) -> str:
+        minutes = f"{self.window / 60:g}"
+        if not any(stats["samples"] for stats in self.series.values()):
+            return f"No probe history for {self.target} in the last {minutes} minutes"
+        lines = [f"Probe history for {self.target}, last {minutes} minutes:"]
+        for probe, stats in self.series.items():
+            if not stats["samples"]:
+                lines.append(f"  {probe}: no samples")
+                continue
+            line = f"  {probe}: {stats['samples']} samples, {stats['loss_pct']:.1f}% loss"
+            if "rtt_ms" in stats:
+                rtt = stats["rtt_ms"]
+                line += f", RTT p50 {rtt['p50']:.2f} / p90 {rtt['p90']:.2f} / max {rtt['max']:.2f} ms"
+            if "jitter_ms" in stats:
+                line += f", jitter {stats['jitter_ms']:.2f} ms"
+            if "trend_ms_per_hour" in stats:
+                line += f", trend {stats['trend_ms_per_hour']:+.2f} ms/h"
+            lines.append(line)
+        return "\n".join(lines)
+
+def serialize(result: Union[ToolResult, str], human: bool = False) -> str:
+    """
+    Render a tool result for the model or for a person.
+
+    The LLM form is minified JSON with short, stable keys and no prose;
+    the human form is the readable text shown in logs and on the console.
+    Plain strings (from tools that do not return a ToolResult) pass through.
+    """
+    if not isinstance(result, ToolResult):
+        return str(result)
+
+    if human:
+        text = result.render()
+        if result.partial:
+            text += f"\n(⏱️ partial: {result.partial})"
+        if result.cached_age is not None:
+            text += f"\n(cached {result.cached_age:.0f}s ago)"
+        return text
+
+    data = result.to_dict()
+    if result.partial:
+        data["partial"] = result.partial
+    if result.cached_age is not None:
+        data["cached_s"] = round(result.cached_age)
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
@@ -0,0 +1,451 @@
+"""
+HTTP/JSON API for the agent.
+
+Serves AsyncAgent sessions over plain HTTP/1.1 on asyncio, with optional
+server-sent events for streaming. No web framework is needed.
+
+Endpoints:
+    POST   /sessions                    create a session, returns {"session": id}
+    POST   /sessions/<id>/messages      {"message": "..."} -> {"response": "..."}
+                                        (SSE stream with ?stream=1 or Accept: text/event-stream;
+                                        "cache": false skips the LLM response cache)
+    GET    /sessions/<id>/context       the session's messages
+    POST   /sessions/<id>/reset         clear the session's context
+    DELETE /sessions/<id>               forget the session
+    GET    /health                      load and session counts
+    GET    /metrics                     Prometheus metrics
+
+Usage:
+    python server.py --port 8080
+"""
+import argparse
+import asyncio
+import json
+import re
+import time
+import uuid
+from collections import deque
+from typing import Dict, Any, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from async_agent import AsyncAgent
+from config import Config
+from metrics import REGISTRY, CONTENT_TYPE, SERVER_REQUESTS, SERVER_REJECTED, SERVER_QUEUE_SECONDS
+
+MAX_BODY_BYTES = 1 << 20
+MAX_HEADER_LINES = 100
+# Seconds a client may take to send its request
+REQUEST_TIMEOUT = 30
+# Clients may pick their own session ids
+SESSION_ID = re.compile(r"[A-Za-z0-9_.-]{1,128}")
+
+REASONS = {
+    200: "OK", 201: "Created", 204: "No Content", 400: "Bad Request", 401: "Unauthorized",
+    404: "Not Found", 405: "Method Not Allowed", 408: "Request Timeout", 413: "Payload Too Large",
+    429: "Too Many Requests", 500: "Internal Server Error", 503: "Service Unavailable"
+}
+
+class Overloaded(Exception):
+    """A request was turned away by admission control."""
+
+    def __init__(self, status: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+class AdmissionLimiter:
+    """
+    Bound the turns that run at once and the turns that wait for a slot.
+
+    Each turn makes one or more LLM requests, so limiting turns keeps a
+    burst of users from turning into a burst of provider requests. Turns
+    beyond ``max_active`` wait in FIFO order; when ``max_queued`` are
+    already waiting, or a turn waits longer than ``queue_timeout``, it is
+    rejected instead.
+    """
+
+    def __init__(self, max_active: int, max_queued: int, queue_timeout: float):
+        self.max_active = max(1, max_active)
+        self.max_queued = max(0, max_queued)
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        # A freed slot is handed straight to the oldest waiter, so newcomers cannot overtake it
+        self._waiters: "deque[asyncio.Future]" = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _retry_after(self) -> int:
+        return max(1, round(self.queue_timeout / 4))
+
+    async def __aenter__(self) -> "AdmissionLimiter":
+        if self.active < self.max_active and not self._waiters:
+            self.active += 1
+            SERVER_QUEUE_SECONDS.observe(0.0)
+            return self
+        if len(self._waiters) >= self.max_queued:
+            SERVER_REJECTED.labels("queue_full").inc()
+            raise Overloaded(503, "server busy, try again later", self._retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            SERVER_REJECTED.labels("queue_timeout").inc()
+            raise Overloaded(503, f"no capacity within {self.queue_timeout:g}s, try again later",
+                             self._retry_after()) from None
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Cancelled just after being handed a slot: pass it on
+                await self.__aexit__(None, None, None)
+            raise
+        finally:
+            if not waiter.done() or waiter.cancelled():
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+        SERVER_QUEUE_SECONDS.observe(time.perf_counter() - start)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot passes on without being released
+                waiter.set_result(None)
+                return False
+        self.active -= 1
+        return False
+
+class HTTPError(Exception):
+    """A request that is answered with an error status."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+class Request:
+    """One parsed HTTP request."""
+
+    __slots__ = ("method", "path", "query", "headers", "body")
+
+    def __init__(self, method: str, target: str, headers: Dict[str, str], body: bytes):
+        parts = urlsplit(target)
+        self.method = method
+        self.path = parts.path.rstrip("/") or "/"
+        self.query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        self.headers = headers
+        self.body = body
+
+    @property
+    def keep_alive(self) -> bool:
+        return self.headers.get("connection", "").lower() != "close"
+
+    @property
+    def wants_stream(self) -> bool:
+        return self.query.get("stream") in ("1", "true") or "text/event-stream" in self.headers.get("accept", "")
+
+    def json(self) -> Dict[str, Any]:
+        try:
+            data = json.loads(self.body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "body is not valid JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "body must be a JSON object")
+        return data
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+    """Read one request, or return None when the client closed the connection."""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "malformed request line")
+
+    headers: Dict[str, str] = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise HTTPError(400, "too many headers")
+
+    length = int(headers.get("content-length", "0") or 0)
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, f"body larger than {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return Request(method.upper(), target, headers, body)
+
+def encode_response(status: int, body: Any = None, headers: Optional[Dict[str, str]] = None,
+                    keep_alive: bool = True) -> bytes:
+    if body is None:
+        payload, content_type = b"", None
+    elif isinstance(body, str):
+        payload, content_type = body.encode("utf-8"), CONTENT_TYPE
+    else:
+        payload, content_type = json.dumps(body, ensure_ascii=False).encode("utf-8"), "application/json"
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Length: {len(payload)}"]
+    if content_type:
+        lines.append(f"Content-Type: {content_type}")
+    if not keep_alive:
+        lines.append("Connection: close")
+    for name, value in (headers or {}).items():
+        lines.append(f"{name}: {value}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + payload
+
+def sse_event(event: str, data: Dict[str, Any]) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+class AgentServer:
+    """
+    Route HTTP requests to an AsyncAgent.
+
+    Sessions live in the agent's bounded store; idle ones are dropped by a
+    background sweep. Messages to one session are answered in the order
+    they arrive, and at most ``session_queue`` may be pending per session.
+    Turns across sessions pass through an AdmissionLimiter.
+    """
+
+    def __init__(self, agent: AsyncAgent, limiter: AdmissionLimiter, session_idle: float,
+                 session_queue: int, token: str = ""):
+        self.agent = agent
+        self.limiter = limiter
+        agent.admission = limiter
+        self.session_idle = session_idle
+        self.session_queue = max(1, session_queue)
+        self.token = token
+        self.started_at = time.time()
+        self.evicted = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._sweeper: Optional[asyncio.Task] = None
+
+    async def start(self, host: str, port: int) -> Tuple[str, int]:
+        """Listen on ``host:port`` (port 0 picks one) and return the bound address."""
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        if self.session_idle > 0:
+            self._sweeper = asyncio.create_task(self._sweep())
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self) -> None:
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._sweeper:
+            self._sweeper.cancel()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _sweep(self) -> None:
+        while True:
+            await asyncio.sleep(min(60.0, self.session_idle / 2))
+            self.evicted += self.agent.evict_idle(self.session_idle)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), REQUEST_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                except HTTPError as e:
+                    writer.write(encode_response(e.status, {"error": e.message}, keep_alive=False))
+                    break
+                except (asyncio.IncompleteReadError, ValueError):
+                    writer.write(encode_response(400, {"error": "malformed request"}, keep_alive=False))
+                    break
+                if request is None:
+                    break
+                keep_alive = await self._dispatch(request, writer)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _route(self, request: Request) -> Tuple[str, Optional[str]]:
+        """Route name and session id for a request path."""
+        parts = [part for part in request.path.split("/") if part]
+        if parts == ["health"] or parts == ["metrics"]:
+            return parts[0], None
+        if parts == ["sessions"]:
+            return "create", None
+        if len(parts) > 1 and parts[0] == "sessions" and not SESSION_ID.fullmatch(parts[1]):
+            return "unknown", None
+        if len(parts) == 2 and parts[0] == "sessions":
+            return "session", parts[1]
+        if len(parts) == 3 and parts[0] == "sessions" and parts[2] in ("messages", "context", "reset"):
+            return parts[2], parts[1]
+        return "unknown", None
+
+    async def _dispatch(self, request: Request, writer: asyncio.StreamWriter) -> bool:
+        """Answer one request; return whether the connection may be reused."""
+        route, session_id = self._route(request)
+        status = 500
+        try:
+            if self.token and route not in ("health", "metrics") and \
+                    request.headers.get("authorization") != f"Bearer {self.token}":
+                raise HTTPError(401, "missing or wrong bearer token")
+            if route == "messages" and request.method == "POST" and request.wants_stream:
+                status = 200
+                await self._stream_message(request, session_id, writer)
+                return False
+            status, body, headers = await self._handle(route, session_id, request)
+        except HTTPError as e:
+            status, body, headers = e.status, {"error": e.message}, None
+        except Overloaded as e:
+            status, body, headers = e.status, {"error": e.reason}, {"Retry-After": str(e.retry_after)}
+        except Exception as e:
+            status, body, headers = 500, {"error": f"{type(e).__name__}: {e}"}, None
+        finally:
+            SERVER_REQUESTS.labels(route, str(status)).inc()
+
+        writer.write(encode_response(status, body, headers, request.keep_alive))
+        return request.keep_alive
+
+    async def _handle(self, route: str, session_id: Optional[str], request: Request) -> Tuple[int, Any, Optional[Dict[str, str]]]:
+        method = request.method
+        if route == "health" and method == "GET":
+            return 200, {
+                "status": "ok",
+                "uptime_s": round(time.time() - self.started_at),
+                "sessions": len(self.agent.sessions),
+                "evicted_sessions": self.evicted,
+                "active_turns": self.limiter.active,
+                "queued_turns": self.limiter.queued,
+                "response_cache": self.agent.response_cache.stats() if self.agent.response_cache else None
+            }, None
+        if route == "metrics" and method == "GET":
+            return 200, REGISTRY.render(), None
+        if route == "create" and method == "POST":
+            session_id = uuid.uuid4().hex
+            self.agent.get_session(session_id)
+            return 201, {"session": session_id}, None
+
+        if route == "messages" and method == "POST":
+            message, use_cache = self._message(request, session_id)
+            response = await self.agent.process(message, session_id, use_cache=use_cache)
+            return 200, {"session": session_id, "response": response}, None
+        if route == "context" and method == "GET":
+            return 200, {"session": session_id, "messages": self._existing(session_id).context.copy()}, None
+        if route == "reset" and method == "POST":
+            session = self._existing(session_id)
+            # Wait for a running turn, so the reset is not undone by its last messages
+            async with session.lock:
+                session.reset()
+            return 200, {"session": session_id, "reset": True}, None
+        if route == "session" and method == "DELETE":
+            self._existing(session_id)
+            self.agent.close_session(session_id)
+            return 204, None, None
+
+        if route == "unknown":
+            raise HTTPError(404, f"no route for {request.path}")
+        raise HTTPError(405, f"{method} not allowed on {request.path}")
+
+    def _existing(self, session_id: str):
+        session = self.agent.sessions.get(session_id)
+        if session is None:
+            raise HTTPError(404, f"no session {session_id}")
+        return session
+
+    def _message(self, request: Request, session_id: str) -> Tuple[str, bool]:
+        """Validate a message request and check the session's queue; returns (message, use_cache)."""
+        body = request.json()
+        message = body.get("message")
+        if not isinstance(message, str) or not message.strip():
+            raise HTTPError(400, "message must be a non-empty string")
+        use_cache = body.get("cache", True)
+        if not isinstance(use_cache, bool):
+            raise HTTPError(400, "cache must be true or false")
+        session = self.agent.sessions.get(session_id)
+        if session is not None and session.pending >= self.session_queue:
+            SERVER_REJECTED.labels("session_queue").inc()
+            raise Overloaded(429, f"{session.pending} messages already pending for this session", 1)
+        return message, use_cache
+
+    async def _stream_message(self, request: Request, session_id: str, writer: asyncio.StreamWriter) -> None:
+        """
+        Answer a message as server-sent events: token, tool_start,
+        tool_progress, tool_end, then done (or error).
+
+        The turn keeps running if the client disconnects, so the session's
+        context stays complete.
+        """
+        message, use_cache = self._message(request, session_id)
+        events: asyncio.Queue = asyncio.Queue()
+        turn = asyncio.create_task(self.agent.process(
+            message, session_id, on_event=lambda event, data: events.put_nowait((event, data)), use_cache=use_cache
+        ))
+        turn.add_done_callback(lambda _: events.put_nowait(None))
+
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n")
+        connected = True
+        while True:
+            item = await events.get()
+            if item is None:
+                break
+            if connected:
+                try:
+                    writer.write(sse_event(*item))
+                    await writer.drain()
+                except ConnectionError:
+                    connected = False
+
+        try:
+            final = ("done", {"session": session_id, "response": turn.result()})
+        except Overloaded as e:
+            final = ("error", {"error": e.reason, "status": e.status, "retry_after": e.retry_after})
+        except Exception as e:
+            final = ("error", {"error": f"{type(e).__name__}: {e}", "status": 500})
+        if connected:
+            writer.write(sse_event(*final))
+
+def build_server(model: Optional[str] = None) -> AgentServer:
+    """An AgentServer with its agent and limits taken from Config."""
+    agent = AsyncAgent(model=model, max_sessions=Config.SERVER_MAX_SESSIONS)
+    limiter = AdmissionLimiter(Config.SERVER_MAX_CONCURRENT, Config.SERVER_MAX_QUEUED, Config.SERVER_QUEUE_TIMEOUT)
+    return AgentServer(agent, limiter, Config.SERVER_SESSION_IDLE, Config.SERVER_SESSION_QUEUE, Config.SERVER_TOKEN)
+
+async def serve(host: str, port: int, model: Optional[str] = None) -> None:
+    server = build_server(model)
+    host, port = await server.start(host, port)
+    print(f"🌐 Ping Agent API listening on http://{host}:{port}")
+    print(f"  {Config.SERVER_MAX_CONCURRENT} concurrent turns, {Config.SERVER_MAX_QUEUED} queued, "
+          f"{Config.SERVER_MAX_SESSIONS or 'unlimited'} sessions, idle after {Config.SERVER_SESSION_IDLE:g}s")
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+        await server.agent.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the ping agent over HTTP")
+    parser.add_argument("--host", default=Config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=Config.SERVER_PORT)
+    parser.add_argument("--model", help="Model to use (default: OPENAI_MODEL)")
+    args = parser.parse_args()
+
+    if not Config.validate():
+        return
+    try:
+        asyncio.run(serve(args.host, args.port, args.model))
+    except KeyboardInterrupt:
+        print("\nGoodbye! 👋")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import threading
+
+import pytest
+
+from agent import Agent
+from config import Config
+from deadline import expired
+from results import ErrorResult
+
+class FakeCache:
+    """Runs fake tools in place of the tool cache: "hang" ignores its deadline, "wait" honours it."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.stopped = threading.Event()
+
+    def run(self, tool, args):
+        if args.get("mode") == "hang":
+            self.release.wait(10)
+        elif args.get("mode") == "wait":
+            while not expired():
+                self.release.wait(0.01)
+            self.stopped.set()
+        return ErrorResult("done")
+
+class AnyTool:
+    def get(self, name):
+        return object()
+
+@pytest.fixture
+def agent(monkeypatch):
+    monkeypatch.setattr(Config, "MAX_TOOL_TIMEOUT", 1)
+    monkeypatch.setattr(Config, "MAX_TOOL_CONCURRENCY", 1)
+    agent = Agent(stream=False)
+    agent.tools = AnyTool()
+    agent.tool_cache = FakeCache()
+    yield agent
+    agent.tool_cache.release.set()
+    agent.close()
+
+def test_hung_tool_does_not_block_later_calls(agent):
+    results = agent._execute_tools_concurrently([("a", {"mode": "hang"}), ("b", {}), ("c", {})])
+    assert "timed out" in results[0]
+    assert results[1:] == ['{"error":"done"}'] * 2
+    # The hung call still holds its old worker; the next turn gets a free one
+    assert agent._execute_tools_concurrently([("d", {})]) == ['{"error":"done"}']
+
+def test_close_stops_running_tools(agent):
+    call = agent._start_tool_call("a", {"mode": "wait"})
+    while not agent._running_calls:
+        threading.Event().wait(0.01)
+    agent.close()
+    assert agent.tool_cache.stopped.wait(1)
+    assert call.future.result(1) == '{"error":"done"}'
@@ -0,0 +1,34 @@
+import asyncio
+
+from async_agent import AsyncAgent
+from deadline import DeadlineExceeded
+
+TOOL_CALL = {"id": "call-1", "type": "function", "function": {"name": "ping", "arguments": '{"host": "192.0.2.1"}'}}
+
+class Usage:
+    prompt_tokens = None
+    completion_tokens = 5
+
+def test_deadline_answers_open_tool_calls(monkeypatch):
+    agent = AsyncAgent()
+
+    async def complete(session, on_event, use_cache):
+        session.context.prepare()
+        AsyncAgent._count_usage(session, Usage())
+        return "", [TOOL_CALL]
+
+    async def run_tools(calls, on_event, records):
+        raise DeadlineExceeded("turn deadline reached")
+
+    monkeypatch.setattr(agent, "_complete", complete)
+    monkeypatch.setattr(agent, "_execute_tools_concurrently", run_tools)
+
+    asyncio.run(agent.process("ping 192.0.2.1"))
+    session = agent.get_session("default")
+    roles = [message["role"] for message in session.context]
+    assert roles == ["system", "user", "assistant", "tool", "assistant"]
+    assert session.context[3]["tool_call_id"] == "call-1"
+    assert "ran out of time" in session.context[3]["content"]
+    assert session.last_turn_stats["timed_out"]
+    # No usage reported: the context's estimate is counted instead, as Agent does
+    assert session.last_turn_stats["prompt_tokens"] == session.context.last_prompt_tokens > 0
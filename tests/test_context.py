@@ -0,0 +1,82 @@
+import random
+
+from context import ContextWindow, count_message_tokens
+
+def tool_turn(context, turn, calls=2, output="x" * 400):
+    context.append({"role": "user", "content": f"question {turn}"})
+    tool_calls = [
+        {"id": f"call-{turn}-{i}", "type": "function", "function": {"name": "ping", "arguments": "{}"}}
+        for i in range(calls)
+    ]
+    context.append({"role": "assistant", "content": "", "tool_calls": tool_calls})
+    for tool_call in tool_calls:
+        context.append({"role": "tool", "tool_call_id": tool_call["id"], "name": "ping", "content": output})
+    context.append({"role": "assistant", "content": f"answer {turn}"})
+
+def assert_no_orphans(context):
+    """Every tool message answers a tool call kept just before it, and every tool call has its answer."""
+    open_ids = set()
+    for message in context:
+        if message.get("tool_calls"):
+            assert not open_ids
+            open_ids = {tool_call["id"] for tool_call in message["tool_calls"]}
+        elif message["role"] == "tool":
+            assert message["tool_call_id"] in open_ids
+            open_ids.discard(message["tool_call_id"])
+        else:
+            assert not open_ids
+
+def test_token_budget_is_the_only_bound_by_default():
+    context = ContextWindow("system", max_tokens=10 ** 6)
+    for turn in range(10):
+        tool_turn(context, turn)
+    context.prepare()
+    # 10 turns of 5 messages each, none compacted
+    assert len(context) == 51
+    assert context.tokens_saved == 0
+
+def test_older_turns_are_compacted_before_they_are_dropped():
+    context = ContextWindow("system", max_tokens=10 ** 6)
+    for turn in range(3):
+        tool_turn(context, turn)
+    context.max_tokens = context.total_tokens - 1
+    context.prepare()
+    # The oldest turn lost its tool calls; the others are intact
+    assert [m["content"] for m in context[1:3]] == ["question 0", "answer 0"]
+    assert len(context) == 1 + 2 + 5 + 5
+    assert context.total_tokens == sum(count_message_tokens(m) for m in context)
+    assert context.tokens_saved > 0
+
+def test_current_turn_is_never_trimmed():
+    context = ContextWindow("system", max_tokens=50)
+    for turn in range(3):
+        tool_turn(context, turn)
+    context.prepare()
+    assert context[0]["role"] == "system"
+    assert [m["content"] for m in context[1:2]] == ["question 2"]
+    assert len(context) == 6
+    assert_no_orphans(context)
+
+def test_message_cap_is_optional():
+    context = ContextWindow("system", max_tokens=10 ** 6, max_messages=8)
+    for turn in range(3):
+        tool_turn(context, turn)
+    context.prepare()
+    # Both older turns compacted, then the oldest dropped
+    assert len(context) == 8
+    assert [m["content"] for m in context[1:4]] == ["question 1", "answer 1", "question 2"]
+
+def test_tool_messages_are_never_orphaned():
+    rng = random.Random(4)
+    for _ in range(200):
+        context = ContextWindow("system", max_tokens=rng.randint(20, 2000), max_messages=rng.choice([None, 4, 12]))
+        for turn in range(rng.randint(1, 8)):
+            if rng.random() < 0.3:
+                # A turn without tools
+                context.append({"role": "user", "content": f"question {turn}"})
+                context.append({"role": "assistant", "content": f"answer {turn}"})
+            else:
+                tool_turn(context, turn, calls=rng.randint(1, 3), output="x" * rng.randint(0, 800))
+            context.prepare()
+            assert_no_orphans(context)
+            assert context.total_tokens == sum(count_message_tokens(m) for m in context)
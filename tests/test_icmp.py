@@ -0,0 +1,43 @@
+import asyncio
+import struct
+
+import pytest
+
+from icmp import ICMP_ECHO_REPLY, IcmpPinger, checksum, next_ident, parse_echo_reply
+
+@pytest.fixture
+def pinger():
+    try:
+        pinger = IcmpPinger(timeout=1.0)
+    except OSError as e:
+        pytest.skip(f"ICMP sockets are not permitted here: {e}")
+    yield pinger
+    pinger.close()
+
+def echo_reply(ident, seq):
+    header = struct.pack("!BBHHH", ICMP_ECHO_REPLY, 0, 0, ident, seq)
+    return struct.pack("!BBHHH", ICMP_ECHO_REPLY, 0, checksum(header), ident, seq)
+
+def ip_header(length):
+    return struct.pack("!BBHHHBBH4s4s", 0x45, 0, 20 + length, 0, 0, 64, 1, 0,
+                       bytes([127, 0, 0, 1]), bytes([127, 0, 0, 1]))
+
+def test_ping_loopback(pinger):
+    stats = pinger.ping(["127.0.0.1"], count=2)["127.0.0.1"]
+    assert stats.sent == 2
+    assert stats.received == 2
+    assert stats.summary()[0] >= 0
+
+def test_ping_async_loopback(pinger):
+    stats = asyncio.run(pinger.ping_async(["127.0.0.1"], count=2))["127.0.0.1"]
+    assert stats.received == 2
+
+def test_parse_datagram_reply_with_and_without_ip_header():
+    reply = echo_reply(0x1234, 7)
+    # Linux datagram sockets strip the IP header, macOS ones do not
+    assert parse_echo_reply(reply, raw=False) == (0x1234, 7)
+    assert parse_echo_reply(ip_header(len(reply)) + reply, raw=False) == (0x1234, 7)
+    assert parse_echo_reply(ip_header(len(reply)) + reply, raw=True) == (0x1234, 7)
+
+def test_pingers_get_their_own_identifiers():
+    assert next_ident() != next_ident()
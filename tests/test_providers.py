@@ -0,0 +1,13 @@
+from config import Config
+from providers import parse_fallbacks
+
+def test_fallbacks_never_get_the_primary_key(monkeypatch):
+    monkeypatch.setattr(Config, "OPENAI_API_KEY", "primary-secret")
+    monkeypatch.setenv("GROQ_API_KEY", "groq-key")
+    monkeypatch.delenv("MISSING_KEY", raising=False)
+    endpoints = parse_fallbacks("https://groq.example/v1 llama GROQ_API_KEY, "
+                                "https://other.example/v1 model MISSING_KEY, http://localhost:11434/v1")
+    assert [(e.base_url, e.api_key, e.model) for e in endpoints] == [
+        ("https://groq.example/v1", "groq-key", "llama"),
+        ("http://localhost:11434/v1", "none", None),
+    ]
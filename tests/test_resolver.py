@@ -0,0 +1,95 @@
+import asyncio
+import socket
+import time
+
+import pytest
+
+from benchmarks.stub_dns import StubDNSServer
+from deadline import deadline_scope
+from resolver import DNSError, Resolver
+
+@pytest.fixture
+def server():
+    stub = StubDNSServer(negative_ttl=7).start()
+    yield stub
+    stub.stop()
+
+@pytest.fixture
+def resolver(server):
+    return Resolver(["127.0.0.1"], timeout=2, port=server.port)
+
+def resolve(resolver, name, record_type="A"):
+    return asyncio.run(resolver.resolve(name, record_type))
+
+def test_udp_answer(server, resolver):
+    result = resolve(resolver, "example.test")
+    assert result.rcode == "NOERROR"
+    assert sorted(r.value for r in result.records) == ["192.0.2.10", "192.0.2.11"]
+    assert result.ttl == 300
+    assert not result.cached
+    assert (server.queries, server.tcp_queries) == (1, 0)
+
+def test_truncated_answer_is_retried_over_tcp(server, resolver):
+    result = resolve(resolver, "big.example.test", "TXT")
+    assert len(result.records) == 5
+    assert all(r.value == "x" * 200 for r in result.records)
+    assert (server.queries, server.tcp_queries) == (2, 1)
+
+def test_cached_ttl_counts_down(server, resolver):
+    first = resolve(resolver, "example.test", "TXT")
+    assert first.ttl == 60
+    time.sleep(1.1)
+    cached = resolver.cached("example.test", "TXT")
+    assert cached is not None and cached.cached
+    assert cached.ttl < 60
+    assert resolve(resolver, "Example.Test.", "TXT").cached
+    assert server.queries == 1
+
+def test_nxdomain_is_cached_for_soa_minimum(server, resolver):
+    result = resolve(resolver, "missing.example.test")
+    assert result.rcode == "NXDOMAIN"
+    assert result.records == []
+    assert result.ttl == 7
+    again = resolve(resolver, "missing.example.test")
+    assert again.cached and again.rcode == "NXDOMAIN"
+    assert server.queries == 1
+
+def test_cname_chain(server, resolver):
+    result = resolve(resolver, "www.example.test")
+    assert [(r.type_name, r.value) for r in result.records] == [
+        ("CNAME", "example.test"), ("A", "192.0.2.10"), ("A", "192.0.2.11")
+    ]
+    # The answer lives as long as its shortest record, the CNAME
+    assert result.ttl == 120
+
+def test_invalid_name_is_a_dns_error(resolver):
+    with pytest.raises(DNSError, match="invalid label"):
+        resolve(resolver, "bad\udcff.test")
+
+def test_server_timeout_is_capped_by_the_deadline():
+    silent = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    silent.bind(("127.0.0.1", 0))
+    try:
+        resolver = Resolver(["127.0.0.1", "127.0.0.1"], timeout=5, port=silent.getsockname()[1])
+        start = time.monotonic()
+        with deadline_scope(0.3), pytest.raises(DNSError):
+            resolve(resolver, "example.test")
+        assert time.monotonic() - start < 1
+    finally:
+        silent.close()
+
+def test_short_tcp_response_is_a_dns_error():
+    async def run():
+        async def answer(reader, writer):
+            await reader.read(2)
+            # Announce 100 bytes, send 3, hang up
+            writer.write(b"\x00\x64abc")
+            writer.close()
+
+        server = await asyncio.start_server(answer, "127.0.0.1", 0)
+        async with server:
+            resolver = Resolver(["127.0.0.1"], timeout=2, port=server.sockets[0].getsockname()[1])
+            with pytest.raises(DNSError, match="closed"):
+                await resolver._query_tcp("127.0.0.1", b"query", 1)
+
+    asyncio.run(run())
@@ -0,0 +1,128 @@
+import asyncio
+import socket
+
+import pytest
+
+from tcp_scan import FILTERED, OPEN, REFUSED, TcpScanner, format_endpoint, parse_endpoint
+from tools import TcpConnectTool
+
+def listener(family=socket.AF_INET, host="127.0.0.1"):
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.bind((host, 0))
+    sock.listen(128)
+    return sock
+
+def closed_port():
+    """A local port nothing listens on."""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+@pytest.fixture
+def open_port():
+    sock = listener()
+    yield sock.getsockname()[1]
+    sock.close()
+
+def scan(endpoints, attempts=1, timeout=1.0):
+    return asyncio.run(TcpScanner(timeout=timeout).scan(endpoints, attempts))
+
+def test_open_and_refused(open_port):
+    refused = closed_port()
+    results = scan([("127.0.0.1", open_port), ("127.0.0.1", refused)], attempts=3)
+
+    opened = results[("127.0.0.1", open_port)]
+    assert opened.state == OPEN
+    assert opened.outcomes == [OPEN] * 3
+    assert len(opened.times) == 3 and opened.loss == 0
+    low, median, high = opened.summary()
+    assert 0 < low <= median <= high
+
+    closed = results[("127.0.0.1", refused)]
+    assert closed.state == REFUSED
+    # A refusal is not retried
+    assert closed.outcomes == [REFUSED]
+    assert closed.summary() is None and closed.loss == 100
+
+def test_ipv6_listener():
+    if not socket.has_ipv6:
+        pytest.skip("no IPv6")
+    try:
+        sock = listener(socket.AF_INET6, "::1")
+    except OSError:
+        pytest.skip("no IPv6 loopback")
+    with sock:
+        port = sock.getsockname()[1]
+        endpoints = parse_endpoint(f"[::1]:{port}")
+        stats = scan(endpoints, attempts=2)[("::1", port)]
+    assert stats.state == OPEN
+    assert stats.address == "::1"
+    assert stats.outcomes == [OPEN, OPEN]
+    assert stats.endpoint == f"[::1]:{port}"
+
+def test_filtered_when_backlog_is_full():
+    # A listener that never accepts drops SYNs once its backlog is full, like a firewall
+    sock = listener()
+    sock.listen(0)
+    port = sock.getsockname()[1]
+    fillers = []
+    for _ in range(3):
+        filler = socket.socket()
+        filler.setblocking(False)
+        filler.connect_ex(("127.0.0.1", port))
+        fillers.append(filler)
+    try:
+        stats = scan([("127.0.0.1", port)], attempts=3, timeout=0.3)[("127.0.0.1", port)]
+    finally:
+        for s in fillers + [sock]:
+            s.close()
+    assert stats.state == FILTERED
+    assert stats.outcomes == [FILTERED]
+
+def test_unresolved_host():
+    stats = scan([("no-such-host.invalid", 80)])[("no-such-host.invalid", 80)]
+    assert stats.state == "unresolved"
+    assert stats.outcomes == []
+    assert "could not resolve" in stats.error
+
+@pytest.mark.parametrize("text, ports, expected", [
+    ("example.com:443", (), [("example.com", 443)]),
+    (" 10.0.0.1:22 ", (), [("10.0.0.1", 22)]),
+    ("[2001:db8::1]:8080", (), [("2001:db8::1", 8080)]),
+    ("[::1]", (80, 443), [("::1", 80), ("::1", 443)]),
+    ("::1", (22,), [("::1", 22)]),
+    ("db.internal", (5432,), [("db.internal", 5432)]),
+    # An explicit port wins over the defaults
+    ("db.internal:6432", (5432,), [("db.internal", 6432)]),
+])
+def test_parse_endpoint(text, ports, expected):
+    assert parse_endpoint(text, ports) == expected
+
+@pytest.mark.parametrize("text, ports", [
+    ("example.com", ()),
+    ("example.com:0", ()),
+    ("example.com:65536", ()),
+    ("example.com:http", ()),
+    ("[::1]x", ()),
+    ("[::1]:", ()),
+])
+def test_parse_endpoint_rejects(text, ports):
+    with pytest.raises(ValueError):
+        parse_endpoint(text, ports)
+
+def test_format_endpoint():
+    assert format_endpoint("::1", 80) == "[::1]:80"
+    assert format_endpoint("example.com", 80) == "example.com:80"
+
+def test_tool_coerces_and_validates_arguments(open_port):
+    tool = TcpConnectTool()
+    result = tool.execute({"endpoints": [f"127.0.0.1:{open_port}"], "attempts": "2", "timeout": "0.5"})
+    assert result.ok
+    assert result.to_dict()["open"] == 1
+
+    assert not tool.execute({"endpoints": [f"127.0.0.1:{open_port}"], "attempts": "many"}).ok
+    assert not tool.execute({"endpoints": ["127.0.0.1"], "ports": ["22"]}).ok
+    assert not tool.execute({"endpoints": ["127.0.0.1"]}).ok
+    assert not tool.execute({"endpoints": []}).ok
@@ -0,0 +1,77 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from deadline import DeadlineExceeded, deadline_scope
+from results import DNSLookupResult
+from tool_cache import LEADER_GRACE, ToolCache
+from tools import Tool
+
+class SlowTool(Tool):
+    CACHE_TTL = 60
+
+    def __init__(self):
+        super().__init__("slow", "Answers once released")
+        self.release = threading.Event()
+
+    def execute(self, args):
+        self.release.wait(5)
+        return DNSLookupResult("slow.test", "A", "NOERROR", ["192.0.2.1"])
+
+    async def execute_async(self, args):
+        return await asyncio.get_running_loop().run_in_executor(None, self.execute, args)
+
+    def execute_with_logging(self, args):
+        return self.execute(args)
+
+    async def execute_with_logging_async(self, args):
+        return await self.execute_async(args)
+
+    @property
+    def parameters(self):
+        return {"type": "object", "properties": {}}
+
+@pytest.fixture
+def tool():
+    tool = SlowTool()
+    yield tool
+    tool.release.set()
+
+def start_leader(cache, tool):
+    leader = threading.Thread(target=cache.run, args=(tool, {}))
+    leader.start()
+    while not cache._in_flight:
+        time.sleep(0.01)
+    return leader
+
+def test_follower_waits_no_longer_than_its_deadline(tool):
+    cache = ToolCache()
+    leader = start_leader(cache, tool)
+
+    start = time.monotonic()
+    with deadline_scope(0.2), pytest.raises(DeadlineExceeded):
+        cache.run(tool, {})
+    assert time.monotonic() - start < 0.2 + LEADER_GRACE + 0.5
+
+    # The leader still finishes and its result is cached for later calls
+    tool.release.set()
+    leader.join(5)
+    assert cache.run(tool, {}).cached_age is not None
+
+def test_async_follower_giving_up_leaves_the_leader_alone(tool):
+    cache = ToolCache()
+    leader = start_leader(cache, tool)
+
+    async def follow():
+        with deadline_scope(0.2):
+            await cache.run_async(tool, {})
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(follow())
+
+    tool.release.set()
+    leader.join(5)
+    assert not leader.is_alive()
+    assert cache.stats()["entries"] == 1
@@ -0,0 +1,67 @@
+import pytest
+
+from config import Config
+from history import get_history
+from results import DNSLookupResult, TcpConnectResult
+from tools import PingSweepTool, ProbeHistoryTool, percentile
+
+@pytest.mark.parametrize("values, pct, expected", [
+    # Odd length
+    ([1, 2, 3, 4, 5], 50, 3),
+    ([1, 2, 3, 4, 5], 90, 5),
+    ([1, 2, 3, 4, 5], 20, 1),
+    ([1, 2, 3, 4, 5], 100, 5),
+    # Even length
+    ([1, 2, 3, 4], 50, 2),
+    ([1, 2, 3, 4], 75, 3),
+    ([1, 2, 3, 4], 76, 4),
+    (list(range(1, 101)), 99, 99),
+    (list(range(1, 101)), 95, 95),
+    ([7], 50, 7),
+    ([1, 2], 0, 1),
+])
+def test_percentile_nearest_rank(values, pct, expected):
+    assert percentile(values, pct) == expected
+
+def test_percentile_of_nothing():
+    assert percentile([], 50) == 0.0
+
+@pytest.fixture
+def inventory(tmp_path, monkeypatch):
+    directory = tmp_path / "inventory"
+    directory.mkdir()
+    monkeypatch.setattr(Config, "INVENTORY_DIR", str(directory))
+    return directory
+
+def test_sweep_accepts_a_single_host_string():
+    assert PingSweepTool()._collect_targets({"hosts": "10.0.0.1"}) == ["10.0.0.1"]
+
+def test_sweep_reads_inventory_inside_directory(inventory):
+    (inventory / "web.txt").write_text("web1.example.com  # frontend\n10.0.0.2 rack-4\n\n$6$not-a-host:x\n")
+    assert PingSweepTool()._collect_targets({"inventory_file": "web.txt"}) == ["web1.example.com", "10.0.0.2"]
+    assert PingSweepTool()._collect_targets({"inventory_file": str(inventory / "web.txt")}) == ["web1.example.com", "10.0.0.2"]
+
+def test_sweep_refuses_inventory_outside_directory(inventory, tmp_path):
+    (tmp_path / "secret.txt").write_text("root:$6$hash:19000::::::\n")
+    for path in (str(tmp_path / "secret.txt"), "../secret.txt", "/etc/passwd"):
+        result = PingSweepTool().execute({"inventory_file": path})
+        assert not result.ok
+        assert "hash" not in result.render()
+
+def test_dns_and_tcp_results_are_remembered():
+    tool = ProbeHistoryTool()
+    tool._remember(DNSLookupResult("remembered.test", "A", "NOERROR", ["192.0.2.1"], elapsed=12.5))
+    tool._remember(DNSLookupResult("cached.test", "A", "NOERROR", ["192.0.2.1"], source="cached"))
+    tool._remember(TcpConnectResult(2, 0.1, None, [("192.0.2.7:443", 3.0, 4.0, 0.0)], ["192.0.2.7:22"], [], [], [], []))
+
+    history = get_history()
+    assert history.probes("remembered.test") == ["dns"]
+    assert history.probes("cached.test") == []
+    assert history.probes("192.0.2.7") == ["tcp:22", "tcp:443"]
+    assert history.query("192.0.2.7", "tcp:443", 60)["rtt_ms"]["p50"] == 3.0
+    assert history.query("192.0.2.7", "tcp:22", 60)["loss_pct"] == 100.0
+
+def test_probe_history_rejects_a_non_numeric_window():
+    result = ProbeHistoryTool().execute({"target": "192.0.2.7", "window_minutes": "an hour"})
+    assert not result.ok
+    assert "window_minutes" in result.render()
@@ -0,0 +1,200 @@
+import asyncio
+import copy
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Dict, Any, Optional, Tuple, Union
+
+from deadline import DeadlineExceeded, remaining
+from results import ToolResult, serialize
+from tools import Tool
+
+# Arguments naming a host compare case-insensitively
+HOSTNAME_ARGS = ("host", "domain")
+
+# A leader stops at its deadline and returns a partial result just after it;
+# followers under the same deadline wait this much longer for that result
+LEADER_GRACE = 0.5
+
+def normalize_args(tool: Tool, args: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Normalize tool arguments so equivalent calls share a cache key.
+
+    Fills in schema defaults, strips whitespace and lowercases host names,
+    so {"host": "Example.com "} and {"host": "example.com", "count": 4}
+    are the same call.
+    """
+    normalized = {}
+    for name, schema in tool.parameters.get("properties", {}).items():
+        if "default" in schema:
+            normalized[name] = schema["default"]
+    for name, value in args.items():
+        if isinstance(value, str):
+            value = value.strip()
+            if name in HOSTNAME_ARGS:
+                value = value.lower().rstrip(".")
+        normalized[name] = value
+    return normalized
+
+class ToolCache:
+    """
+    Cache of tool results with per-tool freshness.
+
+    Each tool decides how long a result stays fresh through
+    Tool.cache_ttl(). Entries are evicted least recently used first once
+    there are more than ``max_entries`` or their results take more than
+    ``max_bytes``. Identical calls that arrive while one is running wait
+    for its result instead of probing again, which also works across
+    threads and event loops, but no longer than their own deadline
+    allows. Safe to share between Agent and AsyncAgent.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[float, float, ToolResult, int]]" = OrderedDict()
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def run(self, tool: Tool, args: Dict[str, Any]) -> ToolResult:
+        """Return a fresh cached result or execute the tool with logging."""
+        key, cached, future, leader = self._claim(tool, args)
+        if cached is not None:
+            return cached
+        if not leader:
+            try:
+                return future.result(self._follower_timeout())
+            except FutureTimeoutError:
+                if future.done():
+                    # The leader's own error
+                    raise
+                raise DeadlineExceeded(f"deadline reached waiting for an identical {tool.name} call")
+
+        try:
+            result = tool.execute_with_logging(args)
+        except BaseException as e:
+            self._fail(key, future, e)
+            raise
+        self._finish(tool, args, key, future, result)
+        return result
+
+    async def run_async(self, tool: Tool, args: Dict[str, Any]) -> ToolResult:
+        """Async version of run(), for tools executed on the event loop."""
+        key, cached, future, leader = self._claim(tool, args)
+        if cached is not None:
+            return cached
+        if not leader:
+            # Shielded: a follower giving up must not cancel the future the leader completes
+            try:
+                return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self._follower_timeout())
+            except asyncio.TimeoutError:
+                if future.done():
+                    raise
+                raise DeadlineExceeded(f"deadline reached waiting for an identical {tool.name} call")
+
+        try:
+            result = await tool.execute_with_logging_async(args)
+        except BaseException as e:
+            self._fail(key, future, e)
+            raise
+        self._finish(tool, args, key, future, result)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for tuning tool TTLs."""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0
+        }
+
+    def clear(self) -> None:
+        """Drop every cached result; calls in flight are unaffected."""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    @staticmethod
+    def _follower_timeout() -> Optional[float]:
+        """How long a follower may wait for the leader: its own deadline plus LEADER_GRACE, or forever without one."""
+        left = remaining()
+        return None if left is None else left + LEADER_GRACE
+
+    def _claim(self, tool: Tool, args: Dict[str, Any]):
+        """
+        Look a call up under the lock.
+
+        Returns (key, cached_result, future, leader). The leader is the
+        caller that must execute the tool and complete the future.
+        """
+        key = tool.name + ":" + json.dumps(normalize_args(tool, args), sort_keys=True, default=str)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, stored_at, result, _ = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return key, self._aged(result, now - stored_at), None, False
+                self._evict(key)
+
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return key, None, future, False
+
+            future = Future()
+            self._in_flight[key] = future
+            self.misses += 1
+            return key, None, future, True
+
+    def _finish(self, tool: Tool, args: Dict[str, Any], key: str, future: Future, result: ToolResult) -> None:
+        ttl = tool.cache_ttl(args, result)
+        # Approximate footprint: the serialized form the model would be sent
+        size = len(key) + len(serialize(result))
+        with self._lock:
+            self._in_flight.pop(key, None)
+            if ttl > 0 and self.max_entries > 0 and size <= self.max_bytes:
+                if key in self._entries:
+                    self._evict(key)
+                now = time.monotonic()
+                self._entries[key] = (now + ttl, now, result, size)
+                self.bytes += size
+                while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                    self._evict(next(iter(self._entries)))
+                    self.evictions += 1
+        future.set_result(result)
+
+    def _fail(self, key: str, future: Future, error: BaseException) -> None:
+        with self._lock:
+            self._in_flight.pop(key, None)
+        # Waiters get an ordinary exception even if the leader was cancelled
+        if not isinstance(error, Exception):
+            error = RuntimeError(f"{key} was cancelled")
+        future.set_exception(error)
+
+    def _evict(self, key: str) -> None:
+        _, _, _, size = self._entries.pop(key)
+        self.bytes -= size
+
+    def _aged(self, result: Union[ToolResult, str], age: float) -> Union[ToolResult, str]:
+        """A copy of a cached result that says how old it is."""
+        if isinstance(result, ToolResult):
+            result = copy.copy(result)
+            result.cached_age = age
+            return result
+        return f"{result}\n(cached {age:.0f}s ago)"
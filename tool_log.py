@@ -0,0 +1,243 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional
+
+from config import Config
+from results import ToolResult, ErrorResult, serialize
+
+LOGGER_NAME = "tool_calls"
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """Parse "ping_sweep=0.1,ping=0.5" into {"ping_sweep": 0.1, "ping": 0.5}."""
+    rates = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, rate = item.split("=", 1)
+            rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+def _result_fields(result: Any) -> Dict[str, Any]:
+    """Size (and error text) of a tool result, computed on the writer thread."""
+    if result is None:
+        return {}
+    fields: Dict[str, Any] = {"result_bytes": len(serialize(result).encode("utf-8"))}
+    if isinstance(result, ErrorResult):
+        fields["error"] = result.message
+    return fields
+
+class JSONLinesFormatter(logging.Formatter):
+    """One JSON object per tool call."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {"ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds")}
+        call = getattr(record, "call", None)
+        if call is None:
+            entry["message"] = record.getMessage()
+        else:
+            entry.update((key, value) for key, value in call.items() if key != "result")
+            entry.update(_result_fields(call.get("result")))
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class ConsoleFormatter(logging.Formatter):
+    """A single readable line per tool call for the terminal."""
+
+    ICONS = {"ok": "✅", "error": "⚠️ ", "exception": "❌"}
+
+    def format(self, record: logging.LogRecord) -> str:
+        call = getattr(record, "call", None)
+        if not call:
+            return record.getMessage()
+        fields = _result_fields(call.get("result"))
+        line = (f"{self.ICONS.get(call['status'], '•')} {call['tool']} {call['status']} "
+                f"in {call['duration_ms']:.0f}ms {call['args']}")
+        if "result_bytes" in fields:
+            line += f" → {fields['result_bytes']}B"
+        if "error" in fields or call.get("error"):
+            line += f" ({fields.get('error') or call.get('error')})"
+        return line
+
+class BatchedStreamHandler(logging.StreamHandler):
+    """StreamHandler that leaves flushing to the writer thread, once per batch."""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+class RotatingJSONLinesHandler(logging.handlers.RotatingFileHandler):
+    """
+    Rotates when the file reaches ``max_bytes`` or is older than ``rotate_seconds``.
+
+    Like BatchedStreamHandler it does not flush per record, and it checks
+    the size from the file position instead of formatting each record twice.
+    """
+
+    def __init__(self, filename: str, max_bytes: int, backup_count: int, rotate_seconds: float = 0):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True)
+        self.rotate_seconds = rotate_seconds
+        self.opened_at = time.time()
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.rotate_seconds and time.time() - self.opened_at >= self.rotate_seconds:
+            return True
+        return bool(self.maxBytes and self.stream is not None and self.stream.tell() >= self.maxBytes)
+
+    def doRollover(self) -> None:
+        super().doRollover()
+        self.opened_at = time.time()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            if self.shouldRollover(record):
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+class ToolCallLogger:
+    """
+    Queue-based logger for tool calls.
+
+    log_call() only decides whether to sample the call and puts one record
+    on an in-memory queue. A writer thread formats it (including
+    serializing the result to measure its size) and writes a JSON line to
+    the rotating log file, plus an optional one-line console echo. Records
+    are written in batches with one flush per batch. A full queue drops
+    records rather than blocking a probe.
+    """
+
+    # Records written between flushes
+    BATCH_SIZE = 256
+
+    def __init__(self, path: Optional[str] = None, console: Optional[bool] = None,
+                 sample_rates: Optional[Dict[str, float]] = None, queue_size: int = 10000):
+        self.logger = logging.getLogger(LOGGER_NAME)
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.sample_rates = parse_sample_rates(Config.TOOL_LOG_SAMPLE) if sample_rates is None else sample_rates
+        self.dropped = 0
+
+        path = Config.TOOL_LOG_FILE if path is None else path
+        console = Config.TOOL_LOG_CONSOLE if console is None else console
+
+        handlers = []
+        if path:
+            try:
+                file_handler = RotatingJSONLinesHandler(
+                    path, Config.TOOL_LOG_MAX_BYTES, Config.TOOL_LOG_BACKUPS, Config.TOOL_LOG_ROTATE_SECONDS
+                )
+                file_handler.setFormatter(JSONLinesFormatter())
+                handlers.append(file_handler)
+            except OSError:
+                # If file logging fails, continue with console logging only
+                pass
+        if console:
+            console_handler = BatchedStreamHandler(sys.stderr)
+            console_handler.setFormatter(ConsoleFormatter())
+            handlers.append(console_handler)
+        self.handlers: List[logging.Handler] = handlers
+
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.logger.handlers = [_NonBlockingQueueHandler(self._queue, self)]
+        self._writer = threading.Thread(target=self._write_loop, name="tool-log-writer", daemon=True)
+        self._writer.start()
+
+    def log_call(self, tool: str, args: Dict[str, Any], started_at: float, status: str,
+                 result: Optional[ToolResult] = None, error: Optional[BaseException] = None) -> None:
+        """Record one finished tool call; failures are always kept, successes may be sampled."""
+        if self.logger.disabled:
+            return
+        rate = self.sample_rates.get(tool, 1.0)
+        if status == "ok" and rate < 1.0 and random.random() >= rate:
+            return
+
+        call = {
+            "tool": tool,
+            "status": status,
+            "duration_ms": round((time.perf_counter() - started_at) * 1000, 3),
+            "args": args,
+            "thread": threading.current_thread().name
+        }
+        if rate < 1.0:
+            call["sample_rate"] = rate
+        if result is not None:
+            call["result"] = result
+        if error is not None:
+            call["error"] = f"{type(error).__name__}: {error}"
+        self.logger.info(tool, extra={"call": call})
+
+    def flush(self) -> None:
+        """Wait until every queued record has been written."""
+        self._queue.join()
+
+    def close(self) -> None:
+        """Write out queued records and stop the writer thread."""
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+        for handler in self.handlers:
+            handler.close()
+
+    def _write_loop(self) -> None:
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            while len(batch) < self.BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for record in batch:
+                if record is _STOP:
+                    running = False
+                    continue
+                for handler in self.handlers:
+                    handler.handle(record)
+            for handler in self.handlers:
+                handler.flush()
+            for _ in batch:
+                self._queue.task_done()
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the writer thread as they are; formatting happens there."""
+
+    def __init__(self, log_queue: queue.Queue, owner: ToolCallLogger):
+        super().__init__(log_queue)
+        self.owner = owner
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.owner.dropped += 1
+
+# Queued by close() to end the writer thread
+_STOP = object()
+
+_tool_logger: Optional[ToolCallLogger] = None
+_tool_logger_lock = threading.Lock()
+
+def get_tool_logger() -> ToolCallLogger:
+    """Return the process-wide tool call logger, starting it on first use."""
+    global _tool_logger
+    if _tool_logger is None:
+        with _tool_logger_lock:
+            if _tool_logger is None:
+                _tool_logger = ToolCallLogger()
+                atexit.register(_tool_logger.close)
+    return _tool_logger
@@ -0,0 +1,192 @@
+"""
+Tool registry: the tools an agent offers to the model, keyed by name.
+
+Tools are registered as factories and built the first time they are
+needed, either to call them or to describe them to the model. Lookups by
+name are a dict access. The schema sent with every LLM request is built
+once, together with its JSON encoding and a fingerprint for the response
+cache, and rebuilt only when a tool is added.
+
+Other packages can provide tools through the ``ping_agent.tools`` entry
+point group. Each entry point is named after its tool and points at a
+Tool subclass, or any callable returning a Tool instance:
+
+    [project.entry-points."ping_agent.tools"]
+    http_check = "acme_netdiag.tools:HttpCheckTool"
+
+The installed packages' metadata is only read when the tool list is
+first needed, and a plugin module is only imported when its tool is. A
+plugin that fails to load is reported and left out instead of breaking
+the agent.
+"""
+import hashlib
+import json
+import threading
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Any, Optional
+
+if TYPE_CHECKING:
+    from tools import Tool
+
+ENTRY_POINT_GROUP = "ping_agent.tools"
+
+def get_tools_schema(tools: Iterable["Tool"]) -> List[Dict[str, Any]]:
+    """Get OpenAI tool schema for the given tools."""
+    schemas = []
+    for tool in tools:
+        schemas.append({
+            "type": "function",
+            "function": {
+                "name": tool.name,
+                "description": tool.description,
+                "parameters": tool.parameters
+            }
+        })
+    return schemas
+
+class ToolRegistry:
+    """
+    Tools by name, built on first use, with their schema computed once.
+
+    Safe to share between threads and agents: tools hold no per-call
+    state, so one instance of each serves every caller.
+    """
+
+    def __init__(self, tools: Iterable["Tool"] = ()):
+        self._factories: Dict[str, Callable[[], "Tool"]] = {}
+        self._tools: Dict[str, "Tool"] = {}
+        self._lock = threading.RLock()
+        self._schema: Optional[List[Dict[str, Any]]] = None
+        self._schema_json = ""
+        self._fingerprint = ""
+        # Entry point groups not scanned yet
+        self._plugin_groups: List[str] = []
+        for tool in tools:
+            self.add(tool)
+
+    def add(self, tool: "Tool") -> None:
+        """Register a ready tool instance, replacing any tool of the same name."""
+        with self._lock:
+            self._factories[tool.name] = lambda: tool
+            self._tools[tool.name] = tool
+            self._schema = None
+
+    def register(self, name: str, factory: Callable[[], "Tool"]) -> None:
+        """Register a tool to be built by ``factory()`` when it is first needed."""
+        with self._lock:
+            self._factories[name] = factory
+            self._tools.pop(name, None)
+            self._schema = None
+
+    def discover_plugins(self, group: str = ENTRY_POINT_GROUP) -> None:
+        """
+        Add the tools of installed packages' ``group`` entry points.
+
+        The scan of the package metadata (tens of milliseconds) is put off
+        until the tool list is first needed. Registered tools keep their
+        name; a plugin that reuses one is skipped.
+        """
+        with self._lock:
+            self._plugin_groups.append(group)
+            self._schema = None
+
+    def _scan_plugins(self) -> None:
+        if not self._plugin_groups:
+            return
+        with self._lock:
+            groups, self._plugin_groups = self._plugin_groups, []
+            if not groups:
+                return
+            from importlib.metadata import entry_points
+
+            found = entry_points()
+            for group in groups:
+                candidates = found.select(group=group) if hasattr(found, "select") else found.get(group, ())
+                for entry_point in candidates:
+                    if entry_point.name in self._factories:
+                        print(f"⚠️  Tool plugin {entry_point.value} skipped: a tool named {entry_point.name} already exists")
+                        continue
+                    self._factories[entry_point.name] = _plugin_factory(entry_point)
+
+    def __contains__(self, name: str) -> bool:
+        self._scan_plugins()
+        return name in self._factories
+
+    def __len__(self) -> int:
+        self._scan_plugins()
+        return len(self._factories)
+
+    def names(self) -> List[str]:
+        """Registered tool names, in registration order, without building any tool."""
+        self._scan_plugins()
+        return list(self._factories)
+
+    def get(self, name: str) -> Optional["Tool"]:
+        """The tool called ``name``, built on first use, or None if there is none (or it failed to load)."""
+        tool = self._tools.get(name)
+        if tool is not None:
+            return tool
+        self._scan_plugins()
+        with self._lock:
+            tool = self._tools.get(name)
+            if tool is None and name in self._factories:
+                tool = self._build(name)
+            return tool
+
+    def _build(self, name: str) -> Optional["Tool"]:
+        try:
+            tool = self._factories[name]()
+            if tool.name != name:
+                raise ValueError(f"registered as {name!r} but named {tool.name!r}")
+        except Exception as e:
+            print(f"⚠️  Tool {name} failed to load and is disabled: {e}")
+            del self._factories[name]
+            self._schema = None
+            return None
+        self._tools[name] = tool
+        return tool
+
+    def __iter__(self) -> Iterator["Tool"]:
+        """Every tool that loads, building the ones not used yet."""
+        for name in self.names():
+            tool = self.get(name)
+            if tool is not None:
+                yield tool
+
+    def _ensure_schema(self) -> None:
+        if self._schema is not None:
+            return
+        with self._lock:
+            if self._schema is None:
+                schema = get_tools_schema(list(self))
+                encoded = json.dumps(schema, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+                self._schema_json = encoded
+                self._fingerprint = hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+                self._schema = schema
+
+    def schema(self) -> List[Dict[str, Any]]:
+        """
+        The OpenAI tool schema of every tool, built once and shared.
+
+        Callers must not modify the returned list.
+        """
+        self._ensure_schema()
+        return self._schema
+
+    @property
+    def schema_json(self) -> str:
+        """The schema as compact JSON with sorted keys."""
+        self._ensure_schema()
+        return self._schema_json
+
+    @property
+    def fingerprint(self) -> str:
+        """SHA-256 of schema_json; changes whenever a tool or its parameters change."""
+        self._ensure_schema()
+        return self._fingerprint
+
+def _plugin_factory(entry_point) -> Callable[[], "Tool"]:
+    def load() -> "Tool":
+        from tools import Tool
+        loaded = entry_point.load()
+        return loaded if isinstance(loaded, Tool) else loaded()
+    return load
@@ -1,95 +1,135 @@
+import asyncio
 import subprocess
+import ipaddress
 import json
+import math
+import os
 import platform
 import re
-import logging
+import threading
 import time
-from datetime import datetime
-from typing import Dict, Any, Optional
+from contextlib import nullcontext
+from typing import Callable, Dict, Any, List, Optional, Tuple
 from abc import ABC, abstractmethod
-
-# Set up logging for tool calls
-def setup_tool_logger():
-    """Set up logger for tool calls with both console and file output."""
-    logger = logging.getLogger('tool_calls')
-    logger.setLevel(logging.INFO)
-
-    # Clear existing handlers
-    logger.handlers.clear()
-
-    # Create formatter
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-
-    # Console handler
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-
-    # File handler (append mode)
-    try:
-        file_handler = logging.FileHandler('tool_calls.log', mode='a', encoding='utf-8')
-        file_handler.setLevel(logging.INFO)
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
-    except Exception:
-        # If file logging fails, continue with console logging only
-        pass
-
-    return logger
-
-# Initialize the logger
-tool_logger = setup_tool_logger()
+from config import Config
+from icmp import IcmpPinger, PingStats
+from traceroute import ParallelTracer
+from tcp_scan import ConnectStats, TcpScanner, parse_endpoint
+from resolver import DNSError, DNSResult, get_resolver
+from tool_log import get_tool_logger
+from metrics import record_tool_call
+from tracing import trace_span
+from history import get_history
+from deadline import budget, current as current_deadline, expired
+from progress import report as report_progress
+from tool_registry import ToolRegistry
+from results import (
+    ToolResult, ErrorResult, PingResult, TraceHop, TracerouteResult,
+    DNSLookupResult, NetworkInfoResult, SweepResult, TcpConnectResult, ProbeHistoryResult
+)
 
 class Tool(ABC):
     """Abstract base class for agent tools."""
 
+    # Seconds a result stays fresh in the tool cache; 0 disables caching
+    CACHE_TTL: float = 0
+
+    # TCP connect results of more endpoints than this are sweeps; like ping_sweep results
+    # they stay out of the probe history rather than fill its HISTORY_MAX_SERIES series
+    HISTORY_MAX_ENDPOINTS = 16
+
     def __init__(self, name: str, description: str):
         self.name = name
         self.description = description
 
+    def cache_ttl(self, args: Dict[str, Any], result: ToolResult) -> float:
+        """
+        How long a result may be served from the tool cache.
+
+        Errors and partial results are never cached. Tools whose freshness
+        depends on the result (e.g. DNS record TTLs) override this.
+        """
+        if isinstance(result, ToolResult) and (not result.ok or result.partial):
+            return 0
+        if isinstance(result, str) and result.startswith("Error"):
+            return 0
+        return self.CACHE_TTL
+
     @abstractmethod
-    def execute(self, args: Dict[str, Any]) -> str:
+    def execute(self, args: Dict[str, Any]) -> ToolResult:
         """Execute the tool with given arguments."""
         pass
 
-    def execute_with_logging(self, args: Dict[str, Any]) -> str:
-        """Execute the tool with logging."""
-        start_time = time.time()
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    async def execute_async(self, args: Dict[str, Any]) -> ToolResult:
+        """
+        Execute the tool without blocking the event loop.
+
+        The default implementation runs execute() in a worker thread;
+        tools that can do their I/O natively on asyncio override this.
+        """
+        return await asyncio.to_thread(self.execute, args)
 
-        # Log tool call start
-        tool_logger.info(f"🚀 CALLING TOOL: {self.name}")
-        tool_logger.info(f"📋 Arguments: {args}")
-        tool_logger.info(f"⏰ Started at: {timestamp}")
+    def execute_with_logging(self, args: Dict[str, Any]) -> ToolResult:
+        """Execute the tool and log one record for the call."""
+        start_time = time.perf_counter()
 
         try:
             # Execute the tool
             result = self.execute(args)
+        except Exception as e:
+            self._record_call(args, start_time, "exception", error=e)
+            # Re-raise the exception
+            raise
 
-            # Calculate execution time
-            execution_time = time.time() - start_time
-
-            # Log successful completion
-            tool_logger.info(f"✅ TOOL COMPLETED: {self.name}")
-            tool_logger.info(f"⏱️  Execution time: {execution_time:.2f}s")
-            tool_logger.info(f"📊 Result: {result[:100]}{'...' if len(result) > 100 else ''}")
-            tool_logger.info("-" * 60)
+        self._log_result(args, start_time, result)
+        self._remember(result)
+        return result
 
-            return result
+    async def execute_with_logging_async(self, args: Dict[str, Any]) -> ToolResult:
+        """Execute the tool asynchronously and log one record for the call."""
+        start_time = time.perf_counter()
 
+        try:
+            result = await self.execute_async(args)
+        except asyncio.CancelledError:
+            self._record_call(args, start_time, "cancelled")
+            raise
         except Exception as e:
-            # Calculate execution time even for failures
-            execution_time = time.time() - start_time
+            self._record_call(args, start_time, "exception", error=e)
+            raise
 
-            # Log error
-            tool_logger.error(f"❌ TOOL FAILED: {self.name}")
-            tool_logger.error(f"⏱️  Failed after: {execution_time:.2f}s")
-            tool_logger.error(f"🚨 Error: {str(e)}")
-            tool_logger.info("-" * 60)
+        self._log_result(args, start_time, result)
+        self._remember(result)
+        return result
 
-            # Re-raise the exception
-            raise
+    def _remember(self, result: ToolResult) -> None:
+        """Keep ping, DNS and TCP connect measurements in the probe history, so later questions need not re-probe."""
+        history = get_history()
+        if isinstance(result, PingResult):
+            history.record(result.host, "ping", result.rtt_avg, result.loss)
+        elif isinstance(result, DNSLookupResult) and result.elapsed is not None:
+            # Only answers a nameserver was asked for; cached ones say nothing about its latency
+            history.record(result.name, "dns", result.elapsed, 0.0)
+        elif isinstance(result, TcpConnectResult) and result.endpoints <= self.HISTORY_MAX_ENDPOINTS:
+            # Recorded the way the monitor records them: a connect that failed is 100% loss
+            outcomes = [(endpoint, median, loss) for endpoint, median, _, loss in result.open]
+            outcomes += [(endpoint, None, 100.0) for endpoint in result.refused + result.filtered + result.unreachable]
+            outcomes += [(endpoint, None, 100.0) for endpoint, _ in result.failed]
+            for endpoint, rtt, loss in outcomes:
+                (host, port), = parse_endpoint(endpoint)
+                history.record(host, f"tcp:{port}", rtt, loss)
+
+    def _log_result(self, args: Dict[str, Any], start_time: float, result: ToolResult) -> None:
+        """Log a call that returned, as an error if the tool reported one."""
+        failed = (isinstance(result, ToolResult) and not result.ok) or \
+            (isinstance(result, str) and result.startswith("Error"))
+        self._record_call(args, start_time, "error" if failed else "ok", result=result)
+
+    def _record_call(self, args: Dict[str, Any], start_time: float, status: str,
+                     result: Optional[ToolResult] = None, error: Optional[BaseException] = None) -> None:
+        """Update the tool metrics and log one record for a finished call."""
+        record_tool_call(self.name, status, time.perf_counter() - start_time)
+        get_tool_logger().log_call(self.name, args, start_time, status, result=result, error=error)
 
     @property
     @abstractmethod
@@ -97,80 +137,397 @@ class Tool(ABC):
         """Return JSON schema for tool parameters."""
         pass
 
-class PingTool(Tool):
+# Called with each line of a command's output as it arrives; returning True stops the command
+LineHandler = Callable[[str], bool]
+
+# The destination line of traceroute ("traceroute to host (addr)") or tracert ("Tracing route to host [addr]")
+TRACE_HEADER = re.compile(r'(?:traceroute to|Tracing route to) \S+ [(\[]([0-9a-fA-F.:]+)[)\]]')
+
+# A host name, IPv4 or IPv6 address as it may appear in an inventory file
+HOST_TOKEN = re.compile(r'^(?=.*[0-9A-Za-z])[0-9A-Za-z.:_-]{1,253}$')
+
+# The round-trip time in a ping reply line: "time=12.3 ms" (Unix) or "time<1ms" (Windows)
+REPLY_TIME = re.compile(r'time[=<](\d+\.?\d*)\s*ms')
+
+class CommandResult(subprocess.CompletedProcess):
+    """A finished command; ``stopped_early`` when its line handler ended it before it exited."""
+
+    def __init__(self, args: List[str], returncode: int, stdout: str, stderr: str, stopped_early: bool = False):
+        super().__init__(args, returncode, stdout, stderr)
+        self.stopped_early = stopped_early
+
+def _kill(process: subprocess.Popen) -> None:
+    if process.poll() is None:
+        try:
+            process.kill()
+        except OSError:
+            pass
+
+def run_command(cmd: List[str], timeout: float, on_line: Optional[LineHandler] = None) -> CommandResult:
+    """
+    Run a command and capture its text output, reading it line by line.
+
+    Each output line is passed to ``on_line`` as soon as the command
+    prints it; when the handler returns True the command is killed and the
+    result is marked ``stopped_early``. The timeout is cut down to what is
+    left of the turn's deadline. A command that times out, or whose
+    deadline is cancelled, is killed and raises subprocess.TimeoutExpired
+    carrying the output it had written.
+    """
+    timeout = budget(timeout)
+    with trace_span(cmd[0], "subprocess", argv=cmd, timeout=timeout) as span:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        stdout: List[str] = []
+        stderr: List[str] = []
+        # stderr is drained on the side so a chatty command cannot block on a full pipe
+        stderr_reader = threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)
+        stderr_reader.start()
+        timed_out = threading.Event()
+
+        def on_timeout() -> None:
+            timed_out.set()
+            _kill(process)
+
+        watchdog = threading.Timer(timeout, on_timeout)
+        watchdog.start()
+        deadline = current_deadline()
+        stopped_early = False
+        try:
+            with (deadline.track(process) if deadline else nullcontext()):
+                for line in iter(process.stdout.readline, ""):
+                    stdout.append(line)
+                    if on_line is not None and on_line(line):
+                        stopped_early = True
+                        _kill(process)
+                        break
+                # Still under the watchdog, in case the command closed its output but kept running
+                process.wait()
+        except BaseException:
+            # Ctrl-C or a failing line handler: do not leave the command running
+            _kill(process)
+            process.wait()
+            raise
+        finally:
+            watchdog.cancel()
+            stderr_reader.join()
+            process.stdout.close()
+            process.stderr.close()
+        span.set(returncode=process.returncode, timed_out=timed_out.is_set(), stopped_early=stopped_early)
+
+    result = CommandResult(cmd, process.returncode, "".join(stdout), "".join(stderr), stopped_early)
+    if (timed_out.is_set() and not stopped_early) or (deadline is not None and deadline.cancelled):
+        raise subprocess.TimeoutExpired(cmd, timeout, result.stdout, result.stderr)
+    return result
+
+async def _read_stream(stream: asyncio.StreamReader, chunks: List[bytes], on_line: Optional[LineHandler] = None) -> bool:
+    """
+    Collect a pipe's output as it arrives, so it is kept if the process is killed.
+
+    With ``on_line`` the output is read line by line, and True is returned
+    as soon as the handler asks to stop.
+    """
+    while True:
+        chunk = await (stream.readline() if on_line is not None else stream.read(65536))
+        if not chunk:
+            return False
+        chunks.append(chunk)
+        if on_line is not None and on_line(chunk.decode(errors="replace")):
+            return True
+
+async def run_command_async(cmd: List[str], timeout: float, on_line: Optional[LineHandler] = None) -> CommandResult:
+    """
+    Run a command on the event loop and capture its text output.
+
+    Takes the same line handler and raises the same exceptions as
+    run_command(), including TimeoutExpired with the partial output, and
+    kills the process if it times out or the calling task is cancelled.
+    """
+    timeout = budget(timeout)
+    with trace_span(cmd[0], "subprocess", argv=cmd, timeout=timeout) as span:
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        stdout: List[bytes] = []
+        stderr: List[bytes] = []
+        stdout_reader = asyncio.ensure_future(_read_stream(process.stdout, stdout, on_line))
+        stderr_reader = asyncio.ensure_future(_read_stream(process.stderr, stderr))
+
+        async def communicate() -> bool:
+            # Shielded, so a timeout stops the waiting but not the reading
+            if await asyncio.shield(stdout_reader):
+                return True
+            await asyncio.shield(stderr_reader)
+            await process.wait()
+            return False
+
+        deadline = current_deadline()
+        timed_out = stopped_early = False
+        try:
+            with (deadline.track(process) if deadline else nullcontext()):
+                stopped_early = await asyncio.wait_for(communicate(), timeout)
+        except asyncio.TimeoutError:
+            timed_out = True
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            # The pipes close with the process; keep what was written before it died
+            await asyncio.gather(stdout_reader, stderr_reader, return_exceptions=True)
+        span.set(returncode=process.returncode, timed_out=timed_out, stopped_early=stopped_early)
+
+    result = CommandResult(
+        cmd,
+        process.returncode,
+        b"".join(stdout).decode(errors="replace"),
+        b"".join(stderr).decode(errors="replace"),
+        stopped_early
+    )
+    if timed_out or (deadline is not None and deadline.cancelled):
+        raise subprocess.TimeoutExpired(cmd, timeout, result.stdout, result.stderr)
+    return result
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    # The smallest value with at least pct% of the list at or below it
+    index = max(0, min(len(values) - 1, math.ceil(pct / 100 * len(values)) - 1))
+    return values[index]
+
+class CommandTool(Tool):
+    """
+    Base class for tools that wrap a single system command.
+
+    Subclasses describe the command and how to read its output; this class
+    runs it either blocking (execute) or on asyncio (execute_async). A
+    subclass can also watch the output line by line, to report progress
+    and to stop the command once it has what it needs.
+    """
+
+    def validate(self, args: Dict[str, Any]) -> Optional[str]:
+        """Return an error message if the arguments are unusable."""
+        return None
+
+    @abstractmethod
+    def build_command(self, args: Dict[str, Any]) -> Tuple[List[str], float]:
+        """Return the command line and its timeout in seconds."""
+        pass
+
+    def line_handler(self, args: Dict[str, Any]) -> Optional[LineHandler]:
+        """Return a handler for each output line, or None to just collect the output."""
+        return None
+
+    @abstractmethod
+    def format_result(self, args: Dict[str, Any], result: CommandResult) -> ToolResult:
+        """Parse a finished (or stopped early) command into the tool result."""
+        pass
+
+    @abstractmethod
+    def format_error(self, args: Dict[str, Any], error: Exception) -> ToolResult:
+        """Turn an exception raised while running the command into the tool result."""
+        pass
+
+    def execute(self, args: Dict[str, Any]) -> ToolResult:
+        """Run the command and format its output."""
+        error = self.validate(args)
+        if error:
+            return ErrorResult(error)
+
+        try:
+            cmd, timeout = self.build_command(args)
+            return self.format_result(args, run_command(cmd, timeout, self.line_handler(args)))
+        except Exception as e:
+            return self.format_error(args, e)
+
+    async def execute_async(self, args: Dict[str, Any]) -> ToolResult:
+        """Run the command on the event loop and format its output."""
+        error = self.validate(args)
+        if error:
+            return ErrorResult(error)
+
+        try:
+            cmd, timeout = self.build_command(args)
+            result = await run_command_async(cmd, timeout, self.line_handler(args))
+        except Exception as e:
+            # Error handlers may fall back to blocking lookups
+            return await asyncio.to_thread(self.format_error, args, e)
+
+        return self.format_result(args, result)
+
+class PingTool(CommandTool):
     """Ping tool for checking network connectivity."""
 
+    CACHE_TTL = 5
+
     def __init__(self):
         super().__init__(
             name="ping",
             description="Ping a host to check network connectivity. Returns ping statistics including packet loss, latency, and response time."
         )
 
-    def execute(self, args: Dict[str, Any]) -> str:
-        """Execute ping command."""
+    def execute(self, args: Dict[str, Any]) -> ToolResult:
+        """Ping in-process over an ICMP socket, or with the ping command if none can be opened."""
+        error = self.validate(args)
+        if error:
+            return ErrorResult(error)
+        if not Config.NATIVE_PING:
+            return super().execute(args)
+
         host = args.get("host", "")
-        count = args.get("count", 4)
-        timeout = args.get("timeout", 3)
+        try:
+            pinger = self._pinger(args)
+        except OSError:
+            return super().execute(args)
 
-        if not host:
-            return "Error: Host is required for ping command"
+        with pinger:
+            results = pinger.ping([host], args.get("count", 4), args.get("stop_after"))
+        if results[host].ipv6:
+            # The ICMP sockets are IPv4 only; the ping command handles IPv6
+            return super().execute(args)
+        return self._from_stats(results[host], args.get("count", 4))
 
+    async def execute_async(self, args: Dict[str, Any]) -> ToolResult:
+        """Ping in-process on the event loop, or with the ping command if no ICMP socket can be opened."""
+        error = self.validate(args)
+        if error:
+            return ErrorResult(error)
+        if not Config.NATIVE_PING:
+            return await super().execute_async(args)
+
+        host = args.get("host", "")
         try:
-            # Build ping command based on platform
-            system = platform.system().lower()
-            if system == "windows":
-                cmd = ["ping", "-n", str(count), "-w", str(timeout * 1000), host]
-            else:
-                cmd = ["ping", "-c", str(count), "-W", str(timeout), host]
-
-            # Execute ping command
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=timeout + 10
-            )
+            pinger = self._pinger(args)
+        except OSError:
+            return await super().execute_async(args)
 
-            if result.returncode == 0:
-                return self._parse_ping_output(result.stdout, host)
-            else:
-                return f"Ping failed for {host}: {result.stderr.strip()}"
+        with pinger:
+            results = await pinger.ping_async([host], args.get("count", 4), args.get("stop_after"))
+        if results[host].ipv6:
+            # The ICMP sockets are IPv4 only; the ping command handles IPv6
+            return await super().execute_async(args)
+        return self._from_stats(results[host], args.get("count", 4))
 
-        except subprocess.TimeoutExpired:
-            return f"Ping timeout for {host} after {timeout + 10} seconds"
-        except Exception as e:
-            return f"Error pinging {host}: {str(e)}"
-
-    def _parse_ping_output(self, output: str, host: str) -> str:
-        """Parse ping command output into a readable format."""
-        lines = output.split('\n')
-
-        # Extract key information
-        packet_info = ""
-        rtt_info = ""
-
-        for line in lines:
-            # Look for packet statistics
-            if "packets transmitted" in line.lower() or "packets transmitted" in line:
-                packet_info = line.strip()
-            # Look for round-trip time statistics
-            if "rtt min/avg/max" in line.lower() or "round-trip" in line.lower():
-                rtt_info = line.strip()
-            # Look for individual ping responses
-            if "bytes from" in line.lower() and "ttl=" in line.lower():
-                # Extract time from ping response
-                time_match = re.search(r'time[=<](\d+\.?\d*)\s*ms', line)
-                if time_match:
-                    response_time = time_match.group(1)
-                    return f"✅ {host} is reachable - Response time: {response_time}ms"
-
-        # If we couldn't parse individual responses, use summary stats
-        if packet_info:
-            return f"✅ {host} is reachable - {packet_info}"
-        elif rtt_info:
-            return f"✅ {host} is reachable - {rtt_info}"
+    def _pinger(self, args: Dict[str, Any]) -> IcmpPinger:
+        """Open an ICMP pinger that reports each reply as progress."""
+        pinger = IcmpPinger(timeout=args.get("timeout", 3))
+        count = args.get("count", 4)
+        pinger.on_reply = lambda stats, rtt: report_progress(f"ping {stats.host}: reply {stats.received}/{count}, {rtt:.1f} ms")
+        return pinger
+
+    def _from_stats(self, stats: PingStats, count: int) -> ToolResult:
+        """Turn native ping stats into a result, marked partial if the deadline cut it short."""
+        if stats.error and not stats.sent:
+            return ErrorResult(f"Error pinging {stats.host}: {stats.error}")
+        if stats.sent < count and expired():
+            if not stats.sent:
+                return ErrorResult(f"Ping to {stats.host} not started: no time left in this turn")
+            result = PingResult.from_replies(stats.host, stats.address, stats.rtts)
+            result.partial = f"deadline reached after {stats.sent} of {count} probes"
+            return result
+        return PingResult.from_replies(stats.host, stats.address, stats.rtts)
+
+    def validate(self, args: Dict[str, Any]) -> Optional[str]:
+        """Check that a host was given."""
+        if not args.get("host", ""):
+            return "Error: Host is required for ping command"
+        return None
+
+    def build_command(self, args: Dict[str, Any]) -> Tuple[List[str], float]:
+        """Build ping command based on platform."""
+        host = args.get("host", "")
+        count = args.get("count", 4)
+        timeout = args.get("timeout", 3)
+
+        system = platform.system().lower()
+        if system == "windows":
+            cmd = ["ping", "-n", str(count), "-w", str(timeout * 1000), host]
         else:
-            return f"✅ {host} is reachable - Ping successful"
+            cmd = ["ping", "-c", str(count), "-W", str(timeout), host]
+
+        # One probe per second, plus the wait for the last reply
+        return cmd, count + timeout + 2
+
+    def line_handler(self, args: Dict[str, Any]) -> Optional[LineHandler]:
+        """Report each reply as it arrives, and stop the command after ``stop_after`` replies."""
+        host = args.get("host", "")
+        count = args.get("count", 4)
+        stop_after = args.get("stop_after")
+        replies = 0
+
+        def on_line(line: str) -> bool:
+            nonlocal replies
+            match = REPLY_TIME.search(line)
+            if match is None:
+                return False
+            replies += 1
+            report_progress(f"ping {host}: reply {replies}/{count}, {float(match.group(1)):.1f} ms")
+            return bool(stop_after) and replies >= stop_after
+
+        return on_line
+
+    def format_result(self, args: Dict[str, Any], result: CommandResult) -> ToolResult:
+        """Parse the ping command output."""
+        host = args.get("host", "")
+        if result.stopped_early:
+            # Enough replies; the command was stopped before printing its summary
+            return self._parse_replies(result.stdout, host)
+        parsed = self._parse_ping_output(result.stdout, host, args.get("count", 4))
+        if parsed is None:
+            return ErrorResult(f"Ping failed for {host}: {(result.stderr or result.stdout).strip()}")
+        return parsed
+
+    def format_error(self, args: Dict[str, Any], error: Exception) -> ToolResult:
+        """Format an error raised while pinging."""
+        host = args.get("host", "")
+        if isinstance(error, subprocess.TimeoutExpired):
+            # Keep the replies printed before the command was stopped
+            result = self._parse_replies(error.output or "", host)
+            if result is None:
+                return ErrorResult(f"Ping timeout for {host}: no replies within {error.timeout:.0f} seconds")
+            result.partial = f"stopped after {error.timeout:.0f}s with {result.received} of {args.get('count', 4)} replies"
+            return result
+        return ErrorResult(f"Error pinging {host}: {str(error)}")
+
+    def _parse_replies(self, output: str, host: str) -> Optional[PingResult]:
+        """Parse the output of a ping command that was stopped, counting only the probes it printed."""
+        return self._parse_ping_output(output, host, len(REPLY_TIME.findall(output)))
+
+    def _parse_ping_output(self, output: str, host: str, count: int) -> Optional[PingResult]:
+        """
+        Parse ping output (Linux, macOS/BSD or Windows) into a result.
+
+        Reads every reply line plus the packet and RTT summary lines, so
+        loss and min/avg/max/mdev are kept. Returns None if the output has
+        neither replies nor a packet summary.
+        """
+        replies = [float(value) for value in REPLY_TIME.findall(output)]
+        address = None
+        match = re.search(r'(?:from|Reply from)\s+\[?([0-9a-fA-F.:]+?)\]?[:\s]', output)
+        if match:
+            address = match.group(1)
+
+        # Linux/macOS: "4 packets transmitted, 4 (packets) received"; Windows: "Sent = 4, Received = 4"
+        packets = (re.search(r'(\d+) packets transmitted, (\d+) (?:packets )?received', output)
+                   or re.search(r'Sent = (\d+), Received = (\d+)', output))
+        if packets is None and not replies:
+            return None
+        sent, received = (int(packets.group(1)), int(packets.group(2))) if packets else (count, len(replies))
+
+        # Linux "rtt min/avg/max/mdev = a/b/c/d ms", macOS "round-trip min/avg/max/stddev = a/b/c/d ms"
+        rtt = None
+        summary = re.search(r'min/avg/max/(?:mdev|stddev) = ([\d.]+)/([\d.]+)/([\d.]+)/([\d.]+)', output)
+        windows = re.search(r'Minimum = (\d+)ms, Maximum = (\d+)ms, Average = (\d+)ms', output)
+        if summary:
+            rtt = tuple(float(value) for value in summary.groups())
+        elif windows:
+            minimum, maximum, average = (float(value) for value in windows.groups())
+            rtt = (minimum, average, maximum, None)
+        elif replies:
+            return PingResult.from_replies(host, address, replies + [None] * max(0, sent - len(replies)), sent)
+
+        return PingResult(host, address, sent, received, rtt, replies if len(replies) == sent else None)
 
     @property
     def parameters(self) -> Dict[str, Any]:
@@ -195,13 +552,30 @@ class PingTool(Tool):
                     "default": 3,
                     "minimum": 1,
                     "maximum": 30
+                },
+                "stop_after": {
+                    "type": "integer",
+                    "description": "Stop as soon as this many replies arrived, e.g. 1 for a quick reachability check (default: send all count probes)",
+                    "minimum": 1,
+                    "maximum": 10
                 }
             },
             "required": ["host"]
         }
 
-class TracerouteTool(Tool):
-    """Traceroute tool for tracing network path."""
+class TracerouteTool(CommandTool):
+    """
+    Traceroute tool for tracing network path.
+
+    Probes every hop at once over a raw ICMP socket and returns a compact
+    hop table; the traceroute command is used when no raw socket can be
+    opened (no root or CAP_NET_RAW).
+    """
+
+    CACHE_TTL = 30
+
+    # The traceroute command is stopped after this many silent hops in a row
+    SILENT_HOPS_STOP = 4
 
     def __init__(self):
         super().__init__(
@@ -209,39 +583,159 @@ class TracerouteTool(Tool):
             description="Trace the network path to a host showing intermediate hops. Useful for diagnosing network routing issues."
         )
 
-    def execute(self, args: Dict[str, Any]) -> str:
-        """Execute traceroute command."""
+    def execute(self, args: Dict[str, Any]) -> ToolResult:
+        """Trace in-process, or with the traceroute command if no raw socket can be opened."""
+        error = self.validate(args)
+        if error:
+            return ErrorResult(error)
+        if not Config.NATIVE_PING:
+            return super().execute(args)
+        try:
+            tracer = self._tracer(args)
+        except OSError:
+            return super().execute(args)
+
+        with tracer:
+            return asyncio.run(self._trace(tracer, args))
+
+    def _tracer(self, args: Dict[str, Any]) -> ParallelTracer:
+        """Open a raw-socket tracer that reports each hop reply as progress."""
+        tracer = ParallelTracer(timeout=args.get("timeout", 2))
         host = args.get("host", "")
-        max_hops = args.get("max_hops", 15)
+        tracer.on_reply = lambda hop, source: report_progress(f"traceroute {host}: hop {hop.ttl} {source}")
+        return tracer
 
-        if not host:
-            return "Error: Host is required for traceroute command"
+    async def execute_async(self, args: Dict[str, Any]) -> ToolResult:
+        """Trace in-process on the event loop, or with the traceroute command if no raw socket can be opened."""
+        error = self.validate(args)
+        if error:
+            return ErrorResult(error)
+        if not Config.NATIVE_PING:
+            return await super().execute_async(args)
+        try:
+            tracer = self._tracer(args)
+        except OSError:
+            return await super().execute_async(args)
 
+        with tracer:
+            return await self._trace(tracer, args)
+
+    async def _trace(self, tracer: ParallelTracer, args: Dict[str, Any]) -> ToolResult:
+        host = args.get("host", "")
         try:
-            system = platform.system().lower()
-            if system == "windows":
-                cmd = ["tracert", "-h", str(max_hops), host]
-            else:
-                cmd = ["traceroute", "-m", str(max_hops), host]
-
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=60
-            )
+            trace = await tracer.trace(host, args.get("max_hops", Config.DEFAULT_TRACEROUTE_HOPS))
+        except OSError as e:
+            return ErrorResult(f"Error with traceroute to {host}: {str(e)}")
+        hops = [TraceHop(hop.ttl, hop.addresses, hop.rtts, hop.sent, hop.unreachable) for hop in trace.hops]
+        result = TracerouteResult(trace.host, trace.address, trace.reached, hops, trace.elapsed)
+        if not trace.reached and expired():
+            result.partial = f"deadline reached after {trace.elapsed:.1f}s, hops heard so far"
+        return result
 
-            if result.returncode == 0:
-                return f"Traceroute to {host}:\n{result.stdout}"
-            else:
-                return f"Traceroute failed for {host}: {result.stderr.strip()}"
-
-        except subprocess.TimeoutExpired:
-            return f"Traceroute timeout for {host}"
-        except FileNotFoundError:
-            return "Traceroute command not found. This tool may not be available on your system."
-        except Exception as e:
-            return f"Error with traceroute to {host}: {str(e)}"
+    def validate(self, args: Dict[str, Any]) -> Optional[str]:
+        """Check that a host was given."""
+        if not args.get("host", ""):
+            return "Error: Host is required for traceroute command"
+        return None
+
+    def build_command(self, args: Dict[str, Any]) -> Tuple[List[str], float]:
+        """Build traceroute command based on platform."""
+        host = args.get("host", "")
+        max_hops = args.get("max_hops", Config.DEFAULT_TRACEROUTE_HOPS)
+
+        system = platform.system().lower()
+        if system == "windows":
+            cmd = ["tracert", "-h", str(max_hops), host]
+        else:
+            cmd = ["traceroute", "-m", str(max_hops), host]
+
+        return cmd, 60
+
+    def line_handler(self, args: Dict[str, Any]) -> Optional[LineHandler]:
+        """
+        Report each hop as it is printed, and stop the command once the path goes dark.
+
+        Past SILENT_HOPS_STOP hops in a row without any answer, the rest of
+        the hops are unlikely to answer either, and each would cost the
+        command several probe timeouts.
+        """
+        host = args.get("host", "")
+        address = None
+        silent = 0
+
+        def on_line(line: str) -> bool:
+            nonlocal address, silent
+            header = TRACE_HEADER.search(line)
+            if header:
+                address = header.group(1)
+                return False
+            hop = self._parse_hop_line(line)
+            if hop is None:
+                return False
+            if hop.silent:
+                silent += 1
+                report_progress(f"traceroute {host}: hop {hop.ttl} *")
+                return silent >= self.SILENT_HOPS_STOP
+            silent = 0
+            report_progress(f"traceroute {host}: hop {hop.ttl} {','.join(hop.addresses) or '?'}")
+            return address is not None and address in hop.addresses
+
+        return on_line
+
+    def format_result(self, args: Dict[str, Any], result: CommandResult) -> ToolResult:
+        """Parse the traceroute command output into a hop table."""
+        host = args.get("host", "")
+        if result.stopped_early:
+            trace = self._parse_traceroute_output(result.stdout, host)
+            if not trace.reached:
+                trace.partial = f"stopped after {self.SILENT_HOPS_STOP} hops in a row without replies"
+            return trace
+        if result.returncode != 0:
+            return ErrorResult(f"Traceroute failed for {host}: {result.stderr.strip()}")
+        return self._parse_traceroute_output(result.stdout, host)
+
+    def format_error(self, args: Dict[str, Any], error: Exception) -> ToolResult:
+        """Format an error raised while tracing."""
+        host = args.get("host", "")
+        if isinstance(error, subprocess.TimeoutExpired):
+            # Keep the hops printed before the command was stopped
+            result = self._parse_traceroute_output(error.output or "", host)
+            if not result.hops:
+                return ErrorResult(f"Traceroute timeout for {host}: no hops within {error.timeout:.0f} seconds")
+            result.partial = f"stopped after {error.timeout:.0f}s at hop {result.hops[-1].ttl}"
+            return result
+        if isinstance(error, FileNotFoundError):
+            return ErrorResult("Traceroute command not found. This tool may not be available on your system.")
+        return ErrorResult(f"Error with traceroute to {host}: {str(error)}")
+
+    def _parse_traceroute_output(self, output: str, host: str) -> TracerouteResult:
+        """Parse traceroute (Unix) or tracert (Windows) output into hops."""
+        match = TRACE_HEADER.search(output)
+        address = match.group(1) if match else None
+
+        hops = [hop for hop in map(self._parse_hop_line, output.splitlines()) if hop is not None]
+        reached = bool(hops and address and address in hops[-1].addresses)
+        return TracerouteResult(host, address, reached, hops)
+
+    def _parse_hop_line(self, line: str) -> Optional[TraceHop]:
+        """Parse one hop line ("3  router (10.0.0.1)  1.2 ms  1.3 ms *"), or return None for other lines."""
+        row = re.match(r'\s*(\d+)\s+(.*)', line)
+        if not row:
+            return None
+        ttl, rest = int(row.group(1)), row.group(2)
+        rtts = [float(value) for value in re.findall(r'<?(\d+(?:\.\d+)?)\s*ms', rest)]
+        probes = len(rtts) + rest.count("*")
+
+        # Prefer the numeric address in (...) or [...] after a host name, else bare addresses
+        names = re.sub(r'<?\d+(?:\.\d+)?\s*ms', " ", rest)
+        candidates = re.findall(r'[(\[]([0-9a-fA-F.:]+)[)\]]', names) or names.split()
+        addresses = []
+        for candidate in candidates:
+            try:
+                addresses.append(str(ipaddress.ip_address(candidate)))
+            except ValueError:
+                continue
+        return TraceHop(ttl, list(dict.fromkeys(addresses)), rtts, probes or 1, unreachable="!" in rest)
 
     @property
     def parameters(self) -> Dict[str, Any]:
@@ -259,13 +753,29 @@ class TracerouteTool(Tool):
                     "default": 15,
                     "minimum": 1,
                     "maximum": 30
+                },
+                "timeout": {
+                    "type": "integer",
+                    "description": "Seconds to wait for replies after the probes are sent (default: 2)",
+                    "default": 2,
+                    "minimum": 1,
+                    "maximum": 10
                 }
             },
             "required": ["host"]
         }
 
-class DNSLookupTool(Tool):
-    """DNS lookup tool for resolving domain names."""
+class DNSLookupTool(CommandTool):
+    """
+    DNS lookup tool for resolving domain names.
+
+    Uses the built-in resolver and its TTL cache; the dig/nslookup command
+    is only used when no nameserver is known (e.g. on Windows without
+    DNS_NAMESERVERS).
+    """
+
+    # For answers that carry no TTL (nslookup output, system resolver fallback)
+    CACHE_TTL = 30
 
     def __init__(self):
         super().__init__(
@@ -273,45 +783,145 @@ class DNSLookupTool(Tool):
             description="Perform DNS lookup to resolve domain names to IP addresses and get DNS information."
         )
 
-    def execute(self, args: Dict[str, Any]) -> str:
-        """Execute DNS lookup."""
+    def execute(self, args: Dict[str, Any]) -> ToolResult:
+        """Resolve with the built-in resolver, answering from its cache without I/O when fresh."""
+        error = self.validate(args)
+        if error:
+            return ErrorResult(error)
+
+        resolver = get_resolver()
+        if not resolver.nameservers:
+            return super().execute(args)
+
         domain = args.get("domain", "")
         record_type = args.get("record_type", "A")
+        cached = resolver.cached(domain, record_type)
+        if cached is not None:
+            return self._from_answer(cached)
 
-        if not domain:
-            return "Error: Domain is required for DNS lookup"
+        try:
+            return self._from_answer(asyncio.run(resolver.resolve(domain, record_type)))
+        except DNSError as e:
+            return ErrorResult(f"DNS lookup failed for {domain}: {str(e)}")
+
+    async def execute_async(self, args: Dict[str, Any]) -> ToolResult:
+        """Resolve on the event loop with the built-in resolver."""
+        error = self.validate(args)
+        if error:
+            return ErrorResult(error)
 
+        resolver = get_resolver()
+        if not resolver.nameservers:
+            return await super().execute_async(args)
+
+        domain = args.get("domain", "")
         try:
-            system = platform.system().lower()
-            if system == "windows":
-                cmd = ["nslookup", domain]
-            else:
-                cmd = ["dig", domain, record_type]
-
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
+            return self._from_answer(await resolver.resolve(domain, args.get("record_type", "A")))
+        except DNSError as e:
+            return ErrorResult(f"DNS lookup failed for {domain}: {str(e)}")
 
-            if result.returncode == 0:
-                return f"DNS lookup for {domain} ({record_type} record):\n{result.stdout}"
-            else:
-                return f"DNS lookup failed for {domain}: {result.stderr.strip()}"
+    def cache_ttl(self, args: Dict[str, Any], result: ToolResult) -> float:
+        """Keep answers for as long as their records (or the negative TTL) allow."""
+        if isinstance(result, DNSLookupResult) and result.ttl is not None:
+            return result.ttl
+        return super().cache_ttl(args, result)
+
+    def _from_answer(self, result: DNSResult) -> DNSLookupResult:
+        """Turn a resolver answer into a result."""
+        source = "cached" if result.cached else f"{result.elapsed * 1000:.1f}ms via {result.server}"
+        values = [r.value for r in result.records if r.type_name == result.record_type]
+        aliases = [r.value for r in result.records if r.type_name == "CNAME" and result.record_type != "CNAME"]
+        return DNSLookupResult(result.name, result.record_type, result.rcode, values, aliases, result.ttl, source,
+                               None if result.cached else result.elapsed * 1000)
+
+    def validate(self, args: Dict[str, Any]) -> Optional[str]:
+        """Check that a domain was given."""
+        if not args.get("domain", ""):
+            return "Error: Domain is required for DNS lookup"
+        return None
 
-        except subprocess.TimeoutExpired:
-            return f"DNS lookup timeout for {domain}"
-        except FileNotFoundError:
+    def build_command(self, args: Dict[str, Any]) -> Tuple[List[str], float]:
+        """Build DNS lookup command based on platform."""
+        domain = args.get("domain", "")
+        record_type = args.get("record_type", "A")
+
+        system = platform.system().lower()
+        if system == "windows":
+            cmd = ["nslookup", domain]
+        else:
+            cmd = ["dig", domain, record_type]
+
+        return cmd, 30
+
+    def format_result(self, args: Dict[str, Any], result: CommandResult) -> ToolResult:
+        """Parse the dig or nslookup output."""
+        domain = args.get("domain", "")
+        record_type = args.get("record_type", "A").upper()
+        if result.returncode != 0:
+            return ErrorResult(f"DNS lookup failed for {domain}: {result.stderr.strip()}")
+        if ";; ANSWER SECTION" in result.stdout or "status:" in result.stdout:
+            return self._parse_dig_output(result.stdout, domain, record_type)
+        return self._parse_nslookup_output(result.stdout, domain, record_type)
+
+    def format_error(self, args: Dict[str, Any], error: Exception) -> ToolResult:
+        """Format an error raised during the lookup."""
+        domain = args.get("domain", "")
+        if isinstance(error, subprocess.TimeoutExpired):
+            return ErrorResult(f"DNS lookup timeout for {domain} after {error.timeout:.0f} seconds")
+        if isinstance(error, FileNotFoundError):
             # Fallback to simple socket-based lookup
             try:
                 import socket
                 ip = socket.gethostbyname(domain)
-                return f"✅ {domain} resolves to {ip}"
+                return DNSLookupResult(domain, "A", "NOERROR", [ip], source="system resolver")
             except Exception as e:
-                return f"Could not resolve {domain}: {str(e)}"
-        except Exception as e:
-            return f"Error with DNS lookup for {domain}: {str(e)}"
+                return ErrorResult(f"Could not resolve {domain}: {str(e)}")
+        return ErrorResult(f"Error with DNS lookup for {domain}: {str(error)}")
+
+    def _parse_dig_output(self, output: str, domain: str, record_type: str) -> DNSLookupResult:
+        """Read status, answer records and TTL from dig's default output."""
+        status = re.search(r'status: (\w+)', output)
+        values, aliases, ttls = [], [], []
+        in_answer = False
+        for line in output.splitlines():
+            if line.startswith(";; ANSWER SECTION"):
+                in_answer = True
+                continue
+            if in_answer and (not line.strip() or line.startswith(";")):
+                break
+            if in_answer:
+                fields = line.split(None, 4)
+                if len(fields) == 5:
+                    ttls.append(int(fields[1]))
+                    value = fields[4].rstrip(".") if fields[3] != "TXT" else fields[4]
+                    if fields[3] == record_type:
+                        values.append(value)
+                    elif fields[3] == "CNAME":
+                        aliases.append(value)
+        server = re.search(r';; SERVER: ([^#\s]+)', output)
+        return DNSLookupResult(
+            domain, record_type, status.group(1) if status else "NOERROR", values, aliases,
+            min(ttls) if ttls else None, f"via {server.group(1)}" if server else None
+        )
+
+    def _parse_nslookup_output(self, output: str, domain: str, record_type: str) -> DNSLookupResult:
+        """Read the addresses listed after the queried name in nslookup output."""
+        if "Non-existent domain" in output or "NXDOMAIN" in output:
+            return DNSLookupResult(domain, record_type, "NXDOMAIN", [])
+        # The first Address lines belong to the DNS server, the answer follows "Name:"
+        answer = output.split("Name:", 1)[1] if "Name:" in output else ""
+        values = []
+        for token in answer.split():
+            try:
+                values.append(str(ipaddress.ip_address(token)))
+            except ValueError:
+                continue
+        # With "Aliases:" the queried name is an alias of the canonical name shown after "Name:"
+        canonical = re.search(r'Name:\s*(\S+)', output)
+        aliases = []
+        if canonical and "Aliases:" in output and canonical.group(1).rstrip(".") != domain.rstrip("."):
+            aliases.append(canonical.group(1).rstrip("."))
+        return DNSLookupResult(domain, record_type, "NOERROR", values, aliases)
 
     @property
     def parameters(self) -> Dict[str, Any]:
@@ -336,50 +946,45 @@ class DNSLookupTool(Tool):
 class NetworkInfoTool(Tool):
     """Network information tool for local network details."""
 
+    CACHE_TTL = 300
+
     def __init__(self):
         super().__init__(
             name="network_info",
             description="Get local network information including IP addresses, interfaces, and connection details."
         )
 
-    def execute(self, args: Dict[str, Any]) -> str:
+    def execute(self, args: Dict[str, Any]) -> ToolResult:
         """Get network information."""
         try:
-            info = []
-
             # Get local IP addresses
             import socket
             hostname = socket.gethostname()
             local_ip = socket.gethostbyname(hostname)
-            info.append(f"Local hostname: {hostname}")
-            info.append(f"Local IP: {local_ip}")
 
             # Get public IP (simple HTTP request)
             try:
                 import urllib.request
-                public_ip = urllib.request.urlopen('https://api.ipify.org', timeout=5).read().decode()
-                info.append(f"Public IP: {public_ip}")
+                public_ip = urllib.request.urlopen('https://api.ipify.org', timeout=budget(5)).read().decode().strip()
             except:
-                info.append("Public IP: Could not determine")
+                public_ip = None
 
             # Platform-specific network info
             system = platform.system().lower()
-            if system == "windows":
-                result = subprocess.run(["ipconfig"], capture_output=True, text=True, timeout=10)
-            else:
-                result = subprocess.run(["ifconfig"], capture_output=True, text=True, timeout=10)
+            result = run_command(["ipconfig"] if system == "windows" else ["ifconfig"], 10)
 
+            addresses = []
             if result.returncode == 0:
-                info.append("\nNetwork interfaces:")
-                # Add just the interface names and IPs
+                # Keep just the interface addresses ("inet 10.0.0.2 ..." or "IPv4 Address. . . : 10.0.0.2")
                 for line in result.stdout.split('\n'):
-                    if 'inet ' in line or 'IPv4' in line:
-                        info.append(f"  {line.strip()}")
+                    match = re.search(r'(?:inet6?\s+(?:addr:)?|IPv[46] Address[ .]*:\s*)([0-9a-fA-F.:%]+\w*)', line)
+                    if match:
+                        addresses.append(match.group(1))
 
-            return "\n".join(info)
+            return NetworkInfoResult(hostname, local_ip, public_ip, addresses)
 
         except Exception as e:
-            return f"Error getting network info: {str(e)}"
+            return ErrorResult(f"Error getting network info: {str(e)}")
 
     @property
     def parameters(self) -> Dict[str, Any]:
@@ -390,18 +995,427 @@ class NetworkInfoTool(Tool):
             "required": []
         }
 
+class PingSweepTool(Tool):
+    """Ping many hosts at once and summarize the results."""
+
+    CACHE_TTL = 5
+
+    # Refuse sweeps larger than a /20 so one call cannot flood a network
+    MAX_TARGETS = 4096
+
+    def __init__(self):
+        super().__init__(
+            name="ping_sweep",
+            description="Ping a list of hosts, a CIDR range or the hosts in an inventory file concurrently. Returns a compact summary: up/down counts, latency percentiles and only the hosts that are down, lossy or unusually slow."
+        )
+
+    def execute(self, args: Dict[str, Any]) -> ToolResult:
+        """Run the sweep on a private event loop."""
+        return asyncio.run(self.execute_async(args))
+
+    async def execute_async(self, args: Dict[str, Any]) -> ToolResult:
+        """Probe all targets with a bounded in-flight window and summarize."""
+        try:
+            targets = self._collect_targets(args)
+        except (ValueError, OSError) as e:
+            return ErrorResult(f"Error: {str(e)}")
+
+        if not targets:
+            return ErrorResult("Error: Provide hosts, a cidr range or an inventory_file for ping_sweep")
+        if len(targets) > self.MAX_TARGETS:
+            return ErrorResult(f"Error: ping_sweep is limited to {self.MAX_TARGETS} targets, got {len(targets)}")
+
+        count = args.get("count", 2)
+        timeout = args.get("timeout", 1)
+        window = max(1, Config.SWEEP_WINDOW)
+
+        try:
+            pinger = IcmpPinger(timeout=timeout)
+        except OSError:
+            pinger = None
+
+        start_time = time.time()
+        results: Dict[str, PingStats] = {}
+        # Hosts pinged with one ping process each: all of them without an ICMP socket, else the IPv6 ones
+        semaphore = asyncio.Semaphore(min(window, 64))
+
+        async def probe(host: str) -> None:
+            async with semaphore:
+                if expired():
+                    results[host] = PingStats(host, address=host)
+                    return
+                results[host] = await self._probe_with_command(host, count, timeout)
+                report_progress(f"ping_sweep: probed {len(results)}/{len(targets)} hosts")
+
+        if pinger:
+            done = 0
+
+            def on_done(stats: PingStats) -> None:
+                nonlocal done
+                done += 1
+                report_progress(f"ping_sweep: probed {done}/{len(targets)} hosts")
+
+            pinger.on_done = on_done
+            with pinger:
+                # Up to `window` hosts in flight; each one that finishes makes room for the next
+                results.update(await pinger.ping_async(targets, count, window=window))
+            # The ICMP socket is IPv4 only
+            await asyncio.gather(*(probe(host) for host, stats in list(results.items()) if stats.ipv6))
+        else:
+            await asyncio.gather(*(probe(host) for host in targets))
+
+        if not expired():
+            return self._summarize(targets, results, time.time() - start_time, args)
+
+        # The deadline passed mid-sweep: report the hosts probed so far, not the rest as down
+        probed = [t for t in targets if t in results and (not results[t].address or results[t].sent or results[t].error)]
+        summary = self._summarize(probed, results, time.time() - start_time, args)
+        summary.partial = f"deadline reached after {summary.elapsed:.1f}s, {len(targets) - len(probed)} of {len(targets)} hosts not probed"
+        return summary
+
+    def _collect_targets(self, args: Dict[str, Any]) -> List[str]:
+        """Expand hosts, CIDR range and inventory file into one de-duplicated list."""
+        hosts = args.get("hosts") or []
+        targets: List[str] = [hosts] if isinstance(hosts, str) else list(hosts)
+
+        cidr = args.get("cidr")
+        if cidr:
+            network = ipaddress.ip_network(cidr, strict=False)
+            if network.num_addresses > self.MAX_TARGETS + 2:
+                raise ValueError(f"{cidr} has {network.num_addresses} addresses, ping_sweep is limited to {self.MAX_TARGETS}")
+            hosts = list(network.hosts()) or [network.network_address]
+            targets.extend(str(address) for address in hosts)
+
+        inventory_file = args.get("inventory_file")
+        if inventory_file:
+            found = 0
+            with open(self._inventory_path(inventory_file), encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    line = line.split("#", 1)[0].strip()
+                    # Only tokens that look like a host name or address; nothing else is echoed back or resolved
+                    if line and HOST_TOKEN.match(line.split()[0]):
+                        targets.append(line.split()[0])
+                        found += 1
+            if not found:
+                raise ValueError(f"{inventory_file} lists no host names or addresses")
+
+        return list(dict.fromkeys(target.strip() for target in targets if target.strip()))
+
+    def _inventory_path(self, path: str) -> str:
+        """
+        The inventory file ``path`` names, which must lie inside INVENTORY_DIR.
+
+        Raises:
+            ValueError: When inventory files are disabled or the path leads outside the directory
+        """
+        if not Config.INVENTORY_DIR:
+            raise ValueError("inventory files are disabled (INVENTORY_DIR is empty)")
+        directory = os.path.realpath(Config.INVENTORY_DIR)
+        # "web.txt" and "inventory/web.txt" both name a file in the inventory directory
+        for candidate in (os.path.join(directory, path), os.path.abspath(path)):
+            candidate = os.path.realpath(candidate)
+            if os.path.commonpath([directory, candidate]) == directory and os.path.isfile(candidate):
+                return candidate
+        raise ValueError(f"no inventory file {path} in {Config.INVENTORY_DIR}")
+
+    async def _probe_with_command(self, host: str, count: int, timeout: int) -> PingStats:
+        """Ping one host with the ping command and collect its reply times."""
+        system = platform.system().lower()
+        if system == "windows":
+            cmd = ["ping", "-n", str(count), "-w", str(timeout * 1000), host]
+        else:
+            cmd = ["ping", "-c", str(count), "-W", str(timeout), host]
+
+        stats = PingStats(host, address=host)
+        try:
+            result = await run_command_async(cmd, count + timeout + 2)
+        except subprocess.TimeoutExpired as e:
+            # Stopped early: keep the replies it got, without counting the unsent probes as lost
+            stats.rtts = [float(value) for value in REPLY_TIME.findall(e.output or "")]
+            if not stats.rtts:
+                stats.error = str(e)
+            return stats
+        except Exception as e:
+            stats.error = str(e)
+            return stats
+
+        replies = [float(value) for value in REPLY_TIME.findall(result.stdout)]
+        stats.rtts = replies + [None] * max(0, count - len(replies))
+        return stats
+
+    def _summarize(self, targets: List[str], results: Dict[str, PingStats], elapsed: float, args: Dict[str, Any]) -> SweepResult:
+        """Build the compact sweep summary."""
+        up = [results[t] for t in targets if results[t].received]
+        down = [t for t in targets if results[t].address and not results[t].received]
+        unresolved = [t for t in targets if not results[t].address]
+        scope = args.get("cidr") or args.get("inventory_file") or f"{len(targets)} hosts"
+
+        percentiles = None
+        slow = []
+        averages = sorted(stats.summary()[1] for stats in up)
+        if averages:
+            percentiles = {
+                "p50": percentile(averages, 50),
+                "p90": percentile(averages, 90),
+                "p99": percentile(averages, 99),
+                "max": averages[-1]
+            }
+
+            # Slow outliers: more than 3 median absolute deviations above the median
+            median = percentile(averages, 50)
+            mad = percentile(sorted(abs(value - median) for value in averages), 50)
+            threshold = median + 3 * max(mad, 0.1 * median, 0.5)
+            slow = sorted(((s.host, s.summary()[1]) for s in up if s.summary()[1] > threshold), key=lambda item: -item[1])
+
+        lossy = [(s.host, s.loss) for s in up if s.loss > 0]
+        return SweepResult(scope, len(targets), elapsed, len(up), percentiles, slow, lossy, down, unresolved)
+
+    @property
+    def parameters(self) -> Dict[str, Any]:
+        """Return JSON schema for ping sweep parameters."""
+        return {
+            "type": "object",
+            "properties": {
+                "hosts": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Hostnames or IP addresses to ping"
+                },
+                "cidr": {
+                    "type": "string",
+                    "description": "CIDR range to sweep, e.g. 192.168.1.0/24"
+                },
+                "inventory_file": {
+                    "type": "string",
+                    "description": "File in the inventory directory with one host per line (# starts a comment)"
+                },
+                "count": {
+                    "type": "integer",
+                    "description": "Number of ping packets per host (default: 2)",
+                    "default": 2,
+                    "minimum": 1,
+                    "maximum": 5
+                },
+                "timeout": {
+                    "type": "integer",
+                    "description": "Timeout in seconds for each ping (default: 1)",
+                    "default": 1,
+                    "minimum": 1,
+                    "maximum": 10
+                }
+            },
+            "required": []
+        }
+
+class TcpConnectTool(Tool):
+    """Time TCP connects to many host:port endpoints, for hosts that drop ICMP."""
+
+    CACHE_TTL = 5
+
+    # Endpoints per call; with the default window a full scan of refused or open ports takes a few seconds
+    MAX_ENDPOINTS = 16384
+
+    def __init__(self):
+        super().__init__(
+            name="tcp_connect",
+            description="Check TCP port reachability of many host:port endpoints concurrently, e.g. when ping is blocked. Returns a compact summary: open/refused/filtered counts, connect time percentiles, the slowest open endpoints and the ones that are refused (host up, port closed), filtered (no answer, likely a firewall) or unreachable."
+        )
+
+    def execute(self, args: Dict[str, Any]) -> ToolResult:
+        """Run the scan on a private event loop."""
+        return asyncio.run(self.execute_async(args))
+
+    async def execute_async(self, args: Dict[str, Any]) -> ToolResult:
+        """Connect to every endpoint with a bounded in-flight window and summarize."""
+        try:
+            endpoints = self._collect_endpoints(args)
+        except ValueError as e:
+            return ErrorResult(f"Error: {str(e)}")
+        try:
+            # Models send numbers as strings now and then; clamp to the schema's range
+            attempts = max(1, min(int(args.get("attempts", 3)), 10))
+            timeout = max(0.1, min(float(args.get("timeout", 1)), 10.0))
+        except (TypeError, ValueError):
+            return ErrorResult(f"Error: attempts and timeout must be numbers, got {args.get('attempts')!r} and {args.get('timeout')!r}")
+
+        if not endpoints:
+            return ErrorResult("Error: Provide endpoints (host:port, or hosts together with ports) for tcp_connect")
+        if len(endpoints) > self.MAX_ENDPOINTS:
+            return ErrorResult(f"Error: tcp_connect is limited to {self.MAX_ENDPOINTS} endpoints, got {len(endpoints)}")
+
+        scanner = TcpScanner(timeout=timeout, window=Config.TCP_CONNECT_WINDOW)
+        scanner.on_endpoint = lambda stats, done, total: report_progress(f"tcp_connect: {done}/{total} endpoints")
+
+        start_time = time.time()
+        results = await scanner.scan(endpoints, attempts)
+        summary = self._summarize(endpoints, results, time.time() - start_time)
+
+        unprobed = sum(1 for stats in results.values() if stats.state == "unprobed")
+        if unprobed:
+            # The deadline passed mid-scan: the endpoints not probed are left out, not counted as filtered
+            summary.partial = f"deadline reached after {summary.elapsed:.1f}s, {unprobed} of {len(endpoints)} endpoints not probed"
+        return summary
+
+    def _collect_endpoints(self, args: Dict[str, Any]) -> List[Tuple[str, int]]:
+        """Expand endpoints and bare hosts times ports into one de-duplicated list."""
+        ports = args.get("ports") or []
+        for port in ports:
+            if not isinstance(port, int) or not 0 < port < 65536:
+                raise ValueError(f"invalid port {port!r}")
+
+        texts = args.get("endpoints") or []
+        if isinstance(texts, str):
+            texts = [texts]
+        endpoints: List[Tuple[str, int]] = []
+        for text in texts:
+            if not isinstance(text, str):
+                raise ValueError(f"invalid endpoint {text!r}")
+            if text.strip():
+                endpoints.extend(parse_endpoint(text, ports))
+        return list(dict.fromkeys(endpoints))
+
+    def _summarize(self, endpoints: List[Tuple[str, int]], results: Dict[Tuple[str, int], ConnectStats],
+                   elapsed: float) -> TcpConnectResult:
+        """Build the compact scan summary."""
+        by_state: Dict[str, List[ConnectStats]] = {}
+        for endpoint in endpoints:
+            stats = results[endpoint]
+            by_state.setdefault(stats.state, []).append(stats)
+
+        def listed(state: str) -> List[str]:
+            return [stats.endpoint for stats in by_state.get(state, [])]
+
+        open_stats = by_state.get("open", [])
+        medians = sorted(stats.summary()[1] for stats in open_stats)
+        percentiles = None
+        if medians:
+            percentiles = {
+                "p50": percentile(medians, 50),
+                "p90": percentile(medians, 90),
+                "p99": percentile(medians, 99),
+                "max": medians[-1]
+            }
+        open_endpoints = sorted(((stats.endpoint, stats.summary()[1], stats.summary()[2], stats.loss) for stats in open_stats),
+                                key=lambda item: -item[1])
+        failed = [(stats.endpoint, stats.error or "unknown error") for stats in by_state.get("error", [])]
+        return TcpConnectResult(len(endpoints) - len(by_state.get("unprobed", [])), elapsed, percentiles, open_endpoints,
+                                listed("refused"), listed("filtered"), listed("unreachable"), failed, listed("unresolved"))
+
+    @property
+    def parameters(self) -> Dict[str, Any]:
+        """Return JSON schema for TCP connect parameters."""
+        return {
+            "type": "object",
+            "properties": {
+                "endpoints": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Endpoints as host:port or [IPv6]:port; bare hosts are combined with ports"
+                },
+                "ports": {
+                    "type": "array",
+                    "items": {"type": "integer"},
+                    "description": "Ports to check on every endpoint given without a port, e.g. [22, 80, 443]"
+                },
+                "attempts": {
+                    "type": "integer",
+                    "description": "Connects per open endpoint, for the connect time percentiles (default: 3)",
+                    "default": 3,
+                    "minimum": 1,
+                    "maximum": 10
+                },
+                "timeout": {
+                    "type": "number",
+                    "description": "Seconds to wait for each connect before calling the port filtered (default: 1)",
+                    "default": 1,
+                    "minimum": 0.1,
+                    "maximum": 10
+                }
+            },
+            "required": ["endpoints"]
+        }
+
+class ProbeHistoryTool(Tool):
+    """Query recorded probe results instead of probing again."""
+
+    def __init__(self):
+        super().__init__(
+            name="probe_history",
+            description="Look up recorded ping/DNS/TCP probe results for a target over a recent time window, from the monitor and from earlier ping, dns_lookup and tcp_connect calls: latency percentiles, jitter, loss and the latency trend. Use it to answer questions about how a target has behaved over time without re-probing."
+        )
+
+    def execute(self, args: Dict[str, Any]) -> ToolResult:
+        """Summarize the recorded samples of one target, for one probe or all of them."""
+        target = args.get("target", "").strip()
+        if not target:
+            return ErrorResult("Error: target is required for probe_history")
+        try:
+            # Models send numbers as strings now and then; clamp to the schema's range
+            window = max(1, min(int(args.get("window_minutes", 60)), 7 * 24 * 60)) * 60
+        except (TypeError, ValueError):
+            return ErrorResult(f"Error: window_minutes must be a whole number, got {args.get('window_minutes')!r}")
+
+        history = get_history()
+        probes = [args["probe"]] if args.get("probe") else history.probes(target)
+        return ProbeHistoryResult(target, window, {probe: history.query(target, probe, window) for probe in probes})
+
+    @property
+    def parameters(self) -> Dict[str, Any]:
+        """Return JSON schema for probe history parameters."""
+        return {
+            "type": "object",
+            "properties": {
+                "target": {
+                    "type": "string",
+                    "description": "Hostname or IP address as it was probed"
+                },
+                "probe": {
+                    "type": "string",
+                    "description": "Only this probe: ping, dns or tcp:<port> (default: all recorded probes)"
+                },
+                "window_minutes": {
+                    "type": "integer",
+                    "description": "How far back to look in minutes (default: 60)",
+                    "default": 60,
+                    "minimum": 1,
+                    "maximum": 10080
+                }
+            },
+            "required": ["target"]
+        }
+
+# Built-in tools by name, instantiated on first use by the registry
+BUILTIN_TOOLS = {
+    "ping": PingTool,
+    "traceroute": TracerouteTool,
+    "dns_lookup": DNSLookupTool,
+    "network_info": NetworkInfoTool,
+    "ping_sweep": PingSweepTool,
+    "tcp_connect": TcpConnectTool,
+    "probe_history": ProbeHistoryTool
+}
+
+_registry: Optional[ToolRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_registry() -> ToolRegistry:
+    """Return the process-wide tool registry: the built-in tools plus any plugins (TOOL_PLUGINS)."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                registry = ToolRegistry()
+                for name, tool_class in BUILTIN_TOOLS.items():
+                    registry.register(name, tool_class)
+                if Config.TOOL_PLUGINS:
+                    registry.discover_plugins()
+                _registry = registry
+    return _registry
+
 def get_tools() -> list[Tool]:
     """Get all available tools."""
-    return [
-        PingTool(),
-        TracerouteTool(),
-        DNSLookupTool(),
-        NetworkInfoTool()
-    ]
+    return list(get_registry())
 
 def get_tool_by_name(name: str) -> Optional[Tool]:
     """Get a specific tool by name."""
-    for tool in get_tools():
-        if tool.name == name:
-            return tool
-    return None
\ No newline at end of file
+    return get_registry().get(name)
\ No newline at end of file
@@ -0,0 +1,209 @@
+import asyncio
+import socket
+import struct
+import time
+from typing import Callable, List, Dict, Optional, Tuple
+
+from deadline import remaining
+from icmp import ICMP_ECHO_REPLY, ICMP_ECHO_REQUEST, RECEIVE_BUFFER_SIZE, checksum, next_ident
+
+ICMP_DEST_UNREACHABLE = 3
+ICMP_TIME_EXCEEDED = 11
+
+# Fixed payload; only its checksum contribution matters
+PAYLOAD = b"ping-agent-trace" * 2
+
+class Hop:
+    """Replies collected for one TTL."""
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self.sent = 0
+        # Reply round-trip times in milliseconds and the addresses that answered
+        self.rtts: List[float] = []
+        self.addresses: List[str] = []
+        # Set when a router answered with destination unreachable
+        self.unreachable = False
+
+    @property
+    def loss(self) -> float:
+        """Probe loss in percent."""
+        return 100.0 * (self.sent - len(self.rtts)) / self.sent if self.sent else 100.0
+
+class TraceResult:
+    """Outcome of one traceroute."""
+
+    def __init__(self, host: str, address: str, hops: List[Hop], reached: bool, elapsed: float):
+        self.host = host
+        self.address = address
+        self.hops = hops
+        self.reached = reached
+        self.elapsed = elapsed
+
+def build_probe(ident: int, seq: int) -> bytes:
+    """
+    Build an echo request whose checksum does not depend on ``seq``.
+
+    Two bytes of the payload carry the ones' complement of the sequence
+    number, so identifier and checksum - the fields load balancers hash
+    ICMP flows on - stay the same for every probe (Paris traceroute).
+    """
+    body = struct.pack("!H", ~seq & 0xFFFF) + PAYLOAD
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    return struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksum(header + body), ident, seq) + body
+
+def parse_reply(packet: bytes) -> Optional[Tuple[int, int, int, str]]:
+    """
+    Match a packet received on a raw ICMP socket to one of our probes.
+
+    Returns (identifier, sequence, icmp_type, destination) for echo replies
+    and for time-exceeded/unreachable errors quoting an echo request, else
+    None. The destination is the address the probe was sent to: the source
+    of an echo reply, or the destination in the IP header an error quotes.
+    """
+    if len(packet) < 20:
+        return None
+    icmp = packet[(packet[0] & 0x0F) * 4:]
+    if len(icmp) < 8:
+        return None
+    icmp_type = icmp[0]
+
+    if icmp_type == ICMP_ECHO_REPLY:
+        _, _, _, ident, seq = struct.unpack("!BBHHH", icmp[:8])
+        return ident, seq, icmp_type, socket.inet_ntoa(packet[12:16])
+
+    if icmp_type in (ICMP_TIME_EXCEEDED, ICMP_DEST_UNREACHABLE):
+        inner = icmp[8:]
+        if len(inner) < 20 or inner[9] != socket.IPPROTO_ICMP:
+            return None
+        quoted = inner[(inner[0] & 0x0F) * 4:]
+        if len(quoted) < 8 or quoted[0] != ICMP_ECHO_REQUEST:
+            return None
+        _, _, _, ident, seq = struct.unpack("!BBHHH", quoted[:8])
+        return ident, seq, icmp_type, socket.inet_ntoa(inner[16:20])
+    return None
+
+class ParallelTracer:
+    """
+    Traceroute that probes every TTL at once over a raw ICMP socket.
+
+    All probes are sent up front, replies are correlated back to their TTL
+    through the sequence number quoted in ICMP time-exceeded errors, and
+    the trace ends as soon as the destination (or a router reporting it
+    unreachable) has answered and the hops before it have had a moment to
+    reply. Total time is roughly one round
+    trip plus the timeout, instead of hops times the timeout.
+    """
+
+    def __init__(self, timeout: float = 2.0, queries: int = 3, round_interval: float = 0.05):
+        self.timeout = timeout
+        self.queries = queries
+        self.round_interval = round_interval
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+        self.sock.setblocking(False)
+        try:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER_SIZE)
+        except OSError:
+            pass
+        self.ident = next_ident()
+        # Called with the hop and the address of every reply
+        self.on_reply: Optional[Callable[[Hop, str], None]] = None
+
+    def close(self) -> None:
+        self.sock.close()
+
+    def __enter__(self) -> "ParallelTracer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    async def trace(self, host: str, max_hops: int = 15) -> TraceResult:
+        """Trace the path to ``host`` and return one Hop per TTL up to the destination."""
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(host, None, family=socket.AF_INET, type=socket.SOCK_RAW)
+        address = infos[0][4][0]
+
+        hops = {ttl: Hop(ttl) for ttl in range(1, max_hops + 1)}
+        sent_at: Dict[int, float] = {}
+        replies: asyncio.Queue = asyncio.Queue()
+
+        def on_readable() -> None:
+            while True:
+                try:
+                    packet, (source, _) = self.sock.recvfrom(65535)
+                except (BlockingIOError, OSError):
+                    return
+                replies.put_nowait((packet, source, time.perf_counter()))
+
+        start_time = time.perf_counter()
+        # First TTL that got an echo reply or an unreachable error
+        destination_ttl: Optional[int] = None
+        reached = False
+        finish_by = start_time + self.timeout
+
+        loop.add_reader(self.sock.fileno(), on_readable)
+        try:
+            for attempt in range(self.queries):
+                for ttl in range(1, max_hops + 1):
+                    # Sequence number encodes the TTL so replies map straight back
+                    seq = (attempt << 8) | ttl
+                    self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_TTL, ttl)
+                    self.sock.sendto(build_probe(self.ident, seq), (address, 0))
+                    sent_at[seq] = time.perf_counter()
+                    hops[ttl].sent += 1
+                if attempt + 1 < self.queries:
+                    await asyncio.sleep(self.round_interval)
+            finish_by = time.perf_counter() + self.timeout
+
+            # Stop waiting when the turn's deadline passes, keeping the hops heard from so far
+            left = remaining()
+            if left is not None:
+                finish_by = min(finish_by, time.perf_counter() + left)
+
+            while True:
+                now = time.perf_counter()
+                if destination_ttl is not None and all(
+                    len(hops[ttl].rtts) == hops[ttl].sent for ttl in range(1, destination_ttl + 1)
+                ):
+                    break
+                if now >= finish_by:
+                    break
+                try:
+                    packet, source, received_at = await asyncio.wait_for(replies.get(), finish_by - now)
+                except asyncio.TimeoutError:
+                    break
+
+                parsed = parse_reply(packet)
+                if parsed is None:
+                    continue
+                ident, seq, icmp_type, destination = parsed
+                # Sequence numbers repeat across traces; only replies about our probes to this address count
+                if ident != self.ident or destination != address or seq not in sent_at:
+                    continue
+
+                ttl = seq & 0xFF
+                hop = hops[ttl]
+                hop.rtts.append((received_at - sent_at.pop(seq)) * 1000)
+                if source not in hop.addresses:
+                    hop.addresses.append(source)
+                if self.on_reply is not None:
+                    self.on_reply(hop, source)
+
+                if icmp_type == ICMP_DEST_UNREACHABLE and source != address:
+                    hop.unreachable = True
+                if icmp_type != ICMP_TIME_EXCEEDED:
+                    if destination_ttl is None or ttl < destination_ttl:
+                        destination_ttl = ttl
+                        reached = icmp_type == ICMP_ECHO_REPLY
+                        # Give silent hops before the destination a short grace period
+                        rtt = hop.rtts[-1] / 1000
+                        finish_by = min(finish_by, received_at + max(0.2, 2 * rtt))
+        finally:
+            loop.remove_reader(self.sock.fileno())
+
+        last = destination_ttl or max_hops
+        return TraceResult(
+            host, address, [hops[ttl] for ttl in range(1, last + 1)],
+            reached, time.perf_counter() - start_time
+        )
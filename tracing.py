@@ -0,0 +1,278 @@
+import asyncio
+import atexit
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Tuple
+
+from config import Config
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+_span_ids = itertools.count(1)
+
+# Installed hooks; replaced as a whole so readers never need a lock
+_hooks: Tuple["TraceHook", ...] = ()
+_hooks_lock = threading.Lock()
+
+# Span kinds with their own hook callbacks, in addition to on_span_start/end
+_KIND_CALLBACKS = {
+    "llm": ("on_llm_start", "on_llm_end"),
+    "tool": ("on_tool_start", "on_tool_end"),
+}
+
+class Span:
+    """
+    One timed step of an agent turn.
+
+    Spans nest through a context variable, so a tool span started on a
+    worker thread or asyncio task still points at the turn that started
+    it, as long as the context was carried over (asyncio does this on its
+    own; Agent copies it into its tool threads).
+    """
+
+    __slots__ = ("name", "kind", "span_id", "parent_id", "trace_id", "attributes",
+                 "start", "end", "started_at", "thread", "task", "error", "_token")
+
+    def __init__(self, name: str, kind: str, attributes: Dict[str, Any]):
+        parent = _current_span.get()
+        self.name = name
+        self.kind = kind
+        self.span_id = next(_span_ids)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.trace_id = parent.trace_id if parent is not None else self.span_id
+        self.attributes = attributes
+        self.start = 0.0
+        self.end: Optional[float] = None
+        self.started_at = 0.0
+        self.thread = ""
+        self.task: Optional[str] = None
+        self.error: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        """Seconds from start to end (or to now while the span is open)."""
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def set(self, **attributes: Any) -> None:
+        """Add or update attributes."""
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(timespec="microseconds"),
+            "duration_ms": round(self.duration * 1000, 3),
+            "thread": self.thread,
+            "task": self.task,
+            "error": self.error,
+            "attributes": self.attributes
+        }
+
+    def __enter__(self) -> "Span":
+        self.thread = threading.current_thread().name
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        if task is not None:
+            self.task = task.get_name()
+        self._token = _current_span.set(self)
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        _dispatch(self, 0)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.end = time.perf_counter()
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        _dispatch(self, 1)
+        return False
+
+class _NoopSpan:
+    """Stand-in returned while tracing is off; every operation does nothing."""
+
+    __slots__ = ()
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+NOOP_SPAN = _NoopSpan()
+
+def trace_span(name: str, kind: str = "internal", **attributes: Any):
+    """
+    Open a span as a context manager: ``with trace_span("dig", "subprocess") as span:``.
+
+    Returns a shared no-op span when no hook is installed, so tracing
+    costs one function call while it is off.
+    """
+    if not _hooks:
+        return NOOP_SPAN
+    return Span(name, kind, attributes)
+
+def current_span() -> Optional[Span]:
+    """The innermost open span in this context, if any."""
+    return _current_span.get()
+
+class TraceHook:
+    """
+    Receives spans as they start and end. Override the callbacks you need.
+
+    Callbacks run synchronously on the thread or task that owns the span,
+    so they should be quick; an exception in a hook is swallowed so it
+    never breaks a turn.
+    """
+
+    def on_span_start(self, span: Span) -> None:
+        pass
+
+    def on_span_end(self, span: Span) -> None:
+        pass
+
+    def on_llm_start(self, span: Span) -> None:
+        pass
+
+    def on_llm_end(self, span: Span) -> None:
+        pass
+
+    def on_tool_start(self, span: Span) -> None:
+        pass
+
+    def on_tool_end(self, span: Span) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+def add_hook(hook: TraceHook) -> TraceHook:
+    """Install a hook; tracing is on while at least one is installed."""
+    global _hooks
+    with _hooks_lock:
+        _hooks = _hooks + (hook,)
+    return hook
+
+def remove_hook(hook: TraceHook) -> None:
+    """Uninstall a hook and close it."""
+    global _hooks
+    with _hooks_lock:
+        _hooks = tuple(h for h in _hooks if h is not hook)
+    hook.close()
+
+def _dispatch(span: Span, phase: int) -> None:
+    kind_callback = _KIND_CALLBACKS.get(span.kind)
+    for hook in _hooks:
+        try:
+            if phase == 0:
+                hook.on_span_start(span)
+            else:
+                hook.on_span_end(span)
+            if kind_callback:
+                getattr(hook, kind_callback[phase])(span)
+        except Exception:
+            pass
+
+class JSONLinesTraceExporter(TraceHook):
+    """Appends one JSON object per finished span; flushed when a turn ends."""
+
+    def __init__(self, path: str):
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def on_span_end(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            if span.parent_id is None:
+                self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+class ChromeTraceExporter(TraceHook):
+    """
+    Writes spans as Chrome trace events, viewable as a flame chart in
+    chrome://tracing or https://ui.perfetto.dev.
+
+    Events are appended as they finish, using the trace format's
+    unterminated JSON array form, so the file is usable even if the
+    process dies. Each thread and asyncio task gets its own row.
+    """
+
+    def __init__(self, path: str):
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._lanes: Dict[Tuple[str, Optional[str]], int] = {}
+        self._pid = os.getpid()
+        if new_file:
+            self._file.write("[\n")
+        self._write({"name": "process_name", "ph": "M", "pid": self._pid, "tid": 0,
+                     "args": {"name": f"ping-agent {self._pid}"}})
+
+    def on_span_end(self, span: Span) -> None:
+        with self._lock:
+            lane = (span.thread, span.task)
+            tid = self._lanes.get(lane)
+            if tid is None:
+                tid = self._lanes[lane] = len(self._lanes) + 1
+                name = span.thread if span.task is None else f"{span.thread} / {span.task}"
+                self._write({"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid,
+                             "args": {"name": name}})
+
+            args = dict(span.attributes)
+            if span.error:
+                args["error"] = span.error
+            self._write({
+                "name": span.name,
+                "cat": span.kind,
+                "ph": "X",
+                "ts": round(span.started_at * 1e6),
+                "dur": round(span.duration * 1e6),
+                "pid": self._pid,
+                "tid": tid,
+                "args": args
+            })
+            if span.parent_id is None:
+                self._file.flush()
+
+    def _write(self, event: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(event, ensure_ascii=False, default=str) + ",\n")
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+_configured = False
+
+def setup_from_config() -> List[TraceHook]:
+    """Install the exporters named in Config (TRACE_FILE, TRACE_CHROME_FILE) once per process."""
+    global _configured
+    with _hooks_lock:
+        if _configured:
+            return []
+        _configured = True
+
+    hooks: List[TraceHook] = []
+    if Config.TRACE_FILE:
+        hooks.append(add_hook(JSONLinesTraceExporter(Config.TRACE_FILE)))
+    if Config.TRACE_CHROME_FILE:
+        hooks.append(add_hook(ChromeTraceExporter(Config.TRACE_CHROME_FILE)))
+    for hook in hooks:
+        atexit.register(hook.close)
+    return hooks